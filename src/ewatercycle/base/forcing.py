@@ -27,13 +27,20 @@ See `ESMValTool configuring docs <https://docs.esmvaltool.org/projects/ESMValCor
 for more information.
 """
 
+import hashlib
+import inspect
 import logging
+import os
 import shutil
+import tempfile
 import warnings
-from collections.abc import Callable
-from datetime import datetime
+import weakref
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Annotated, TypeAlias, TypeVar
+from typing import Annotated, NamedTuple, TypeAlias, TypeVar
 
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
@@ -48,10 +55,12 @@ from pydantic.functional_validators import AfterValidator, model_validator
 from pyproj import Geod
 from ruamel.yaml import YAML
 
+from ewatercycle.config import CFG, Configuration
 from ewatercycle.esmvaltool.builder import (
     build_generic_distributed_forcing_recipe,
     build_generic_lumped_forcing_recipe,
 )
+from ewatercycle.esmvaltool.datasets import DATASETS
 from ewatercycle.esmvaltool.run import run_recipe
 from ewatercycle.esmvaltool.schema import Dataset, Recipe
 from ewatercycle.util import get_time, merge_esvmaltool_datasets, to_absolute_path
@@ -71,6 +80,139 @@ AnyForcing = TypeVar("AnyForcing", bound="DefaultForcing")
 """TypeVar for forcing classes."""
 Postprocessor: TypeAlias = Callable[[dict[str, str]], tuple[str, ...]]
 
+_SHAPE_EXTENSIONS = (".shp", ".shx", ".dbf", ".prj")
+_ZARR_CHUNK_SIZE = 16
+
+
+def _forcing_cache_entry(
+    cls: type["DefaultForcing"],
+    recipe: Recipe,
+    shape: Path,
+    postprocessor: Postprocessor | None,
+    **arguments,
+) -> Path | None:
+    """Return the cache directory of a forcing, or None when it can not be cached.
+
+    The name of the directory is a hash of the forcing class, the recipe,
+    the contents of the shape file, the postprocessor and the other arguments.
+    """
+    if CFG.forcing_cache_dir is None:
+        return None
+    postprocessor_identity = None
+    if postprocessor is not None:
+        postprocessor_identity = _postprocessor_identity(postprocessor)
+        if postprocessor_identity is None:
+            logger.info(f"Not caching forcing of postprocessor {postprocessor!r}")
+            return None
+
+    digest = hashlib.sha256()
+    digest.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+    digest.update(recipe.to_yaml().encode())
+    for extension in _SHAPE_EXTENSIONS:
+        path = shape.with_suffix(extension)
+        if path.exists():
+            digest.update(path.read_bytes())
+    digest.update(postprocessor_identity.encode() if postprocessor_identity else b"")
+    digest.update(repr(sorted(arguments.items())).encode())
+    return CFG.forcing_cache_dir / digest.hexdigest()
+
+
+def _postprocessor_identity(postprocessor: Postprocessor) -> str | None:
+    """Source code and defaults of a postprocessor function.
+
+    So the cache is not used after the postprocessor changed.
+    None for postprocessors of which the behaviour can not be captured,
+    like callable objects, partials and functions with a closure.
+    """
+    if not inspect.isfunction(postprocessor) or postprocessor.__closure__:
+        return None
+    try:
+        source = inspect.getsource(postprocessor)
+    except (OSError, TypeError):
+        return None
+    return repr(
+        (
+            postprocessor.__module__,
+            postprocessor.__qualname__,
+            source,
+            postprocessor.__defaults__,
+            postprocessor.__kwdefaults__,
+        )
+    )
+
+
+def _link_files(source: Path, target: Path) -> None:
+    """Hard link the files in source into target, copy them if linking fails."""
+    target.mkdir(parents=True, exist_ok=True)
+    for path in source.iterdir():
+        if not path.is_file():
+            continue
+        destination = target / path.name
+        destination.unlink(missing_ok=True)
+        try:
+            os.link(path, destination)
+        except OSError:
+            # For example when source and target are on different file systems
+            shutil.copy2(path, destination)
+
+
+def _store_in_cache(directory: Path, entry: Path) -> None:
+    """Store the files of the forcing in directory as cache entry."""
+    # Fill a staging directory and rename it,
+    # so other processes never see a partial entry
+    staging = Path(tempfile.mkdtemp(prefix=f".{entry.name}", dir=entry.parent))
+    _link_files(directory, staging)
+    try:
+        staging.rename(entry)
+    except OSError:
+        # Entry was stored by another process in the meantime
+        shutil.rmtree(staging)
+        return
+    logger.info(f"Stored forcing in cache {entry}")
+
+
+def _in_forcing_cache(directory: Path | None) -> bool:
+    """Whether directory is an entry of the forcing cache."""
+    if directory is None or CFG.forcing_cache_dir is None:
+        return False
+    return directory.resolve().is_relative_to(CFG.forcing_cache_dir.resolve())
+
+
+def _extended_filename(filename: str, old_year: int, new_year: int) -> str:
+    """Return name for a file extended to a later year.
+
+    ESMValTool file names end with the year range, like `..._pr_2000-2001.nc`,
+    so the end year is replaced. Other names get the new end year appended.
+    """
+    path = Path(filename)
+    if path.stem.endswith(str(old_year)):
+        stem = path.stem.removesuffix(str(old_year))
+        return f"{stem}{new_year}{path.suffix}"
+    return f"{path.stem}-{new_year}{path.suffix}"
+
+
+class _OpenDataset(NamedTuple):
+    key: tuple
+    merged: xr.Dataset
+    sources: list[xr.Dataset]
+
+
+# Merged datasets of DefaultForcing.to_xarray() by id of the forcing. Kept out
+# of the forcing, so they do not take part in comparisons and copies.
+_open_datasets: dict[int, _OpenDataset] = {}
+
+
+def _close_dataset(forcing_id: int) -> None:
+    entry = _open_datasets.pop(forcing_id, None)
+    if entry is not None:
+        for source in entry.sources:
+            source.close()
+
+
+def _use_config(config: Configuration) -> None:
+    """Use the configuration of the parent process in a worker process."""
+    CFG.overwrite(config)
+
 
 class DefaultForcing(BaseModel):
     """Container for forcing data.
@@ -150,6 +292,18 @@ class DefaultForcing(BaseModel):
                 variables based on the ESMValTool recipe output. Must return
                 the names & filenames of the variables it derived.
             model_specific_options: Subclass specific options.
+
+        When :py:attr:`ewatercycle.config.Configuration.forcing_cache_dir` is set,
+        the generated forcing is stored in the cache. A later call with the same
+        recipe, shape file contents, postprocessor and options then returns
+        the cached forcing without running ESMValTool. If `directory` is given
+        the cached files are hard linked into it, otherwise into a new
+        timestamped directory in
+        :py:attr:`CFG.output_dir <ewatercycle.config.Configuration.output_dir>`.
+        The postprocessor is part of the key with its source code and defaults.
+        Postprocessors whose source is not available or which have a closure,
+        like partials or nested functions using outer variables,
+        disable the cache.
         """
         recipe = cls._build_recipe(
             dataset=dataset,
@@ -160,6 +314,28 @@ class DefaultForcing(BaseModel):
             **model_specific_options,
         )
 
+        cache_entry = _forcing_cache_entry(
+            cls,
+            recipe,
+            Path(shape),
+            postprocessor,
+            start_time=start_time,
+            end_time=end_time,
+            variables=variables,
+            options=model_specific_options,
+        )
+        if cache_entry is not None and (cache_entry / FORCING_YAML).exists():
+            logger.info(f"Using cached forcing from {cache_entry}")
+            if directory is None:
+                # The entry itself must not be changed by save() or extend()
+                timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+                CFG.output_dir.mkdir(parents=True, exist_ok=True)
+                directory = tempfile.mkdtemp(
+                    prefix=f"{cls.__name__.lower()}_{timestamp}_", dir=CFG.output_dir
+                )
+            _link_files(cache_entry, Path(directory))
+            return cls.load(directory)
+
         recipe_output = cls._run_recipe(
             recipe, directory=Path(directory) if directory else None
         )
@@ -185,8 +361,244 @@ class DefaultForcing(BaseModel):
             **arguments,
         )
         forcing.save()
+        if cache_entry is not None:
+            _store_in_cache(forcing.directory, cache_entry)
         return forcing
 
+    @classmethod
+    def generate_many(
+        cls: type[AnyForcing],
+        dataset: str | Dataset | dict,
+        start_time: str,
+        end_time: str,
+        shapes: Iterable[str | Path],
+        directory: str | Path | None = None,
+        max_workers: int | None = None,
+        executor: Executor | None = None,
+        **generate_options,
+    ) -> dict[str | Path, AnyForcing | Exception]:
+        """Generate forcings for many shapes in parallel.
+
+        Each shape gets its own :py:meth:`generate` call in a worker process.
+        A shape for which generation fails does not stop the others.
+
+        Args:
+            dataset: Dataset to get forcing data from, see :py:meth:`generate`.
+                Looked up once for all shapes.
+            start_time: Start time of forcing in UTC and ISO format string e.g.
+                'YYYY-MM-DDTHH:MM:SSZ'.
+            end_time: End time of forcing in UTC and ISO format string e.g.
+                'YYYY-MM-DDTHH:MM:SSZ'.
+            shapes: Paths to shape files, one forcing is generated for each.
+            directory: Directory in which the forcing of each shape is written
+                to a sub directory named after the shape file.
+                If not given each forcing gets a timestamped directory.
+            max_workers: Number of forcings to generate at the same time.
+                Defaults to the number of CPUs.
+                Ignored when executor is given.
+            executor: Executor to generate the forcings in. By default a
+                process pool with max_workers processes is used.
+            generate_options: Other arguments of :py:meth:`generate`,
+                like variables, postprocessor or subclass specific options.
+                Must be picklable when generating in other processes.
+
+        Returns:
+            For each shape in the same order the generated forcing,
+            or the exception raised while generating it.
+
+        Example:
+            To generate ERA5 forcing for all shape files in a directory::
+
+                from pathlib import Path
+                from ewatercycle.base.forcing import GenericLumpedForcing
+
+                forcings = GenericLumpedForcing.generate_many(
+                    dataset="ERA5",
+                    start_time="2000-01-01T00:00:00Z",
+                    end_time="2001-01-01T00:00:00Z",
+                    shapes=Path("catchments").glob("*.shp"),
+                    directory="forcings",
+                    max_workers=8,
+                )
+                failed = {
+                    shape: exc
+                    for shape, exc in forcings.items()
+                    if isinstance(exc, Exception)
+                }
+        """
+        shapes = list(dict.fromkeys(shapes))
+        if isinstance(dataset, str):
+            dataset = DATASETS[dataset]
+        elif isinstance(dataset, dict):
+            dataset = Dataset(**dataset)
+        directories: list[Path | None] = [None] * len(shapes)
+        if directory is not None:
+            directories = [
+                to_absolute_path(directory) / Path(shape).stem for shape in shapes
+            ]
+            if len(set(directories)) != len(directories):
+                msg = "Names of the shape files must be unique to share a directory."
+                raise ValueError(msg)
+
+        own_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                # Workers started with spawn do not share the in-memory config
+                initializer=_use_config,
+                initargs=(CFG.model_copy(),),
+            )
+        try:
+            futures = {
+                executor.submit(
+                    cls.generate,
+                    dataset,
+                    start_time,
+                    end_time,
+                    shape,
+                    str(shape_directory) if shape_directory else None,
+                    **generate_options,
+                ): shape
+                for shape, shape_directory in zip(shapes, directories, strict=True)
+            }
+            results: dict[str | Path, AnyForcing | Exception] = {}
+            for done, future in enumerate(as_completed(futures), start=1):
+                shape = futures[future]
+                exc = future.exception()
+                if exc is None:
+                    results[shape] = future.result()
+                    logger.info(f"Generated forcing {done}/{len(shapes)} for {shape}")
+                elif isinstance(exc, Exception):
+                    results[shape] = exc
+                    logger.error(f"Unable to generate forcing for {shape}: {exc}")
+                else:
+                    raise exc
+        finally:
+            if own_executor:
+                executor.shutdown(cancel_futures=True)
+        return {shape: results[shape] for shape in shapes}
+
+    def extend(
+        self,
+        end_time: str,
+        dataset: str | Dataset | dict,
+        variables: tuple[str, ...] = (),
+        postprocessor: Postprocessor | None = None,
+        directory: str | None = None,
+        **model_specific_options,
+    ) -> None:
+        """Extend this forcing to a later end time.
+
+        Only the years after the year of the current end time are generated
+        with ESMValTool. The new data is appended to the Zarr stores of this
+        forcing, or concatenated with its netCDF files into new files which
+        replace the old ones. Afterwards the end time and the
+        `ewatercycle_forcing.yaml` file are updated.
+
+        Args:
+            end_time: New end time of forcing in UTC and ISO format string e.g.
+                'YYYY-MM-DDTHH:MM:SSZ'.
+            dataset: Dataset the forcing was generated from,
+                see :py:meth:`generate`.
+            variables: Variables which need to be downloaded/preprocessed by
+                ESMValTool. Defaults to the variables of this forcing,
+                so must be given when a postprocessor derives variables.
+            postprocessor: Post-processor the forcing was generated with,
+                see :py:meth:`generate`.
+            directory: Directory in which ESMValTool should write the new part.
+                If not given will create timestamped directory.
+            model_specific_options: Subclass specific options
+                the forcing was generated with.
+
+        Example:
+            To extend ERA5 forcing with the next month::
+
+                forcing = GenericLumpedForcing.load("forcing")
+                forcing.extend("2021-02-01T00:00:00Z", dataset="ERA5")
+        """
+        if _in_forcing_cache(self.directory):
+            msg = (
+                f"Cannot extend forcing in the forcing cache {self.directory}, "
+                "generate it with a directory to get a copy which can be extended."
+            )
+            raise ValueError(msg)
+        old_end = get_time(self.end_time)
+        new_end = get_time(end_time)
+        if new_end <= old_end:
+            msg = f"End time {end_time} is not after end time {self.end_time}."
+            raise ValueError(msg)
+        # Recipes select whole years, so the current end year is already present
+        if new_end.year > old_end.year:
+            if self.shape is None:
+                msg = "Cannot extend forcing without shape."
+                raise ValueError(msg)
+            recipe = self._build_recipe(
+                start_time=datetime(old_end.year + 1, 1, 1, tzinfo=timezone.utc),
+                end_time=new_end,
+                shape=self.shape,
+                dataset=dataset,
+                variables=variables or self.variables(),
+                **model_specific_options,
+            )
+            recipe_output = self._run_recipe(
+                recipe, directory=Path(directory) if directory else None
+            )
+            if postprocessor is not None:
+                postprocessor(recipe_output)
+            new_directory = Path(recipe_output.pop("directory"))
+            missing = [var for var in self.filenames if var not in recipe_output]
+            if missing:
+                msg = f"Variables {missing} are missing in the new part of the forcing."
+                raise ValueError(msg)
+            self._append(
+                {var: new_directory / recipe_output[var] for var in self.filenames},
+                old_end.year,
+                new_end.year,
+            )
+        self.end_time = end_time
+        self.save()
+
+    def _append(self, new_files: dict[str, Path], old_year: int, new_year: int):
+        """Append the new files of each variable to the files of this forcing."""
+        filenames = dict(self.filenames)
+        replaced = []
+        for filename in dict.fromkeys(self.filenames.values()):
+            path = self.directory / filename
+            names = [var for var, name in self.filenames.items() if name == filename]
+            with ExitStack() as stack:
+                datasets = [
+                    stack.enter_context(xr.open_dataset(new_files[var], chunks="auto"))
+                    for var in names
+                ]
+                if filename.endswith(".zarr"):
+                    new = merge_esvmaltool_datasets(datasets)[names]
+                    new.drop_encoding().to_zarr(path, append_dim="time")
+                    continue
+                new = (
+                    datasets[0]
+                    if len(datasets) == 1
+                    else merge_esvmaltool_datasets(datasets)
+                )
+                old = stack.enter_context(xr.open_dataset(path, chunks="auto"))
+                target = self.directory / _extended_filename(
+                    filename, old_year, new_year
+                )
+                xr.concat(
+                    [old, new],
+                    dim="time",
+                    data_vars="minimal",
+                    coords="minimal",
+                    compat="override",
+                    join="override",
+                ).drop_encoding().to_netcdf(target)
+            filenames.update(dict.fromkeys(names, target.name))
+            replaced.append(path)
+        self.filenames = filenames
+        self.close()
+        # Unlinking is safe for files hard linked from the forcing cache
+        for path in replaced:
+            path.unlink()
+
     @classmethod
     def _recipe_output_to_forcing_arguments(cls, recipe_output, model_specific_options):
         return {
@@ -223,6 +635,12 @@ class DefaultForcing(BaseModel):
         if self.directory is None:
             msg = "Cannot save forcing without directory."
             raise ValueError(msg)
+        if _in_forcing_cache(self.directory):
+            msg = (
+                f"Cannot save forcing in the forcing cache {self.directory}, "
+                "generate it with a directory to get a copy which can be saved."
+            )
+            raise ValueError(msg)
         target = self.directory / FORCING_YAML
         # We want to make the yaml and its parent movable,
         # so the directory should not be included in the yaml file
@@ -251,6 +669,8 @@ class DefaultForcing(BaseModel):
             clone.shape = clone.shape.relative_to(clone.directory)
 
         fdict = clone.model_dump(exclude={"directory"}, exclude_none=True, mode="json")
+        # Write a new file, the old one can be hard linked from the forcing cache
+        target.unlink(missing_ok=True)
         with target.open("w") as f:
             yaml.dump(fdict, f)
         return target
@@ -286,20 +706,120 @@ class DefaultForcing(BaseModel):
         return cls(**fdict)
 
     def to_xarray(self) -> xr.Dataset:
-        """Return this Forcing object as an xarray Dataset."""
+        """Return this Forcing object as an xarray Dataset.
+
+        The files are opened lazily and merged on the first call. Later calls
+        return the same merged data until the directory or filenames change.
+        The files stay open until :py:meth:`close` is called or this object
+        is garbage collected.
+
+        Files can be netCDF files or Zarr stores (ending with `.zarr`).
+        Several variables can be read from the same Zarr store,
+        see :py:meth:`to_zarr`.
+        """
         if len(self.filenames) == 0:
             msg = "There are no variables stored in this Forcing object."
             raise ValueError(msg)
-        if not all(fname.endswith(".nc") for _, fname in self.filenames.items()):
+        if not all(
+            fname.endswith((".nc", ".zarr")) for fname in self.filenames.values()
+        ):
+            msg = (
+                "Not all files are netCDF files or Zarr stores. Only netCDF files and "
+                "Zarr stores can be opened as an xarray Dataset."
+            )
+            raise ValueError(msg)
+        key = (self.directory, tuple(self.filenames.items()))
+        entry = _open_datasets.get(id(self))
+        if entry is None or entry.key != key:
+            self.close()
+            stores: dict[str, xr.Dataset] = {}
+            sources = []
+            datasets = []
+            for var, filename in self.filenames.items():
+                if filename.endswith(".zarr"):
+                    if filename not in stores:
+                        stores[filename] = xr.open_zarr(self.directory / filename)
+                        sources.append(stores[filename])
+                    datasets.append(stores[filename][[var]])
+                else:
+                    fpath = self.directory / filename
+                    datasets.append(xr.open_dataset(fpath, chunks="auto"))
+                    sources.append(datasets[-1])
+            entry = _OpenDataset(key, merge_esvmaltool_datasets(datasets), sources)
+            _open_datasets[id(self)] = entry
+            weakref.finalize(self, _close_dataset, id(self))
+        # Shallow copy so callers can add or drop variables without
+        # changing the cached dataset
+        return entry.merged.copy(deep=False)
+
+    def close(self) -> None:
+        """Close the files opened by :py:meth:`to_xarray`.
+
+        Needed before the files can be removed or overwritten on some
+        platforms. The next call of to_xarray opens the files again.
+        """
+        _close_dataset(id(self))
+
+    def to_zarr(
+        self: AnyForcing,
+        path: str | Path = "forcing.zarr",
+        chunks: dict[str, int] | None = None,
+    ) -> AnyForcing:
+        """Write all variables of this forcing to a single Zarr store.
+
+        Requires the `zarr` package.
+        By default each chunk of the store holds the whole time series of
+        a block of 16 by 16 grid cells, so reading the time series of a cell
+        or a basin only reads a few chunks.
+
+        Args:
+            path: Path of the Zarr store to write.
+                If relative then it is relative to the directory of this forcing.
+                Must not be a store this forcing reads from, as it is
+                overwritten.
+            chunks: Chunk size of each dimension, -1 for the whole dimension.
+                Dimensions not given get a chunk size of 16,
+                except time which is not split.
+
+        Returns:
+            Copy of this forcing which reads from the Zarr store.
+            Call its :py:meth:`save` to store it for :py:meth:`load`.
+
+        Example:
+            To convert a forcing of netCDF files to Zarr::
+
+                forcing = GenericDistributedForcing.load("forcing")
+                forcing.to_zarr().save()
+        """
+        store = to_absolute_path(path, parent=self.directory, must_be_in_parent=False)
+        if store.suffix != ".zarr":
+            msg = f"Zarr store {store} must have .zarr extension."
+            raise ValueError(msg)
+        sources = {
+            (self.directory / filename).resolve()
+            for filename in self.filenames.values()
+        }
+        if store.resolve() in sources:
             msg = (
-                "Not all files are netCDF files. Only netCDF files can be opened as "
-                "an xarray Dataset."
+                f"Zarr store {store} is read by this forcing, write it to another path."
             )
             raise ValueError(msg)
-        fpaths = [self.directory / filename for _, filename in self.filenames.items()]
+        ds = self.to_xarray().drop_encoding()
+        dims_chunks = {
+            dim: -1 if dim == "time" else _ZARR_CHUNK_SIZE for dim in ds.dims
+        }
+        dims_chunks.update(chunks or {})
+        ds = ds.chunk(
+            {dim: size for dim, size in dims_chunks.items() if dim in ds.dims}
+        )
+        ds.to_zarr(store, mode="w")
 
-        datasets = [xr.open_dataset(fpath, chunks="auto") for fpath in fpaths]
-        return merge_esvmaltool_datasets(datasets)
+        return self.model_copy(
+            update={
+                "directory": store.parent,
+                "filenames": dict.fromkeys(self.filenames, store.name),
+            }
+        )
 
     def variables(self) -> tuple[str, ...]:
         """Return the names of the variables.
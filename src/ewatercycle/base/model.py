@@ -1,20 +1,24 @@
 """Base classes for eWaterCycle models."""
 
 import abc
+import asyncio
 import datetime
 import inspect
 import logging
-from collections.abc import ItemsView, Iterable
+from collections import OrderedDict
+from collections.abc import Callable, ItemsView, Iterable, Mapping, Sequence
+from concurrent.futures import Executor, ThreadPoolExecutor
 from contextlib import suppress
 from datetime import timezone
+from functools import cached_property
 from pathlib import Path
-from typing import Annotated, Any, Literal, cast
+from typing import Annotated, Any, Literal, NamedTuple, TypeVar
 
 import bmipy
 import numpy as np
 import xarray as xr
 import yaml
-from cftime import num2pydate
+from cftime import date2num, num2pydate
 from grpc4bmi.bmi_optionaldest import OptionalDestBmi
 from pydantic import (
     BaseModel,
@@ -26,15 +30,169 @@ from pydantic import (
 
 from ewatercycle.base.forcing import DefaultForcing
 from ewatercycle.base.parameter_set import ParameterSet
-from ewatercycle.config import CFG
-from ewatercycle.container import ContainerImage, start_container
-from ewatercycle.util import find_closest_point, to_absolute_path
+from ewatercycle.base.recorder import OutputRecorder
+from ewatercycle.config import CFG, ContainerResources
+from ewatercycle.container import (
+    ContainerImage,
+    ProfilingBmi,
+    batch_get_values,
+    batch_set_values,
+    start_container,
+)
+from ewatercycle.util import NearestGridPointIndex, get_time, to_absolute_path
 
 logger = logging.getLogger(__name__)
 
 
 ISO_TIMEFMT = r"%Y-%m-%dT%H:%M:%SZ"
 
+T = TypeVar("T")
+
+_INDICES_CACHE_SIZE = 128
+"""Maximum number of requested point sets of which the indices are memoized."""
+
+
+class GridDescriptor(NamedTuple):
+    """Geometry of a BMI grid.
+
+    The arrays are read-only as they are shared by all callers.
+    """
+
+    lat: np.ndarray
+    """Latitude of the grid nodes, taken from BMI's y."""
+    lon: np.ndarray
+    """Longitude of the grid nodes, taken from BMI's x."""
+    shape: np.ndarray
+    """Shape of the grid."""
+
+
+_SECONDS_PER_TIME_UNIT = {
+    "microseconds": 1e-6,
+    "milliseconds": 1e-3,
+    "seconds": 1,
+    "second": 1,
+    "secs": 1,
+    "sec": 1,
+    "s": 1,
+    "minutes": 60,
+    "minute": 60,
+    "mins": 60,
+    "min": 60,
+    "hours": 3600,
+    "hour": 3600,
+    "hrs": 3600,
+    "hr": 3600,
+    "h": 3600,
+    "days": 86400,
+    "day": 86400,
+    "d": 86400,
+}
+
+
+class TimeAxis:
+    """Time axis of a model run.
+
+    Parses the UDUNITS time units of a model once, so model times can be
+    converted to datetimes with plain numpy arithmetic.
+
+    The start, end and time step are only fetched from the BMI when first
+    used, so converting times also works for models which do not implement
+    `get_time_step`, like models with an irregular time step.
+
+    Args:
+        bmi: Initialized BMI to get the start, end and time step from.
+        units: Time units of the model, e.g. 'days since 1970-01-01'.
+        calendar: Calendar of the time units.
+        epoch: Reference time of the time units.
+        unit: Duration of one model time unit.
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        bmi: bmipy.Bmi,
+        units: str,
+        calendar: str,
+        epoch: np.datetime64,
+        unit: np.timedelta64,
+    ):
+        self._bmi = bmi
+        self.units = units
+        self.calendar = calendar
+        self.epoch = epoch
+        self.unit = unit
+
+    @classmethod
+    def from_bmi(cls, bmi: bmipy.Bmi, calendar: str = "standard") -> "TimeAxis":
+        """Build the time axis of an initialized BMI.
+
+        Args:
+            bmi: BMI to get the time units of.
+            calendar: Calendar of the time units.
+
+        Raises:
+            ValueError: When the time units are not
+                `<unit> since <reference time>` formatted with a fixed length
+                unit like seconds, hours or days.
+        """
+        units = str(bmi.get_time_units())
+        unit_name, since, _ = units.partition(" since ")
+        seconds = _SECONDS_PER_TIME_UNIT.get(unit_name.strip().lower())
+        if not since or seconds is None:
+            msg = (
+                f"Time units '{units}' are not supported, expected "
+                "'<seconds|minutes|hours|days> since <reference time>'."
+            )
+            raise ValueError(msg)
+        epoch = np.datetime64(num2pydate(0, units, calendar=calendar), "us")
+        return cls(
+            bmi=bmi,
+            units=units,
+            calendar=calendar,
+            epoch=epoch,
+            unit=np.timedelta64(round(seconds * 1_000_000), "us"),
+        )
+
+    @cached_property
+    def start(self) -> float:
+        """Start time of the model in model time units."""
+        return self._bmi.get_start_time()
+
+    @cached_property
+    def end(self) -> float:
+        """End time of the model in model time units."""
+        return self._bmi.get_end_time()
+
+    @cached_property
+    def step(self) -> float:
+        """Time step of the model in model time units."""
+        return self._bmi.get_time_step()
+
+    def to_datetime64(self, times: Any) -> np.ndarray:
+        """Convert model times to datetime64 values.
+
+        Args:
+            times: Scalar or array of times in model time units.
+        """
+        microseconds = np.asarray(times, dtype=np.float64) * (
+            self.unit / np.timedelta64(1, "us")
+        )
+        return self.epoch + np.rint(microseconds).astype("timedelta64[us]")
+
+    def to_datetime(self, time: float) -> datetime.datetime:
+        """Convert a model time to a datetime object."""
+        return self.to_datetime64(time).item()
+
+    @property
+    def times(self) -> np.ndarray:
+        """All times from start to end of the model in model time units."""
+        nr_steps = round((self.end - self.start) / self.step)
+        return self.start + self.step * np.arange(nr_steps + 1)
+
+    @property
+    def index(self) -> np.ndarray:
+        """All times from start to end of the model as datetime64 values."""
+        return self.to_datetime64(self.times)
+
 
 class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
     """Base functionality for eWaterCycle models.
@@ -50,6 +208,25 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
 
     _cfg_dir: Path = PrivateAttr()
     _cfg_file: Path = PrivateAttr()
+    _setup_kwargs: dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    # Nearest neighbour index per grid id and flat indices per requested points
+    _spatial_indices: dict[int, NearestGridPointIndex] = PrivateAttr(
+        default_factory=dict
+    )
+    _indices_cache: OrderedDict[tuple, np.ndarray] = PrivateAttr(
+        default_factory=OrderedDict
+    )
+    # Grid geometry is fixed after initialize, so only fetch it once
+    _var_grids: dict[str, int] = PrivateAttr(default_factory=dict)
+    _grids: dict[int, GridDescriptor] = PrivateAttr(default_factory=dict)
+    _recorders: list[OutputRecorder] = PrivateAttr(default_factory=list)
+    _reuse_value_buffers: bool = PrivateAttr(default=False)
+    _value_buffers: dict[str, np.ndarray] = PrivateAttr(default_factory=dict)
+    _time_axis: TimeAxis | None = PrivateAttr(default=None)
+    # Whether update_until works, None until it is tried
+    _update_until_supported: bool | None = PrivateAttr(default=None)
+    _initialized: bool = PrivateAttr(default=False)
 
     @property
     def version(self) -> str:
@@ -117,6 +294,7 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
             Path to config file and path to config directory
         """
         self._cfg_dir: Path = self._make_cfg_dir(cfg_dir)
+        self._setup_kwargs = kwargs
         self._cfg_file: Path = self._make_cfg_file(**kwargs)
         self._bmi = self._make_bmi_instance()
 
@@ -167,28 +345,238 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
         Args:
             config_file: Name of initialization file.
         """
+        self._clear_caches()
         self._bmi.initialize(config_file)
+        self._initialized = True
 
     def finalize(self) -> None:
         """Perform tear-down tasks for the model.
 
         After finalization, the model should not be used anymore.
+        Any active recorders are closed.
         """
+        self.stop_recording()
         self._bmi.finalize()
         del self._bmi
+        self._initialized = False
+        self._clear_caches()
+
+    def reset(self, config_file: str | None = None, **kwargs) -> str:
+        """Initialize the model again with a new config in the same BMI instance.
+
+        The model is finalized and initialized again without starting a new
+        one. A containerized model keeps running in the same container, with
+        the same connection and mounts. Useful for calibration where only
+        parameters change between runs. Any active recorders are closed.
+
+        Args:
+            config_file: Config file to initialize with. For a containerized
+                model it must be readable inside the container, for example
+                by being in the config directory.
+            **kwargs: Named arguments like the ones of :py:meth:`setup`.
+                Merged over the arguments given to :py:meth:`setup` to write
+                a new config file in the config directory.
+                Without config_file and arguments the current config file
+                is used.
+
+        Returns:
+            Path to config file the model was initialized with.
+
+        Raises:
+            ValueError: When both config_file and named arguments are given.
+
+        Example:
+            To run a model with different parameters in the same container::
+
+                model.setup()
+                for parameters in parameter_sets:
+                    model.reset(parameters=parameters)
+                    discharge = model.run_until(outputs=["Q"])
+        """
+        if config_file is not None and kwargs:
+            msg = "Give either a config file or arguments to write one, not both."
+            raise ValueError(msg)
+        if config_file is None:
+            if kwargs:
+                self._cfg_file = self._make_cfg_file(**{**self._setup_kwargs, **kwargs})
+            config_file = str(self._cfg_file)
+        self.stop_recording()
+        if self._initialized:
+            self._bmi.finalize()
+            self._initialized = False
+        self.initialize(config_file)
+        return config_file
+
+    def _clear_caches(self) -> None:
+        """Forget everything derived from the BMI of the previous run."""
+        self._spatial_indices.clear()
+        self._indices_cache.clear()
+        self._var_grids.clear()
+        self._grids.clear()
+        self._value_buffers.clear()
+        self._time_axis = None
+        self._update_until_supported = None
 
     def update(self) -> None:
         """Advance model state by one time step."""
         self._bmi.update()
+        for recorder in self._recorders:
+            recorder.append()
+
+    def record(
+        self, variables: Iterable[str], store: str | Path, chunks: int = 16
+    ) -> OutputRecorder:
+        """Record variables to disk after each update.
+
+        The values are appended to a chunked NetCDF file, or to a Zarr store when
+        the path ends with `.zarr`, by a background thread. Only `chunks` time
+        slices are kept in memory, so long runs do not grow the memory use.
+
+        Args:
+            variables: Names of the variables to record.
+                All variables must be on the same grid.
+            store: Path of the NetCDF file or Zarr store to write.
+            chunks: Number of time slices per chunk in the store.
+
+        Returns:
+            The recorder. Is closed on finalize or with :py:meth:`stop_recording`.
+
+        Example:
+            To record the discharge of a model during a whole run::
 
-    def get_value(self, name: str) -> np.ndarray:
+                model.initialize(cfg_file)
+                model.record(["discharge"], "discharge.nc")
+                while model.time < model.end_time:
+                    model.update()
+                model.finalize()
+                ds = xr.open_dataset("discharge.nc")
+        """
+        recorder = OutputRecorder(self, variables, store, chunks=chunks)
+        self._recorders.append(recorder)
+        return recorder
+
+    def stop_recording(self) -> None:
+        """Write remaining output of all recorders and close them."""
+        recorders = self._recorders
+        self._recorders = []
+        for recorder in recorders:
+            recorder.close()
+
+    def get_value(self, name: str, out: np.ndarray | None = None) -> np.ndarray:
         """Get a copy of values of the given variable.
 
+        By default a new array is allocated on each call.
+        After :py:meth:`reuse_value_buffers` the values are written into
+        one preallocated array per variable instead.
+
         Args:
             name: Name of variable
+            out: Optional C-contiguous array to write the values into.
+                Must have the size and type of the variable.
+
+        Returns:
+            Array with the values. Is `out` when given.
         """
+        if out is not None:
+            if not out.flags.c_contiguous:
+                msg = "The out array must be C-contiguous."
+                raise ValueError(msg)
+            self._bmi.get_value(name, out.reshape(-1))
+            return out
+        if self._reuse_value_buffers:
+            return self._bmi.get_value(name, self._value_buffer(name))
         return self._bmi.get_value(name)
 
+    def get_values(self, names: Iterable[str]) -> dict[str, np.ndarray]:
+        """Get copies of the values of several variables at once.
+
+        When the model exchanges values through shared memory, all values
+        are fetched in a single round trip, see
+        :py:func:`ewatercycle.container.batch_get_values`.
+        Values the wrappers of the model have cached are not fetched again.
+
+        Args:
+            names: Names of the variables.
+
+        Returns:
+            Dictionary with an array of values for each variable.
+        """
+        return batch_get_values(self._bmi, names)
+
+    def reuse_value_buffers(self, enable: bool = True) -> None:
+        """Let :py:meth:`get_value` fill one preallocated array per variable.
+
+        Saves an allocation per variable per time step for large grids.
+        The array returned by :py:meth:`get_value` is then overwritten by the
+        next call for the same variable, so copy it if it needs to be kept.
+
+        Args:
+            enable: Whether to reuse buffers. When False buffers are freed and
+                a new array is allocated on every call again.
+        """
+        self._reuse_value_buffers = enable
+        if not enable:
+            self._value_buffers.clear()
+
+    def profile_bmi(self) -> None:
+        """Start recording the latency of every BMI call of the model.
+
+        The most inner BMI object is wrapped in a
+        :py:class:`~ewatercycle.container.ProfilingBmi`. For a containerized
+        model that is the client talking to the container, so the latencies
+        include transferring the data. Should be called after :py:meth:`setup`.
+        Use :py:meth:`bmi_stats` to get the statistics.
+        """
+        if self._profiling_bmi() is not None:
+            return
+        if not hasattr(self._bmi, "origin"):
+            self._bmi = ProfilingBmi(self._bmi)  # type: ignore[assignment]
+            return
+        wrapper = self._bmi
+        while hasattr(wrapper.origin, "origin"):
+            wrapper = wrapper.origin
+        wrapper.origin = ProfilingBmi(wrapper.origin)
+
+    def bmi_stats(self, csv_file: str | Path | None = None) -> dict[str, dict]:
+        """Statistics of the BMI calls since :py:meth:`profile_bmi`.
+
+        Args:
+            csv_file: When given, also write the statistics to this CSV file.
+
+        Returns:
+            Dictionary with per called BMI method the count, total, mean, p50,
+            p90, p99 and max latency in seconds and the nbytes of array data
+            transferred.
+
+        Raises:
+            ValueError: When the BMI calls of the model are not profiled.
+        """
+        profiler = self._profiling_bmi()
+        if profiler is None:
+            msg = "BMI calls are not profiled, call `model.profile_bmi()` first."
+            raise ValueError(msg)
+        if csv_file is not None:
+            profiler.to_csv(to_absolute_path(csv_file))
+        return profiler.stats()
+
+    def _profiling_bmi(self) -> ProfilingBmi | None:
+        bmi: Any = self._bmi
+        while True:
+            if isinstance(bmi, ProfilingBmi):
+                return bmi
+            if not hasattr(bmi, "origin"):
+                return None
+            bmi = bmi.origin
+
+    def _value_buffer(self, name: str) -> np.ndarray:
+        if name not in self._value_buffers:
+            itemsize = self._bmi.get_var_itemsize(name)
+            size = self._bmi.get_var_nbytes(name) // itemsize
+            self._value_buffers[name] = np.empty(
+                size, dtype=self._bmi.get_var_type(name)
+            )
+        return self._value_buffers[name]
+
     def get_value_at_coords(
         self, name, lat: Iterable[float], lon: Iterable[float]
     ) -> np.ndarray:
@@ -200,7 +588,6 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
             lon: Longitudinal value
         """
         indices = self._coords_to_indices(name, lat, lon)
-        indices = np.array(indices)
         return self._bmi.get_value_at_indices(name, indices)
 
     def set_value(self, name: str, value: np.ndarray) -> None:
@@ -212,6 +599,17 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
         """
         self._bmi.set_value(name, value)
 
+    def set_values(self, values: Mapping[str, np.ndarray]) -> None:
+        """Specify new values for several model variables at once.
+
+        The values are set in the given order. When the model exchanges values
+        through shared memory, all values are sent in a single round trip.
+
+        Args:
+            values: The new value for each variable.
+        """
+        batch_set_values(self._bmi, values)
+
     def set_value_at_coords(
         self, name: str, lat: Iterable[float], lon: Iterable[float], values: np.ndarray
     ) -> None:
@@ -224,36 +622,111 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
             values: The new value for the specified variable.
         """
         indices = self._coords_to_indices(name, lat, lon)
-        indices = np.array(indices)
         self._bmi.set_value_at_indices(name, indices, values)
 
+    def save_state(self, path: str | Path) -> Path:
+        """Save a snapshot of the model state to a NetCDF file.
+
+        The values of all input and output variables are stored together with
+        the current time, so a spun-up state can seed many later runs with
+        :py:meth:`load_state`.
+
+        Args:
+            path: Path of the NetCDF file to write.
+
+        Returns:
+            Absolute path of the written file.
+        """
+        target = to_absolute_path(path)
+        names = dict.fromkeys([*self.input_var_names, *self.output_var_names])
+        ds = xr.Dataset(
+            {name: ((f"{name}_index",), self._bmi.get_value(name)) for name in names},
+            attrs={
+                "time": self.time,
+                "time_units": self.time_units,
+            },
+        )
+        encoding = {name: {"zlib": True, "complevel": 4} for name in names}
+        ds.to_netcdf(target, encoding=encoding)
+        return target
+
+    def load_state(self, path: str | Path) -> None:
+        """Restore a model state saved with :py:meth:`save_state`.
+
+        Should be called after :py:meth:`initialize`. Every saved variable is
+        set on the model. Output variables that the model does not allow to be
+        set are skipped with a warning.
+
+        Args:
+            path: Path of the NetCDF file written by :py:meth:`save_state`.
+        """
+        source = to_absolute_path(path, must_exist=True)
+        inputs = set(self.input_var_names)
+        with xr.open_dataset(source) as ds:
+            saved_time = ds.attrs["time"]
+            saved_units = ds.attrs["time_units"]
+            for name, da in ds.data_vars.items():
+                value = da.to_numpy().astype(self._bmi.get_var_type(name))
+                if name in inputs:
+                    self._bmi.set_value(name, value)
+                    continue
+                try:
+                    self._bmi.set_value(name, value)
+                except Exception:  # noqa: BLE001
+                    logger.warning(f"Unable to restore output variable {name}")
+        if saved_time != self.time:
+            logger.info(
+                f"Restored state saved at time {saved_time} {saved_units}"
+                f" into model at time {self.time} {self.time_units}"
+            )
+
     def _coords_to_indices(
         self, name: str, lat: Iterable[float], lon: Iterable[float]
-    ) -> Iterable[int]:
+    ) -> np.ndarray:
         """Convert lat/lon values to index.
 
+        The nearest neighbour index of a grid is built once and the flat
+        indices of the most recently requested points are memoized, so
+        repeated calls with the same coordinates do not search the grid again.
+        The returned array is read-only as it is shared between calls.
+
         Args:
             name: Name of variable
             lat: Latitudinal value
             lon: Longitudinal value
         """
-        grid_lat, grid_lon, shape = self.get_latlon_grid(name)
-
-        indices = []
-        for point_lon, point_lat in zip(lon, lat, strict=False):
-            idx_lon, idx_lat = find_closest_point(
-                grid_lon, grid_lat, point_lon, point_lat
-            )
-            idx_flat = cast("int", np.ravel_multi_index((idx_lat, idx_lon), shape))
-            indices.append(idx_flat)
+        grid_id = self._get_var_grid(name)
+        lat = tuple(lat)
+        lon = tuple(lon)
+        # Like zip, extra coordinates of the longer sequence are ignored
+        nr_points = min(len(lat), len(lon))
+        lat = lat[:nr_points]
+        lon = lon[:nr_points]
+        key = (grid_id, lat, lon)
+        if key in self._indices_cache:
+            self._indices_cache.move_to_end(key)
+            return self._indices_cache[key]
 
+        grid_lat, grid_lon, shape = self.get_latlon_grid(name)
+        if grid_id not in self._spatial_indices:
+            self._spatial_indices[grid_id] = NearestGridPointIndex(grid_lon, grid_lat)
+        idx_lon, idx_lat = self._spatial_indices[grid_id].query(lon, lat)
+        indices = np.ravel_multi_index((idx_lat, idx_lon), shape)
+
+        for point_lon, point_lat, ilon, ilat in zip(
+            lon, lat, idx_lon, idx_lat, strict=False
+        ):
             message = f"""
                 Requested point was lon: {point_lon}, lat: {point_lat};
-                closest grid point is {grid_lon[idx_lon]:.2f}, {grid_lat[idx_lat]:.2f}.
+                closest grid point is {grid_lon[ilon]:.2f}, {grid_lat[ilat]:.2f}.
                 """
 
             logger.debug(message)
 
+        indices.setflags(write=False)
+        self._indices_cache[key] = indices
+        if len(self._indices_cache) > _INDICES_CACHE_SIZE:
+            self._indices_cache.popitem(last=False)
         return indices
 
     def get_value_as_xarray(self, name: str) -> xr.DataArray:
@@ -291,6 +764,105 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
 
         return da.where(da != -999)
 
+    def run_until(
+        self,
+        end_time: float | str | None = None,
+        outputs: Iterable[str] = (),
+        every: int = 1,
+    ) -> xr.Dataset:
+        """Advance the model to end_time while collecting output variables.
+
+        The requested variables are written into arrays which are allocated
+        once before the run, so no intermediate xarray objects are made.
+        When `every` is larger than 1 the model is advanced with
+        `update_until`, falling back to repeated `update` calls if the BMI
+        does not implement it.
+
+        Args:
+            end_time: Time to run the model until. Either in model time units or
+                as UTC ISO format string e.g. 'YYYY-MM-DDTHH:MM:SSZ'.
+                Defaults to the end time of the model.
+            outputs: Names of the variables to collect.
+            every: Collect the outputs every `every` time steps.
+
+        Returns:
+            Dataset with a (time, latitude, longitude) variable per output.
+
+        Example:
+            To run a model for its whole period and collect the discharge
+            every 7 days for a daily model::
+
+                model.initialize(cfg_file)
+                ds = model.run_until(outputs=["discharge"], every=7)
+                model.finalize()
+        """
+        if every < 1:
+            msg = f"every must be a positive integer, got {every}"
+            raise ValueError(msg)
+        if end_time is None:
+            end_time = self.time_axis.end
+        elif isinstance(end_time, str):
+            end_time = float(date2num(get_time(end_time), self.time_units))
+
+        interval = every * self.time_step
+        nr_samples = max(int(np.floor((end_time - self.time) / interval + 1e-9)), 0)
+
+        grids = {name: self.get_latlon_grid(name) for name in outputs}
+        buffers = {
+            name: np.empty((nr_samples, *grid[2]), dtype=self._bmi.get_var_type(name))
+            for name, grid in grids.items()
+        }
+        times = np.empty(nr_samples, dtype=np.float64)
+
+        for index in range(nr_samples):
+            self._advance_to(self.time + interval, every)
+            times[index] = self.time
+            for name, buffer in buffers.items():
+                self._bmi.get_value(name, buffer[index].reshape(-1))
+        if self.time < end_time:
+            self._advance_to(end_time, every)
+
+        datetimes = self.time_axis.to_datetime64(times)
+        data_vars = {}
+        for name, (lat, lon, _) in grids.items():
+            da = xr.DataArray(
+                data=buffers[name],
+                coords={"longitude": lon, "latitude": lat, "time": datetimes},
+                dims=["time", "latitude", "longitude"],
+                name=name,
+                attrs={"units": self.var_units(name)},
+            )
+            data_vars[name] = da.where(da != -999)
+        return xr.Dataset(data_vars)
+
+    def _advance_to(self, time: float, nr_steps: int) -> None:
+        """Advance the model to the given time.
+
+        Uses a single `update_until` call when more than one step is needed
+        and the BMI supports it. Clients of containerized models raise their
+        own RPC or HTTP error when the model does not implement it, so any
+        error which leaves the model time unchanged is taken to mean it is
+        not supported and `update` is used from then on.
+        """
+        # Recorders need to see every time step
+        supported = self._update_until_supported is not False
+        if nr_steps > 1 and not self._recorders and supported:
+            start = self.time
+            try:
+                self._bmi.update_until(time)
+            except Exception:
+                if self.time != start:
+                    raise
+                logger.debug(
+                    "update_until is not supported, using update", exc_info=True
+                )
+                self._update_until_supported = False
+            else:
+                self._update_until_supported = True
+                return
+        while self.time < time:
+            self.update()
+
     @property
     def bmi(self) -> bmipy.Bmi:
         """Bmi class wrapped by the model."""
@@ -362,33 +934,35 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
         """
         return self.time_as_datetime.strftime(ISO_TIMEFMT)
 
+    @property
+    def time_axis(self) -> TimeAxis:
+        """Time axis of the model run.
+
+        Built from the BMI on first access and cached until the model is
+        initialized again or finalized.
+        """
+        if self._time_axis is None:
+            self._time_axis = TimeAxis.from_bmi(self._bmi)
+        return self._time_axis
+
     @property
     def start_time_as_datetime(self) -> datetime.datetime:
         """Start time of the model as a datetime object."""
-        return num2pydate(
-            self._bmi.get_start_time(),
-            self._bmi.get_time_units(),
-        )
+        return self.time_axis.to_datetime(self.time_axis.start)
 
     @property
     def end_time_as_datetime(self) -> datetime.datetime:
         """End time of the model as a datetime object'."""
-        return num2pydate(
-            self._bmi.get_end_time(),
-            self._bmi.get_time_units(),
-        )
+        return self.time_axis.to_datetime(self.time_axis.end)
 
     @property
     def time_as_datetime(self) -> datetime.datetime:
         """Current time of the model as a datetime object'."""
         # TODO some bmi implementations like Wflow.jl returns 'd'
         # which can not be converted to a datetime object
-        # as nupmy2date expects a
+        # as the time axis expects a
         # `<time units> since <reference time>` formatted string
-        return num2pydate(
-            self._bmi.get_current_time(),
-            self._bmi.get_time_units(),
-        )
+        return self.time_axis.to_datetime(self._bmi.get_current_time())
 
     def get_latlon_grid(self, name) -> tuple[Any, Any, Any]:
         """Grid latitude, longitude and shape for variable.
@@ -399,14 +973,31 @@ class eWaterCycleModel(BaseModel, abc.ABC):  # noqa: N801
         Some models may deviate from this default. They can provide their own
         implementation or use a BMI wrapper as in the wflow and pcrglob examples.
 
+        The grid is only fetched from the BMI on the first call,
+        afterwards it is taken from a cache which is cleared on finalize.
+
         Args:
             name: Name of the variable
         """
-        grid_id = self._bmi.get_var_grid(name)
-        shape = self._bmi.get_grid_shape(grid_id)
-        grid_lon = self._bmi.get_grid_x(grid_id)
-        grid_lat = self._bmi.get_grid_y(grid_id)
-        return grid_lat, grid_lon, shape
+        grid = self._get_grid(self._get_var_grid(name))
+        return grid.lat, grid.lon, grid.shape
+
+    def _get_var_grid(self, name: str) -> int:
+        if name not in self._var_grids:
+            self._var_grids[name] = self._bmi.get_var_grid(name)
+        return self._var_grids[name]
+
+    def _get_grid(self, grid_id: int) -> GridDescriptor:
+        if grid_id not in self._grids:
+            grid = GridDescriptor(
+                lat=self._bmi.get_grid_y(grid_id),
+                lon=self._bmi.get_grid_x(grid_id),
+                shape=self._bmi.get_grid_shape(grid_id),
+            )
+            for array in (grid.lat, grid.lon, grid.shape):
+                array.flags.writeable = False
+            self._grids[grid_id] = grid
+        return self._grids[grid_id]
 
 
 class LocalModel(eWaterCycleModel):
@@ -436,10 +1027,15 @@ class ContainerizedModel(eWaterCycleModel):
     """eWaterCycle model running inside a container.
 
     This is the recommended method for sharing eWaterCycle models.
+
+    The CPUs, cores, memory and threads the container may use can be set with
+    `resources`, by default :py:attr:`CFG.container_resources
+    <ewatercycle.config.Configuration.container_resources>` is used.
     """
 
     bmi_image: Annotated[ContainerImage, BeforeValidator(_parse_containerimage)]
     protocol: Literal["grpc", "openapi"] = "grpc"
+    resources: ContainerResources | None = None
 
     # Create as empty list to allow models to append before bmi is made:
     _additional_input_dirs: list[str] = PrivateAttr([])
@@ -479,10 +1075,166 @@ class ContainerizedModel(eWaterCycleModel):
         if self.forcing:
             self._additional_input_dirs.append(str(self.forcing.directory))
 
-        return start_container(
+        bmi = start_container(
             image=self.bmi_image,
             protocol=self.protocol,
             work_dir=self._cfg_dir,
             input_dirs=self._additional_input_dirs,
-            timeout=300,
+            resources=self.resources,
         )
+        if self._cfg_dir.is_symlink():
+            # A pooled container has its own work dir, the config dir points to it
+            cfg_dir = self._cfg_dir.resolve()
+            if self._cfg_file.is_relative_to(self._cfg_dir):
+                self._cfg_file = cfg_dir / self._cfg_file.relative_to(self._cfg_dir)
+            self._cfg_dir = cfg_dir
+        return bmi
+
+
+def setup_many(
+    models: Sequence[eWaterCycleModel],
+    cfg_dir: str | Path | None = None,
+    max_workers: int | None = None,
+    **kwargs,
+) -> list[tuple[str, str] | Exception]:
+    """Setup many models at the same time.
+
+    The containers of containerized models are started and probed until they
+    are ready in parallel, so the setup takes about as long as the slowest
+    container to start. A model which fails to setup does not stop the others.
+
+    Args:
+        models: Models to setup.
+        cfg_dir: Directory in which each model gets its own config directory
+            called `model_<index>`. If not given then a time-stamped directory
+            inside ewatercycle.CFG['output_dir'] is used.
+        max_workers: Number of models to setup at the same time.
+            Defaults to the number of models.
+        **kwargs: Named arguments passed to the setup of each model.
+
+    Returns:
+        For each model in the same order the path to its config file and config
+        directory, or the exception raised during its setup.
+
+    Example:
+        To setup an ensemble of 100 models and drop the members which failed::
+
+            from ewatercycle.base.model import setup_many
+
+            models = [HBV(forcing=forcing) for _ in range(100)]
+            results = setup_many(models, parameters=parameters)
+            members = [
+                model
+                for model, result in zip(models, results)
+                if not isinstance(result, Exception)
+            ]
+    """
+    if not models:
+        return []
+    if cfg_dir is not None:
+        parent = to_absolute_path(cfg_dir)
+    else:
+        timestamp = datetime.datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+        folder_prefix = models[0].__class__.__name__.lower()
+        parent = to_absolute_path(
+            f"{folder_prefix}_many_{timestamp}", parent=CFG.output_dir
+        )
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers or len(models),
+        thread_name_prefix="ewatercycle-setup-many",
+    ) as executor:
+        futures = [
+            executor.submit(
+                model.setup, cfg_dir=str(parent / f"model_{index}"), **kwargs
+            )
+            for index, model in enumerate(models)
+        ]
+
+    results: list[tuple[str, str] | Exception] = []
+    for index, future in enumerate(futures):
+        exc = future.exception()
+        if exc is None:
+            results.append(future.result())
+        elif isinstance(exc, Exception):
+            logger.error(f"Unable to setup model {index}: {exc}")
+            results.append(exc)
+        else:
+            raise exc
+    return results
+
+
+class AsyncModel:
+    """Asyncio facade of an eWaterCycle model.
+
+    The blocking BMI calls of the model are run in an executor, so many models
+    can be stepped concurrently. Calls on a single model are still executed
+    one after another.
+
+    Args:
+        model: The model to wrap. Should already be setup.
+        executor: Executor to run the blocking calls in. Defaults to the
+            default executor of the event loop, which has a limited number of
+            threads. When stepping many models pass a
+            :py:class:`concurrent.futures.ThreadPoolExecutor` with a worker per
+            model.
+
+    Example:
+        To step many models concurrently::
+
+            import asyncio
+            from concurrent.futures import ThreadPoolExecutor
+
+            async def step_all(models):
+                with ThreadPoolExecutor(max_workers=len(models)) as executor:
+                    amodels = [AsyncModel(model, executor) for model in models]
+                    await asyncio.gather(*[m.update() for m in amodels])
+                    return await asyncio.gather(
+                        *[m.get_value("discharge") for m in amodels]
+                    )
+    """
+
+    def __init__(  # noqa: D107
+        self, model: eWaterCycleModel, executor: Executor | None = None
+    ):
+        self.model = model
+        self.executor = executor
+        self._lock = asyncio.Lock()
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def initialize(self, config_file: str) -> None:
+        """Initialize the model.
+
+        Args:
+            config_file: Name of initialization file.
+        """
+        await self._run(self.model.initialize, config_file)
+
+    async def update(self) -> None:
+        """Advance model state by one time step."""
+        await self._run(self.model.update)
+
+    async def get_value(self, name: str) -> np.ndarray:
+        """Get a copy of values of the given variable.
+
+        Args:
+            name: Name of variable
+        """
+        return await self._run(self.model.get_value, name)
+
+    async def set_value(self, name: str, value: np.ndarray) -> None:
+        """Specify a new value for a model variable.
+
+        Args:
+            name: Name of variable
+            value: The new value for the specified variable.
+        """
+        await self._run(self.model.set_value, name, value)
+
+    async def finalize(self) -> None:
+        """Perform tear-down tasks for the model."""
+        await self._run(self.model.finalize)
@@ -0,0 +1,296 @@
+"""Record model output to disk while the model is running."""
+
+import logging
+import queue
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Protocol
+
+import netCDF4
+import numpy as np
+import xarray as xr
+from cftime import num2pydate
+from xarray.backends.locks import HDF5_LOCK
+
+from ewatercycle.util import to_absolute_path
+
+if TYPE_CHECKING:
+    from ewatercycle.base.model import eWaterCycleModel
+
+logger = logging.getLogger(__name__)
+
+MISSING_VALUE = -999
+"""Value used by models for missing data, stored as fill value."""
+
+
+class _Writer(Protocol):
+    def write(self, times: np.ndarray, values: dict[str, np.ndarray]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class _Variable(NamedTuple):
+    lat: np.ndarray
+    lon: np.ndarray
+    shape: tuple[int, ...]
+    units: str
+    dtype: np.dtype
+
+    @property
+    def fill_value(self):
+        if self.dtype.kind == "f":
+            return self.dtype.type(MISSING_VALUE)
+        return None
+
+
+class _NetcdfWriter:
+    """Appends time slices to a NetCDF file with an unlimited time dimension.
+
+    HDF5 is not thread-safe, so all calls hold the HDF5 lock of xarray,
+    which xarray holds while reading other NetCDF files.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        variables: dict[str, _Variable],
+        time_units: str,
+        chunks: int,
+    ):
+        with HDF5_LOCK:
+            self._create(path, variables, time_units, chunks)
+
+    def _create(
+        self,
+        path: Path,
+        variables: dict[str, _Variable],
+        time_units: str,
+        chunks: int,
+    ) -> None:
+        self._ds = netCDF4.Dataset(path, mode="w")
+        first = next(iter(variables.values()))
+        self._ds.createDimension("time", None)
+        self._ds.createDimension("latitude", len(first.lat))
+        self._ds.createDimension("longitude", len(first.lon))
+        self._ds.createVariable("latitude", "f8", ("latitude",))[:] = first.lat
+        self._ds.createVariable("longitude", "f8", ("longitude",))[:] = first.lon
+        time = self._ds.createVariable("time", "f8", ("time",))
+        time.units = time_units
+        for name, variable in variables.items():
+            var = self._ds.createVariable(
+                name,
+                variable.dtype,
+                ("time", "latitude", "longitude"),
+                chunksizes=(chunks, *variable.shape),
+                fill_value=variable.fill_value,
+            )
+            var.units = variable.units
+
+    def write(self, times: np.ndarray, values: dict[str, np.ndarray]) -> None:
+        with HDF5_LOCK:
+            time = self._ds["time"]
+            start = len(time)
+            stop = start + len(times)
+            time[start:stop] = times
+            for name, value in values.items():
+                self._ds[name][start:stop] = value
+            self._ds.sync()
+
+    def close(self) -> None:
+        with HDF5_LOCK:
+            self._ds.close()
+
+
+class _ZarrWriter:
+    """Appends time slices to a Zarr store using xarray."""
+
+    def __init__(
+        self,
+        path: Path,
+        variables: dict[str, _Variable],
+        time_units: str,
+        chunks: int,
+    ):
+        self._path = path
+        self._variables = variables
+        self._time_units = time_units
+        self._chunks = chunks
+        self._initialized = False
+
+    def write(self, times: np.ndarray, values: dict[str, np.ndarray]) -> None:
+        first = next(iter(self._variables.values()))
+        ds = xr.Dataset(
+            {
+                name: (
+                    ("time", "latitude", "longitude"),
+                    value,
+                    {"units": self._variables[name].units},
+                )
+                for name, value in values.items()
+            },
+            coords={
+                "time": num2pydate(times, self._time_units),
+                "latitude": first.lat,
+                "longitude": first.lon,
+            },
+        )
+        if self._initialized:
+            ds.to_zarr(self._path, append_dim="time")
+            return
+        encoding: dict[str, dict] = {
+            "time": {"units": self._time_units, "chunks": (self._chunks,)}
+        }
+        for name, variable in self._variables.items():
+            encoding[name] = {"chunks": (self._chunks, *variable.shape)}
+            if variable.fill_value is not None:
+                encoding[name]["_FillValue"] = variable.fill_value
+        ds.to_zarr(self._path, mode="w", encoding=encoding)
+        self._initialized = True
+
+    def close(self) -> None:
+        pass
+
+
+class OutputRecorder:
+    """Appends model variables to a chunked store on disk during a run.
+
+    Each :py:meth:`append` stores the current values of the variables in a
+    buffer of `chunks` time slices. Once the buffer is full it is handed to a
+    background thread which appends it to the store, while the model fills
+    a second buffer. The two buffers are reused for the whole run, so the
+    memory use is constant regardless of the length of the run.
+
+    When the store path ends with `.zarr` a Zarr store is written
+    (requires the `zarr` package), otherwise a NetCDF file.
+
+    Use :py:meth:`ewatercycle.base.model.eWaterCycleModel.record` to create
+    a recorder which is appended to after each model update.
+
+    Args:
+        model: The model to record. Must be initialized.
+        variables: Names of the variables to record.
+            All variables must be on the same grid.
+        store: Path of the NetCDF file or Zarr store to write.
+        chunks: Number of time slices per chunk in the store.
+            Also the number of slices kept in memory before they are written.
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        model: "eWaterCycleModel",
+        variables: Iterable[str],
+        store: str | Path,
+        chunks: int = 16,
+    ):
+        if chunks < 1:
+            msg = f"chunks must be a positive integer, got {chunks}"
+            raise ValueError(msg)
+        self.variables = tuple(variables)
+        if not self.variables:
+            msg = "No variables given to record."
+            raise ValueError(msg)
+        self.store = to_absolute_path(store)
+        self.chunks = chunks
+        self._model = model
+
+        self._variables = {}
+        for name in self.variables:
+            lat, lon, shape = model.get_latlon_grid(name)
+            self._variables[name] = _Variable(
+                lat=lat,
+                lon=lon,
+                shape=tuple(int(size) for size in shape),
+                units=model.var_units(name),
+                dtype=np.dtype(model.bmi.get_var_type(name)),
+            )
+        shapes = {variable.shape for variable in self._variables.values()}
+        if len(shapes) > 1:
+            msg = "All recorded variables must be on the same grid."
+            raise ValueError(msg)
+
+        writer_class = _ZarrWriter if self.store.suffix == ".zarr" else _NetcdfWriter
+        self._writer: _Writer = writer_class(
+            self.store, self._variables, model.time_units, chunks
+        )
+
+        self._error: Exception | None = None
+        self._closed = False
+        self._queue: queue.Queue = queue.Queue()
+        # Double buffering, the writer thread hands a buffer back once written
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(2):
+            self._free.put(self._allocate_batch())
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+        self._new_batch()
+
+    @property
+    def closed(self) -> bool:
+        """Whether the recorder has been closed."""
+        return self._closed
+
+    def append(self) -> None:
+        """Store the current values of the variables as a new time slice."""
+        if self._closed:
+            msg = f"Recorder of {self.store} is closed."
+            raise ValueError(msg)
+        self._raise_error()
+        index = self._filled
+        self._times[index] = self._model.time
+        for name, buffer in self._buffers.items():
+            self._model.bmi.get_value(name, buffer[index].reshape(-1))
+        self._filled += 1
+        if self._filled == self.chunks:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand the buffered time slices to the background writer."""
+        if self._filled == 0:
+            return
+        self._queue.put(((self._times, self._buffers), self._filled))
+        self._new_batch()
+
+    def close(self) -> None:
+        """Write the remaining time slices and close the store."""
+        if self._closed:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.close()
+        self._closed = True
+        self._raise_error()
+
+    def _allocate_batch(self) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        times = np.empty(self.chunks, dtype=np.float64)
+        buffers = {
+            name: np.empty((self.chunks, *variable.shape), dtype=variable.dtype)
+            for name, variable in self._variables.items()
+        }
+        return times, buffers
+
+    def _new_batch(self) -> None:
+        # Waits until the writer thread is done with the other buffer
+        self._times, self._buffers = self._free.get()
+        self._filled = 0
+
+    def _write_loop(self) -> None:
+        while (item := self._queue.get()) is not None:
+            (times, buffers), filled = item
+            try:
+                if self._error is None:
+                    self._writer.write(
+                        times[:filled],
+                        {name: buffer[:filled] for name, buffer in buffers.items()},
+                    )
+            except Exception as e:
+                logger.exception(f"Failed to write model output to {self.store}")
+                self._error = e
+            finally:
+                self._free.put((times, buffers))
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            msg = f"Writing model output to {self.store} failed."
+            raise RuntimeError(msg) from self._error
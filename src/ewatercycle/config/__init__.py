@@ -11,9 +11,18 @@ imported from the :py:mod:`ewatercycle` module as :py:data:`~ewatercycle.CFG`:
     Configuration(
         grdc_location=PosixPath('.'),
         container_engine='docker',
+        container_resources=ContainerResources(
+            cpus=None, cpuset=None, memory=None, threads=None
+        ),
+        container_pool_size=0,
+        container_pool_max_idle=600.0,
+        bmi_cache_size=268435456,
+        local_models={},
         apptainer_dir=PosixPath('.'),
+        apptainer_cache_size=None,
         singularity_dir=None,
         output_dir=PosixPath('.'),
+        forcing_cache_dir=None,
         parameterset_dir=PosixPath('.'),
         parameter_sets={},
         ewatercycle_config=None
@@ -79,9 +88,14 @@ from typing import Annotated, Any, Literal, TextIO
 from pydantic import (
     BaseModel,
     BeforeValidator,
+    ByteSize,
     ConfigDict,
     DirectoryPath,
     FilePath,
+    NonNegativeFloat,
+    NonNegativeInt,
+    PositiveFloat,
+    PositiveInt,
     ValidationError,
     model_validator,
 )
@@ -102,11 +116,41 @@ def _expand_path(v):
     return v
 
 
-ContainerEngine = Literal["docker", "apptainer", "singularity"]
+ContainerEngine = Literal["docker", "apptainer", "singularity", "local"]
 ExpandedDirectoryPath = Annotated[DirectoryPath, BeforeValidator(_expand_path)]
 ExpandedFilePath = Annotated[FilePath, BeforeValidator(_expand_path)]
 
 
+class ContainerResources(BaseModel):
+    """Resources a model container may use.
+
+    Unset resources are not limited.
+    """
+
+    cpus: PositiveFloat | None = None
+    """Number of CPUs the container may use, e.g. 1.5.
+
+    Applied by the docker and apptainer engines. Apptainer needs cgroups v2."""
+    cpuset: str | None = None
+    """CPU cores the container is pinned to, e.g. '0-3,8'.
+
+    Use 'auto' to pin each container to its own cores, taken round robin from
+    the cores available to this Python process. The number of cores is
+    `cpus` rounded up or 1."""
+    memory: ByteSize | None = None
+    """Maximum memory of the container, e.g. '2GB'.
+
+    Applied by the docker and apptainer engines, the local engine limits
+    the address space of the process."""
+    threads: PositiveInt | None = None
+    """Number of threads of numerical libraries in the container.
+
+    Sets OMP_NUM_THREADS and friends. Applied by the apptainer and local
+    engines, docker containers do not get environment variables from the host.
+    """
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+
 class Configuration(BaseModel):
     """Configuration object.
 
@@ -120,9 +164,41 @@ class Configuration(BaseModel):
     Assumes file names like <station identifier>_Q_Day.Cmd.txt
     """
     container_engine: ContainerEngine = "docker"
-    """Which container engine is used to run the hydrological models."""
+    """Which container engine is used to run the hydrological models.
+
+    With `local` the models are not run in a container, but a BMI server is
+    started in a child process, see
+    :py:func:`ewatercycle.container.start_local_container`."""
+    container_resources: ContainerResources = ContainerResources()
+    """Default resources of model containers.
+
+    See :py:class:`ewatercycle.config.ContainerResources`."""
+    container_pool_size: NonNegativeInt = 0
+    """Number of idle containers to keep ready per container image.
+
+    When larger than 0, model containers are taken from a warm pool,
+    see :py:class:`ewatercycle.container.ContainerPool`."""
+    container_pool_max_idle: NonNegativeFloat = 600.0
+    """Seconds an idle container is kept in the pool before it is stopped."""
+    bmi_cache_size: ByteSize = ByteSize(256 * 1024**2)
+    """Maximum size of the cached BMI results per model, e.g. '1GB'.
+
+    See :py:class:`ewatercycle.container.CachingBmi`. 0 disables caching."""
+    local_models: dict[str, str] = {}
+    """Python BMI class to run for a container image with the local engine.
+
+    Maps a docker url like 'ewatercycle/marrmot-grpc4bmi:2020.11' to the full
+    name of the class like 'package.module.ClassName'. Images without an entry
+    are taken to be the full name of the class."""
     apptainer_dir: ExpandedDirectoryPath = Path()
     """Where the apptainer images files (.sif) be found."""
+    apptainer_cache_size: ByteSize | None = None
+    """Maximum total size of the apptainer images built in apptainer_dir, e.g. '50GB'.
+
+    When set, missing images are built from their docker url in apptainer_dir
+    and the least recently used built images are removed when the size is
+    exceeded, see :py:class:`ewatercycle.container.ApptainerImageCache`.
+    None to not build images."""
     singularity_dir: DirectoryPath | None = None
     """Where the singularity images files (.sif) be found.
 
@@ -131,6 +207,13 @@ class Configuration(BaseModel):
     """Directory in which output of model runs is stored.
 
     Each model run will generate a sub directory inside output_dir"""
+    forcing_cache_dir: ExpandedDirectoryPath | None = None
+    """Directory in which generated forcings are cached.
+
+    When set, :py:meth:`ewatercycle.base.forcing.DefaultForcing.generate` reuses
+    the output of an earlier call with the same recipe, shape file and
+    postprocessor instead of running ESMValTool again. None disables the cache.
+    """
     parameterset_dir: ExpandedDirectoryPath = Path()
     """Root directory for all parameter sets."""
     parameter_sets: dict[str, ParameterSet] = {}
@@ -2,21 +2,50 @@
 # ruff: noqa: D102
 # ruff: noqa: D107
 
+import csv
+import fcntl
+import hashlib
+import logging
+import math
+import os
 import re
-from collections.abc import Iterable, Sequence
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Literal, Protocol
+from typing import Any, Literal, NamedTuple, Protocol
+from urllib.parse import quote, unquote
 
+import grpc
+import httpx
 import numpy as np
 import remotebmi
 from bmipy import Bmi
 from grpc import FutureTimeoutError
 from grpc4bmi.bmi_client_apptainer import BmiClientApptainer
 from grpc4bmi.bmi_client_docker import BmiClientDocker
-from grpc4bmi.bmi_memoized import MemoizedBmi
+from grpc4bmi.bmi_grpc_client import BmiClient
 from grpc4bmi.bmi_optionaldest import OptionalDestBmi
+from grpc4bmi.reserve import reserve_values
+from pydantic import BaseModel
 
-from ewatercycle.config import CFG, ContainerEngine
+from ewatercycle.config import CFG, ContainerEngine, ContainerResources
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STARTUP_TIMEOUT = 300
+"""Seconds to wait for a model container when no timeout is given."""
 
 
 def _parse_docker_url(docker_url):
@@ -136,8 +165,10 @@ def start_container(
     timeout=None,
     delay=0,
     # TODO replace Any type with Bmi + BmiFromOrigin
-    wrappers: Sequence[type[Any]] = (MemoizedBmi, OptionalDestBmi),
+    wrappers: Sequence[type[Any]] | None = None,
     protocol: Literal["grpc", "openapi"] = "grpc",
+    shared_memory: bool = False,
+    resources: ContainerResources | None = None,
 ) -> OptionalDestBmi:
     """Start container with model inside.
 
@@ -150,11 +181,30 @@ def start_container(
         image: Image name for container.
         input_dirs: Additional directories to mount inside container.
         image_port: Docker port inside container where grpc4bmi server is running.
-        timeout: Number of seconds to wait for grpc connection.
+        timeout: Number of seconds to wait until the model in the container
+            answers a BMI call. When None, waits :py:data:`DEFAULT_STARTUP_TIMEOUT`
+            seconds or 4 times the expected startup time of the image
+            if that is longer.
         delay: Number of seconds to wait before connecting.
+            Not needed as the model is probed until it answers.
         wrappers: List of classes to wrap around the grcp4bmi object from container.
             Order is important. The first wrapper is the most inner wrapper.
+            Defaults to :py:class:`CachingBmi` and
+            :py:class:`~grpc4bmi.bmi_optionaldest.OptionalDestBmi`.
         protocol: Which protocol to use, grpc or openapi.
+        shared_memory: Exchange values through a shared memory segment in the
+            work directory instead of the protocol, see
+            :py:class:`SharedMemoryBmi`. The model server in the image must
+            support it.
+        resources: CPUs, cores, memory and threads the container may use.
+            Defaults to :py:attr:`CFG.container_resources
+            <ewatercycle.config.Configuration.container_resources>`.
+
+    The model in the container is probed with a cheap BMI call with
+    exponential backoff until it answers. The probing starts after the
+    expected startup time learned from previous starts of the same image.
+    The durations of the startup phases are recorded,
+    see :py:func:`startup_timings`.
 
     Raises:
         ValueError: When unknown container technology is requested.
@@ -164,7 +214,7 @@ def start_container(
         When default wrappers are used then returns the
         :py:class:`Bmi object
         which wraps the container <grpc4bmi.bmi_grpc_client.BmiClient>`,
-        has :py:class:`memoization <grpc4bmi.bmi_memoized.MemoizedBmi>` and
+        has :py:class:`caching <CachingBmi>` and
         has
         :py:class:`optional dest arguments <grpc4bmi.bmi_optionaldest.OptionalDestBmi>`
         .
@@ -184,6 +234,134 @@ def start_container(
     engine: ContainerEngine = CFG.container_engine
     if input_dirs is None:
         input_dirs = []
+    if resources is None:
+        resources = CFG.container_resources
+
+    bmi = container_pool.acquire(
+        work_dir,
+        image,
+        input_dirs,
+        image_port,
+        timeout,
+        delay,
+        protocol,
+        shared_memory,
+        resources,
+    )
+    if bmi is None:
+        bmi = _start_engine_container(
+            engine,
+            work_dir,
+            image,
+            input_dirs,
+            image_port,
+            timeout,
+            delay,
+            protocol,
+            shared_memory,
+            resources,
+        )
+
+    if wrappers is None:
+        wrappers = (CachingBmi, OptionalDestBmi)
+    for wrapper in wrappers:
+        bmi = wrapper(bmi)
+    return bmi
+
+
+class ContainerSpec(NamedTuple):
+    """Arguments of :py:func:`start_container` for one of many containers."""
+
+    work_dir: str | Path
+    image: ContainerImage
+    input_dirs: Iterable[str] | None = None
+    image_port: int = 55555
+    timeout: float | None = None
+    delay: int = 0
+    wrappers: Sequence[type[Any]] | None = None
+    protocol: Literal["grpc", "openapi"] = "grpc"
+    shared_memory: bool = False
+    resources: ContainerResources | None = None
+
+
+def start_containers(
+    specs: Iterable[ContainerSpec], max_workers: int | None = None
+) -> list[OptionalDestBmi | Exception]:
+    """Start many containers at the same time.
+
+    The containers are started and probed until they are ready in parallel,
+    so starting them takes about as long as starting the slowest one.
+    A container which fails to start does not stop the others.
+
+    Args:
+        specs: Arguments of :py:func:`start_container` for each container.
+        max_workers: Number of containers to start at the same time.
+            Defaults to the number of containers.
+
+    Returns:
+        For each spec in the same order the Bmi object which wraps the
+        container, or the exception raised while starting it.
+
+    Example:
+        To start 100 marrmot containers::
+
+            from ewatercycle.container import ContainerSpec, start_containers
+
+            image = ContainerImage("ewatercycle/marrmot-grpc4bmi")
+            bmis = start_containers(
+                ContainerSpec(work_dir=f"member_{i}", image=image)
+                for i in range(100)
+            )
+            failed = [bmi for bmi in bmis if isinstance(bmi, Exception)]
+    """
+    specs = list(specs)
+    if not specs:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=max_workers or len(specs),
+        thread_name_prefix="ewatercycle-start-containers",
+    ) as executor:
+        futures = [executor.submit(start_container, **spec._asdict()) for spec in specs]
+    return [
+        _result_or_exception(future, f"container of {spec.image} in {spec.work_dir}")
+        for spec, future in zip(specs, futures, strict=True)
+    ]
+
+
+def _result_or_exception(future: Future, description: str) -> Any:
+    exc = future.exception()
+    if exc is None:
+        return future.result()
+    if not isinstance(exc, Exception):
+        raise exc
+    logger.error(f"Unable to start {description}: {exc}")
+    return exc
+
+
+def _start_engine_container(
+    engine: ContainerEngine,
+    work_dir: str | Path,
+    image: ContainerImage,
+    input_dirs: Iterable[str],
+    image_port: int,
+    timeout: float | None,
+    delay: int,
+    protocol: Literal["grpc", "openapi"],
+    shared_memory: bool = False,
+    resources: ContainerResources | None = None,
+) -> Bmi:
+    if engine not in ("docker", "apptainer", "local"):
+        msg = f"Unknown container technology: {engine}"
+        raise ValueError(msg)
+    expected = expected_startup_time(image)
+    if timeout is None:
+        timeout = max(DEFAULT_STARTUP_TIMEOUT, 4 * (expected or 0))
+    began = time.monotonic()
+    if engine == "apptainer":
+        image_fn = _resolve_apptainer_image(image)
+    resolved = time.monotonic()
+    # Building an image can take long, so it does not count towards the timeout
+    deadline = resolved + timeout
 
     if engine == "docker":
         bmi = start_docker_container(
@@ -194,25 +372,151 @@ def start_container(
             timeout,
             delay,
             protocol,
+            shared_memory,
+            resources,
         )
     elif engine == "apptainer":
-        bmi = start_apptainer_container(
+        bmi = _start_apptainer_container(
             work_dir,
             image,
+            image_fn,
             input_dirs,
             timeout,
             delay,
             protocol,
+            shared_memory,
+            resources,
         )
     else:
-        msg = f"Unknown container technology: {CFG.container_engine}"
-        raise ValueError(msg)
-
-    for wrapper in wrappers:
-        bmi = wrapper(bmi)
+        bmi = start_local_container(
+            work_dir,
+            image,
+            input_dirs,
+            timeout,
+            delay,
+            protocol,
+            shared_memory,
+            resources,
+        )
+    started = time.monotonic()
+
+    _wait_until_ready(bmi, image, resolved, deadline, expected)
+    ready = time.monotonic()
+
+    _record_startup(
+        StartupTimings(
+            image=str(image),
+            resolve=resolved - began,
+            start=started - resolved,
+            ready=ready - started,
+            total=ready - began,
+        )
+    )
     return bmi
 
 
+class StartupTimings(NamedTuple):
+    """Durations in seconds of the phases of starting a model container."""
+
+    image: str
+    """Image of the container."""
+    resolve: float
+    """Finding or building the image file, only for apptainer."""
+    start: float
+    """Creating the container and starting the process inside it.
+
+    For the grpc protocol it includes waiting until the server accepts
+    connections."""
+    ready: float
+    """Probing the model until it answered its first BMI call."""
+    total: float
+    """Duration from start until ready."""
+
+
+_STARTUP_HISTORY_SIZE = 20
+_startup_history: dict[str, deque[StartupTimings]] = {}
+_startup_lock = threading.Lock()
+
+
+def startup_timings(image: str | None = None) -> list[StartupTimings]:
+    """Timings of the recent container starts of this process.
+
+    Args:
+        image: Only return the timings of this image.
+            By default the timings of all images are returned.
+
+    Returns:
+        Timings per image from the oldest to the most recent start.
+        At most 20 per image are kept.
+    """
+    with _startup_lock:
+        if image is not None:
+            return list(_startup_history.get(str(image), []))
+        return [t for history in _startup_history.values() for t in history]
+
+
+def expected_startup_time(image: str) -> float | None:
+    """Expected seconds until a container of the image answers BMI calls.
+
+    The median of the recent startup durations of the image,
+    without the time spent on finding or building the image file.
+
+    Returns:
+        None when no container of the image has been started yet.
+    """
+    with _startup_lock:
+        history = _startup_history.get(str(image))
+        if not history:
+            return None
+        return statistics.median(t.start + t.ready for t in history)
+
+
+def _record_startup(timings: StartupTimings) -> None:
+    logger.debug(f"Started container {timings}")
+    with _startup_lock:
+        history = _startup_history.setdefault(
+            timings.image, deque(maxlen=_STARTUP_HISTORY_SIZE)
+        )
+        history.append(timings)
+
+
+def _is_unreachable(exc: Exception) -> bool:
+    """Whether the BMI call failed because the server is not reachable yet.
+
+    Any other error means the server answered, so the model is ready.
+    """
+    if isinstance(exc, grpc.RpcError) and isinstance(exc, grpc.Call):
+        return exc.code() == grpc.StatusCode.UNAVAILABLE
+    return isinstance(exc, httpx.TransportError | ConnectionError)
+
+
+def _wait_until_ready(
+    bmi: Bmi, image: str, began: float, deadline: float, expected: float | None
+) -> None:
+    """Probe the model with exponential backoff until it answers a BMI call."""
+    interval = 0.05
+    if expected:
+        # Do not bother a model which is known to take a while to start
+        time.sleep(max(0.0, min(began + 0.8 * expected, deadline) - time.monotonic()))
+        interval = max(0.01, expected / 20)
+    while True:
+        try:
+            bmi.get_component_name()
+        except Exception as exc:
+            if not _is_unreachable(exc):
+                return
+            if time.monotonic() + interval > deadline:
+                msg = (
+                    f"Model in container of {image} did not answer "
+                    "within allocated time limit."
+                )
+                raise TimeoutError(msg) from exc
+        else:
+            return
+        time.sleep(interval)
+        interval = min(interval * 2, 2.0)
+
+
 def start_apptainer_container(
     work_dir: str | Path,
     image: ContainerImage,
@@ -220,6 +524,8 @@ def start_apptainer_container(
     timeout: int | None = None,
     delay: int = 0,
     protocol: Literal["grpc", "openapi"] = "grpc",
+    shared_memory: bool = False,
+    resources: ContainerResources | None = None,
 ) -> Bmi:
     """Start Apptainer container with model inside.
 
@@ -232,6 +538,11 @@ def start_apptainer_container(
         timeout: Number of seconds to wait for grpc connection.
         delay: Number of seconds to wait before connecting.
         protocol: Which protocol to use, grpc or openapi.
+        shared_memory: Exchange values through a shared memory segment in the
+            work directory, see :py:class:`SharedMemoryBmi`.
+        resources: CPUs, cores, memory and threads the container may use.
+            Defaults to :py:attr:`CFG.container_resources
+            <ewatercycle.config.Configuration.container_resources>`.
 
     .. _apptainer manual: https://apptainer.org/docs/user/latest/cli/apptainer_run.html
 
@@ -241,28 +552,67 @@ def start_apptainer_container(
     Returns:
         Bmi object which wraps the container.
     """
-    image_fn = image.apptainer_filename
-    if (CFG.apptainer_dir / image_fn).exists():
-        image_fn = str(CFG.apptainer_dir / image_fn)
+    return _start_apptainer_container(
+        work_dir,
+        image,
+        _resolve_apptainer_image(image),
+        input_dirs,
+        timeout,
+        delay,
+        protocol,
+        shared_memory,
+        resources,
+    )
+
+
+def _start_apptainer_container(
+    work_dir: str | Path,
+    image: ContainerImage,
+    image_fn: str,
+    input_dirs: Iterable[str],
+    timeout: float | None,
+    delay: int,
+    protocol: Literal["grpc", "openapi"],
+    shared_memory: bool,
+    resources: ContainerResources | None,
+) -> Bmi:
+    resources = _allocate_cores(resources)
 
     try:
-        if protocol == "grpc":
-            return BmiClientApptainer(
-                image=image_fn,
-                work_dir=str(work_dir),
-                input_dirs=input_dirs,
-                timeout=timeout,
-                delay=delay,
-            )
-        if protocol == "openapi":
-            return remotebmi.BmiClientApptainer(
-                image=image_fn,
-                work_dir=str(work_dir),
-                input_dirs=input_dirs,
-                delay=delay,
-            )
-        msg = f"Invalid protocol '{protocol}'!"
-        raise ValueError(msg)
+        if _apptainer_flags(resources):
+            # The clients of grpc4bmi and remotebmi can not pass flags to apptainer
+            if protocol == "grpc":
+                bmi: Bmi = BmiClientApptainerLimited(
+                    image_fn, work_dir, input_dirs, timeout, delay, resources
+                )
+            elif protocol == "openapi":
+                bmi = RemoteBmiClientApptainerLimited(
+                    image_fn, work_dir, input_dirs, timeout, delay, resources
+                )
+            else:
+                msg = f"Invalid protocol '{protocol}'!"
+                raise ValueError(msg)
+        else:
+            # apptainer passes the cpu affinity to the container
+            with _pinned(resources.cpuset):
+                if protocol == "grpc":
+                    bmi = BmiClientApptainer(
+                        image=image_fn,
+                        work_dir=str(work_dir),
+                        input_dirs=input_dirs,
+                        timeout=timeout,
+                        delay=delay,
+                    )
+                elif protocol == "openapi":
+                    bmi = remotebmi.BmiClientApptainer(
+                        image=image_fn,
+                        work_dir=str(work_dir),
+                        input_dirs=input_dirs,
+                        delay=delay,
+                    )
+                else:
+                    msg = f"Invalid protocol '{protocol}'!"
+                    raise ValueError(msg)
 
     except FutureTimeoutError as exc:
         msg = (
@@ -272,6 +622,27 @@ def start_apptainer_container(
             f"docker://{image.docker_url}` and then try again."
         )
         raise TimeoutError(msg) from exc
+    if shared_memory:
+        return SharedMemoryBmi.in_work_dir(bmi, work_dir)
+    return bmi
+
+
+def _resolve_apptainer_image(image: ContainerImage) -> str:
+    """Path of the apptainer image file.
+
+    Missing images are only built when the image cache is enabled with
+    :py:attr:`CFG.apptainer_cache_size
+    <ewatercycle.config.Configuration.apptainer_cache_size>`.
+    """
+    image_fn = image.apptainer_filename
+    if Path(image_fn).is_absolute():
+        return image_fn
+    if CFG.apptainer_cache_size is not None:
+        cache = ApptainerImageCache(CFG.apptainer_dir, CFG.apptainer_cache_size)
+        return str(cache.get(image))
+    if (CFG.apptainer_dir / image_fn).exists():
+        return str(CFG.apptainer_dir / image_fn)
+    return image_fn
 
 
 def start_docker_container(
@@ -282,6 +653,8 @@ def start_docker_container(
     timeout=None,
     delay=0,
     protocol: Literal["grpc", "openapi"] = "grpc",
+    shared_memory: bool = False,
+    resources: ContainerResources | None = None,
 ):
     """Start Docker container with model inside.
 
@@ -293,16 +666,32 @@ def start_docker_container(
         timeout: Number of seconds to wait for grpc connection.
         delay: Number of seconds to wait before connecting.
         protocol: Which protocol to use, grpc or openapi.
+        shared_memory: Exchange values through a shared memory segment in the
+            work directory, see :py:class:`SharedMemoryBmi`.
+        resources: CPUs, cores, memory and threads the container may use.
+            Defaults to :py:attr:`CFG.container_resources
+            <ewatercycle.config.Configuration.container_resources>`.
 
     Raises:
         TimeoutError: When model inside container did not start quickly enough.
+        ValueError: When cpus, cpuset or memory are given with the openapi
+            protocol, as its docker client gives no handle to the container
+            to apply them to.
 
     Returns:
         Bmi object which wraps the container.
     """
+    resources = _allocate_cores(resources)
+    limits = _docker_limits(resources)
+    if limits and protocol != "grpc":
+        msg = (
+            "The cpus, cpuset and memory of docker containers can only be "
+            f"limited with the grpc protocol, not with {protocol}."
+        )
+        raise ValueError(msg)
     try:
         if protocol == "grpc":
-            return BmiClientDocker(
+            bmi: Bmi = BmiClientDocker(
                 image=image.docker_url,
                 image_port=image_port,
                 work_dir=str(work_dir),
@@ -310,8 +699,8 @@ def start_docker_container(
                 timeout=timeout,
                 delay=delay,
             )
-        if protocol == "openapi":
-            return remotebmi.BmiClientDocker(
+        elif protocol == "openapi":
+            bmi = remotebmi.BmiClientDocker(
                 image=image.docker_url,
                 host="localhost",
                 image_port=50051,
@@ -319,8 +708,9 @@ def start_docker_container(
                 input_dirs=input_dirs,
                 delay=delay,
             )
-        msg = f"Invalid protocol '{protocol}'!"
-        raise ValueError(msg)
+        else:
+            msg = f"Invalid protocol '{protocol}'!"
+            raise ValueError(msg)
     except FutureTimeoutError as exc:
         # https://github.com/eWaterCycle/grpc4bmi/issues/95
         # https://github.com/eWaterCycle/grpc4bmi/issues/100
@@ -330,6 +720,949 @@ def start_docker_container(
             f" `docker pull {image}` and then try again."
         )
         raise TimeoutError(msg) from exc
+    if limits:
+        # Only the grpc4bmi docker client is known to have the container
+        bmi.container.update(**limits)  # type: ignore[attr-defined]
+    if resources.threads is not None:
+        logger.warning(
+            "Number of threads can not be set for docker containers, "
+            "use cpus or cpuset instead."
+        )
+    if shared_memory:
+        return SharedMemoryBmi.in_work_dir(bmi, work_dir)
+    return bmi
+
+
+_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+class _CoreAllocator:
+    """Hands out cores round robin to containers with cpuset 'auto'."""
+
+    def __init__(self):
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def allocate(self, count: int) -> list[int]:
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+        count = min(count, len(cores))
+        with self._lock:
+            start = self._next
+            self._next = (start + count) % len(cores)
+        return [cores[(start + i) % len(cores)] for i in range(count)]
+
+
+_core_allocator = _CoreAllocator()
+
+
+def _allocate_cores(resources: ContainerResources | None) -> ContainerResources:
+    """Resources with the default filled in and an 'auto' cpuset resolved."""
+    if resources is None:
+        resources = CFG.container_resources
+    if resources.cpuset != "auto":
+        return resources
+    cores = _core_allocator.allocate(math.ceil(resources.cpus or 1))
+    return resources.model_copy(update={"cpuset": ",".join(map(str, cores))})
+
+
+def _parse_cpuset(cpuset: str) -> set[int]:
+    cores: set[int] = set()
+    for part in cpuset.split(","):
+        first, _, last = part.partition("-")
+        cores.update(range(int(first), int(last or first) + 1))
+    return cores
+
+
+@contextmanager
+def _pinned(cpuset: str | None) -> Iterator[None]:
+    """Pin the current thread, so processes it starts inherit the cpuset."""
+    if cpuset is None:
+        yield
+        return
+    if not hasattr(os, "sched_setaffinity"):
+        msg = f"Pinning to cpuset {cpuset} is not supported on {sys.platform}."
+        raise ValueError(msg)
+    old = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, _parse_cpuset(cpuset))
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, old)
+
+
+def _thread_environment(resources: ContainerResources) -> dict[str, str]:
+    if resources.threads is None:
+        return {}
+    return {name: str(resources.threads) for name in _THREAD_VARIABLES}
+
+
+def _apptainer_flags(resources: ContainerResources) -> list[str]:
+    """Flags of apptainer run to apply the resources, except the cpuset."""
+    flags = []
+    for name, value in _thread_environment(resources).items():
+        flags += ["--env", f"{name}={value}"]
+    if resources.cpus is not None:
+        flags += ["--cpus", str(resources.cpus)]
+    if resources.memory is not None:
+        flags += ["--memory", str(int(resources.memory))]
+    return flags
+
+
+def _apptainer_command(
+    image: str,
+    work_dir: str | Path,
+    input_dirs: Iterable[str],
+    port: int,
+    resources: ContainerResources,
+) -> list[str]:
+    """Command to run a BMI server in an apptainer container.
+
+    Same as the command of the apptainer clients of grpc4bmi and remotebmi
+    with the flags for the resources added.
+    """
+    command = ["apptainer", "run", "--contain", "--env", f"BMI_PORT={port}"]
+    command += _apptainer_flags(resources)
+    for input_dir in input_dirs:
+        input_path = Path(input_dir).absolute()
+        command += ["--bind", f"{input_path}:{input_path}:ro"]
+    work_path = Path(work_dir).absolute()
+    command += ["--bind", f"{work_path}:{work_path}", "--pwd", str(work_path), image]
+    return command
+
+
+def _docker_limits(resources: ContainerResources) -> dict[str, Any]:
+    """Arguments of docker container update to apply the resources."""
+    limits: dict[str, Any] = {}
+    if resources.cpus is not None:
+        limits["cpu_period"] = 100_000
+        limits["cpu_quota"] = int(resources.cpus * 100_000)
+    if resources.cpuset is not None:
+        limits["cpuset_cpus"] = resources.cpuset
+    if resources.memory is not None:
+        limits["mem_limit"] = int(resources.memory)
+        limits["memswap_limit"] = int(resources.memory)
+    return limits
+
+
+def start_local_container(
+    work_dir: str | Path,
+    image: ContainerImage,
+    input_dirs: Iterable[str] = (),  # noqa: ARG001
+    timeout: int | None = None,
+    delay: int = 0,
+    protocol: Literal["grpc", "openapi"] = "grpc",
+    shared_memory: bool = False,
+    resources: ContainerResources | None = None,
+) -> Bmi:
+    """Start a BMI server for a Python BMI class in a child process.
+
+    Used when :py:attr:`CFG.container_engine
+    <ewatercycle.config.Configuration.container_engine>` is `local`.
+    Of the resources only the cores, memory and threads are applied.
+    The model is isolated in its own process like in a container, but
+    no container runtime is needed. The Python BMI class and its
+    dependencies must be installed in the current Python environment.
+
+    Args:
+        work_dir: Work directory, the server process runs in it.
+        image: Container image to run the Python BMI class of, see
+            :py:attr:`CFG.local_models
+            <ewatercycle.config.Configuration.local_models>`.
+            Or the full name of the class like 'package.module.ClassName'.
+        input_dirs: Ignored, the server process can read all directories
+            the current user can.
+        timeout: Number of seconds to wait until the server accepts
+            connections. When None, waits :py:data:`DEFAULT_STARTUP_TIMEOUT`
+            seconds.
+        delay: Number of seconds to wait before connecting.
+        protocol: Which protocol to use, grpc or openapi.
+        shared_memory: Exchange values through a shared memory segment in the
+            work directory, see :py:class:`SharedMemoryBmi`.
+        resources: CPUs, cores, memory and threads the container may use.
+            Defaults to :py:attr:`CFG.container_resources
+            <ewatercycle.config.Configuration.container_resources>`.
+
+    Raises:
+        TimeoutError: When the server did not start quickly enough.
+        ChildProcessError: When the server process exited.
+        ValueError: When the cpuset or memory can not be applied
+            on this platform.
+
+    Returns:
+        Bmi object which wraps the server process.
+    """
+    bmi_class = CFG.local_models.get(image, CFG.local_models.get(image.docker_url))
+    if bmi_class is None:
+        bmi_class = str(image)
+    resources = _allocate_cores(resources)
+    if protocol == "grpc":
+        bmi: Bmi = BmiClientLocal(bmi_class, work_dir, timeout, delay, resources)
+    elif protocol == "openapi":
+        bmi = RemoteBmiClientLocal(bmi_class, work_dir, timeout, delay, resources)
+    else:
+        msg = f"Invalid protocol '{protocol}'!"
+        raise ValueError(msg)
+    if shared_memory:
+        return SharedMemoryBmi.in_work_dir(bmi, work_dir)
+    return bmi
+
+
+class _LocalServer:
+    """Child process running a BMI server."""
+
+    server_name: str
+    process: subprocess.Popen
+    logfile: Any
+
+    def _start_server(
+        self,
+        server_name: str,
+        command: list[str],
+        port: int,
+        work_dir: str | Path,
+        env: Mapping[str, str],
+        timeout: float | None,
+        delay: float,
+        resources: ContainerResources,
+    ) -> None:
+        self.server_name = server_name
+        self.logfile = tempfile.SpooledTemporaryFile(  # noqa: SIM115 - closed in __del__
+            max_size=2**16,
+            prefix="ewatercycle-local-log",
+            mode="w+t",
+            encoding="utf8",
+        )
+        logger.info(f"Running {server_name} in a child process on port {port}")
+        with _pinned(resources.cpuset):
+            self.process = subprocess.Popen(  # noqa: S603
+                command,
+                cwd=work_dir,
+                env={**os.environ, **env},
+                start_new_session=True,
+                stderr=subprocess.STDOUT,
+                stdout=self.logfile,
+            )
+        time.sleep(delay)
+        self._wait_for_port(port, timeout)
+
+    def _start_python_server(
+        self,
+        bmi_class: str,
+        args: list[str],
+        port: int,
+        work_dir: str | Path,
+        timeout: float | None,
+        delay: float,
+        resources: ContainerResources | None,
+    ) -> None:
+        module_name, _, class_name = bmi_class.rpartition(".")
+        if not module_name:
+            msg = f"Expected full name of a Python BMI class, got '{bmi_class}'"
+            raise ValueError(msg)
+        resources = _allocate_cores(resources)
+        if resources.memory is not None and not hasattr(resource, "prlimit"):
+            msg = f"Limiting the memory is not supported on {sys.platform}."
+            raise ValueError(msg)
+        env = {
+            "BMI_MODULE": module_name,
+            "BMI_CLASS": class_name,
+            "BMI_PORT": str(port),
+            **_thread_environment(resources),
+        }
+        self._start_server(
+            bmi_class,
+            [sys.executable, *args],
+            port,
+            work_dir,
+            env,
+            timeout,
+            delay,
+            resources,
+        )
+        if resources.memory is not None:
+            limit = int(resources.memory)
+            resource.prlimit(self.process.pid, resource.RLIMIT_AS, (limit, limit))
+
+    def _wait_for_port(self, port: int, timeout: float | None) -> None:
+        if timeout is None:
+            timeout = DEFAULT_STARTUP_TIMEOUT
+        deadline = time.monotonic() + timeout
+        while True:
+            returncode = self.process.poll()
+            if returncode is not None:
+                msg = (
+                    f"BMI server of {self.server_name} exited with code "
+                    f"{returncode}:\n{self.logs()}"
+                )
+                raise ChildProcessError(msg)
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    return
+            except OSError as exc:
+                if time.monotonic() > deadline:
+                    msg = (
+                        f"BMI server of {self.server_name} did not accept "
+                        f"connections within {timeout} seconds."
+                    )
+                    raise TimeoutError(msg) from exc
+            time.sleep(0.05)
+
+    def _stop_server(self) -> None:
+        if hasattr(self, "process"):
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if hasattr(self, "logfile"):
+            self.logfile.close()
+
+    def logs(self) -> str:
+        """Combined stdout and stderr written by the server process."""
+        if not hasattr(self, "logfile"):
+            return ""
+        current_position = self.logfile.tell()
+        self.logfile.seek(0)
+        content = self.logfile.read()
+        self.logfile.seek(current_position)
+        return content
+
+
+class BmiClientLocal(_LocalServer, BmiClient):
+    """grpc4bmi client which runs its server for a Python BMI class locally.
+
+    The server process is stopped when the client is garbage collected.
+
+    Args:
+        bmi_class: Full name of the class like 'package.module.ClassName'.
+        work_dir: Work directory of the server process.
+        timeout: Number of seconds to wait until the server accepts connections.
+        delay: Number of seconds to wait before connecting.
+        resources: Cores, memory and threads the server process may use.
+    """
+
+    def __init__(
+        self,
+        bmi_class: str,
+        work_dir: str | Path,
+        timeout: float | None = None,
+        delay: float = 0,
+        resources: ContainerResources | None = None,
+    ):
+        port = BmiClient.get_unique_port("127.0.0.1")
+        args = ["-m", "grpc4bmi.run_server", "--name", bmi_class, "--port", str(port)]
+        self._start_python_server(
+            bmi_class, args, port, work_dir, timeout, delay, resources
+        )
+        channel = BmiClient.create_grpc_channel(port=port, host="127.0.0.1")
+        super().__init__(channel, timeout=timeout)
+
+    def __del__(self):  # noqa: D105
+        self._stop_server()
+        if hasattr(self, "stub"):
+            super().__del__()
+
+
+class RemoteBmiClientLocal(_LocalServer, remotebmi.RemoteBmiClient):
+    """remotebmi client which runs its server for a Python BMI class locally.
+
+    The server process is stopped when the client is garbage collected.
+
+    Args:
+        bmi_class: Full name of the class like 'package.module.ClassName'.
+        work_dir: Work directory of the server process.
+        timeout: Number of seconds to wait until the server accepts connections.
+        delay: Number of seconds to wait before connecting.
+        resources: Cores, memory and threads the server process may use.
+    """
+
+    def __init__(
+        self,
+        bmi_class: str,
+        work_dir: str | Path,
+        timeout: float | None = None,
+        delay: float = 0,
+        resources: ContainerResources | None = None,
+    ):
+        port = BmiClient.get_unique_port("127.0.0.1")
+        args = ["-c", "from remotebmi.server import main; main()"]
+        self._start_python_server(
+            bmi_class, args, port, work_dir, timeout, delay, resources
+        )
+        super().__init__(f"http://127.0.0.1:{port}")
+
+    def __del__(self):  # noqa: D105
+        self._stop_server()
+        if hasattr(self, "client"):
+            super().__del__()
+
+
+class BmiClientApptainerLimited(_LocalServer, BmiClient):
+    """grpc4bmi client for an apptainer container with limited resources.
+
+    Like :py:class:`~grpc4bmi.bmi_client_apptainer.BmiClientApptainer`, but
+    passes the resources as flags to `apptainer run`.
+    The container is stopped when the client is garbage collected.
+
+    Args:
+        image: Path of the apptainer image file.
+        work_dir: Work directory, mounted in the container.
+        input_dirs: Additional directories to mount read-only in the container.
+        timeout: Number of seconds to wait until the server accepts connections.
+        delay: Number of seconds to wait before connecting.
+        resources: CPUs, cores, memory and threads the container may use.
+    """
+
+    def __init__(
+        self,
+        image: str,
+        work_dir: str | Path,
+        input_dirs: Iterable[str] = (),
+        timeout: float | None = None,
+        delay: float = 0,
+        resources: ContainerResources | None = None,
+    ):
+        resources = _allocate_cores(resources)
+        port = BmiClient.get_unique_port("127.0.0.1")
+        command = _apptainer_command(image, work_dir, input_dirs, port, resources)
+        self._start_server(
+            image, command, port, work_dir, {}, timeout, delay, resources
+        )
+        channel = BmiClient.create_grpc_channel(port=port, host="127.0.0.1")
+        super().__init__(channel, timeout=timeout)
+
+    def __del__(self):  # noqa: D105
+        self._stop_server()
+        if hasattr(self, "stub"):
+            super().__del__()
+
+
+class RemoteBmiClientApptainerLimited(_LocalServer, remotebmi.RemoteBmiClient):
+    """remotebmi client for an apptainer container with limited resources.
+
+    Like :py:class:`remotebmi.BmiClientApptainer`, but passes the resources
+    as flags to `apptainer run`.
+    The container is stopped when the client is garbage collected.
+
+    Args:
+        image: Path of the apptainer image file.
+        work_dir: Work directory, mounted in the container.
+        input_dirs: Additional directories to mount read-only in the container.
+        timeout: Number of seconds to wait until the server accepts connections.
+        delay: Number of seconds to wait before connecting.
+        resources: CPUs, cores, memory and threads the container may use.
+    """
+
+    def __init__(
+        self,
+        image: str,
+        work_dir: str | Path,
+        input_dirs: Iterable[str] = (),
+        timeout: float | None = None,
+        delay: float = 0,
+        resources: ContainerResources | None = None,
+    ):
+        resources = _allocate_cores(resources)
+        port = BmiClient.get_unique_port("127.0.0.1")
+        command = _apptainer_command(image, work_dir, input_dirs, port, resources)
+        self._start_server(
+            image, command, port, work_dir, {}, timeout, delay, resources
+        )
+        super().__init__(f"http://127.0.0.1:{port}")
+
+    def __del__(self):  # noqa: D105
+        self._stop_server()
+        if hasattr(self, "client"):
+            super().__del__()
+
+
+class CachedImage(BaseModel):
+    """Entry of an apptainer image in the index of an image cache."""
+
+    size: int
+    """Size of the image file in bytes."""
+    last_used: datetime
+    """When the image was last used to start a container."""
+    digest: str | None = None
+    """SHA256 digest of the image file.
+
+    None for image files which were not built or used by the cache yet."""
+    built: bool = False
+    """Whether the cache built the image file.
+
+    Only built images are removed when the cache is too large,
+    image files placed in the directory by hand are kept."""
+
+
+class _ImageIndex(BaseModel):
+    images: dict[str, CachedImage] = {}
+
+
+class ApptainerImageCache:
+    """Cache of apptainer image files (.sif) in a directory.
+
+    Keeps an index of the images in the directory with their size, digest and
+    last use. Missing images are built from their docker url. Builds and index
+    updates are guarded with file locks, so parallel jobs sharing the
+    directory build an image only once. When the images built by the cache
+    together are larger than `max_size`, the least recently used of them are
+    removed. Image files placed in the directory by hand are never removed.
+
+    When :py:attr:`CFG.apptainer_cache_size
+    <ewatercycle.config.Configuration.apptainer_cache_size>` is set,
+    :py:func:`start_apptainer_container` uses a cache of
+    :py:attr:`CFG.apptainer_dir <ewatercycle.config.Configuration.apptainer_dir>`
+    with it as maximum size.
+
+    Args:
+        directory: Directory with the apptainer image files.
+        max_size: Maximum total size of the images built by the cache in bytes.
+            None for no maximum.
+
+    Example:
+        To make sure an image is available before starting many models::
+
+            from ewatercycle.container import ApptainerImageCache, ContainerImage
+
+            cache = ApptainerImageCache(CFG.apptainer_dir)
+            cache.get(ContainerImage("ewatercycle/marrmot-grpc4bmi:2020.11"))
+    """
+
+    index_filename = "ewatercycle-index.json"
+
+    def __init__(self, directory: str | Path, max_size: int | None = None):
+        self.directory = Path(directory).absolute()
+        self.max_size = max_size
+
+    def get(self, image: ContainerImage) -> Path:
+        """Path of the image file, building it when missing.
+
+        Args:
+            image: Name of apptainer (sif file) or docker image (url).
+
+        Returns:
+            Absolute path of the image file.
+        """
+        path = self.directory / image.apptainer_filename
+        with self._lock(path.name):
+            built = not path.exists()
+            if built:
+                self._build(image, path)
+            with self._lock(self.index_filename):
+                index = self._read_index()
+                entry = index.images[path.name]
+                index.images[path.name] = CachedImage(
+                    size=entry.size,
+                    last_used=datetime.now(timezone.utc),
+                    digest=entry.digest or _sha256(path),
+                    built=entry.built or built,
+                )
+                self._write_index(index)
+        self.evict(keep=(path.name,))
+        return path
+
+    def images(self) -> dict[str, CachedImage]:
+        """Index of the images in the directory.
+
+        Image files which are not in the index yet are added with their
+        modification time as last use.
+        """
+        with self._lock(self.index_filename):
+            index = self._read_index()
+            self._write_index(index)
+        return index.images
+
+    def evict(self, keep: Iterable[str] = ()) -> list[str]:
+        """Remove least recently used images until the cache fits max_size.
+
+        Only images built by the cache are removed.
+        Images which are being built or used by another call are skipped.
+
+        Args:
+            keep: Filenames of images which should not be removed.
+
+        Returns:
+            Filenames of the removed images.
+        """
+        if self.max_size is None:
+            return []
+        removed: list[str] = []
+        images = {name: image for name, image in self.images().items() if image.built}
+        total = sum(image.size for image in images.values())
+        by_last_use = sorted(images.items(), key=lambda item: item[1].last_used)
+        for name, image in by_last_use:
+            if total <= self.max_size:
+                break
+            if name in keep:
+                continue
+            with self._lock(name, blocking=False) as locked:
+                if not locked:
+                    continue
+                (self.directory / name).unlink(missing_ok=True)
+            total -= image.size
+            removed.append(name)
+            logger.info(f"Removed least recently used apptainer image {name}")
+        if removed:
+            with self._lock(self.index_filename):
+                self._write_index(self._read_index())
+        return removed
+
+    def _build(self, image: ContainerImage, path: Path) -> None:
+        tmp_path = path.with_name(f".{path.name}.build")
+        logger.info(f"Building apptainer image {path} from {image.docker_url}")
+        try:
+            subprocess.run(  # noqa: S603 docker url is validated by ContainerImage
+                [
+                    shutil.which("apptainer") or "apptainer",
+                    "build",
+                    "--force",
+                    str(tmp_path),
+                    f"docker://{image.docker_url}",
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+        except subprocess.CalledProcessError as exc:
+            tmp_path.unlink(missing_ok=True)
+            msg = (
+                f"Unable to build {path} from docker://{image.docker_url}:\n"
+                f"{exc.stderr}"
+            )
+            raise RuntimeError(msg) from exc
+        tmp_path.replace(path)
+
+    @contextmanager
+    def _lock(self, name: str, blocking: bool = True) -> Iterator[bool]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_path = self.directory / f".{name}.lock"
+        with lock_path.open("a") as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self) -> _ImageIndex:
+        """Read the index and bring it in line with the files in the directory.
+
+        Should be called while holding the index lock.
+        """
+        index_path = self.directory / self.index_filename
+        index = _ImageIndex()
+        if index_path.exists():
+            index = _ImageIndex.model_validate_json(index_path.read_text())
+        images = {}
+        for path in sorted(self.directory.glob("*.sif")):
+            stat = path.stat()
+            entry = index.images.get(path.name)
+            if entry is None or entry.size != stat.st_size:
+                entry = CachedImage(
+                    size=stat.st_size,
+                    last_used=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                )
+            images[path.name] = entry
+        return _ImageIndex(images=images)
+
+    def _write_index(self, index: _ImageIndex) -> None:
+        index_path = self.directory / self.index_filename
+        tmp_path = index_path.with_name(f".{index_path.name}.tmp")
+        tmp_path.write_text(index.model_dump_json(indent=2))
+        tmp_path.replace(index_path)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(2**20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _PoolKey(NamedTuple):
+    engine: ContainerEngine
+    image: str
+    work_dir: Path
+    input_dirs: tuple[str, ...]
+    image_port: int
+    protocol: Literal["grpc", "openapi"]
+    shared_memory: bool
+    resources: ContainerResources
+
+
+class _IdleContainer(NamedTuple):
+    bmi: Bmi
+    work_dir: Path
+    since: float
+
+
+class ContainerPool:
+    """Warm pool of started model containers.
+
+    Starting a container and waiting until the model inside accepts
+    connections is the slowest part of a model setup. When
+    :py:attr:`CFG.container_pool_size
+    <ewatercycle.config.Configuration.container_pool_size>` is larger than 0,
+    :py:func:`start_container` takes an idle container from this pool and the
+    pool starts a replacement in the background. The first setup of an image
+    starts the pool, or use :py:meth:`warm` to fill it beforehand.
+
+    Containers are pooled per image, engine, input directories and protocol.
+    Each pooled container gets its own work directory in the
+    `.ewatercycle-pool` directory of :py:attr:`CFG.output_dir
+    <ewatercycle.config.Configuration.output_dir>`. The mounts of a running
+    container can not change, so when a setup takes a container, the files
+    in its work directory are moved to the work directory of the container
+    and its work directory is replaced by a symlink to it. Only setups with
+    a work directory inside the output directory are served from the pool.
+    Paths in the config file should be relative to the work directory or
+    point into the work directory of the container.
+
+    A container taken from the pool is not returned to it. It stays with its
+    model, which can initialize it again with `reset`, and is stopped
+    when the model is finalized or removed. Idle containers are stopped after
+    :py:attr:`CFG.container_pool_max_idle
+    <ewatercycle.config.Configuration.container_pool_max_idle>` seconds.
+
+    Use the :py:data:`container_pool` instance instead of making a new pool.
+
+    Example:
+        To have 4 marrmot containers ready before running a batch of models::
+
+            from ewatercycle import CFG
+            from ewatercycle.container import ContainerImage, container_pool
+
+            CFG.container_pool_size = 4
+            container_pool.warm(ContainerImage("ewatercycle/marrmot-grpc4bmi"))
+    """
+
+    def __init__(self):
+        self._idle: dict[_PoolKey, list[_IdleContainer]] = {}
+        self._pending: dict[_PoolKey, list[Future]] = {}
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def __len__(self) -> int:
+        """Number of idle containers in the pool."""
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def acquire(
+        self,
+        work_dir: str | Path,
+        image: ContainerImage,
+        input_dirs: Iterable[str] = (),
+        image_port: int = 55555,
+        timeout: int | None = None,
+        delay: int = 0,
+        protocol: Literal["grpc", "openapi"] = "grpc",
+        shared_memory: bool = False,
+        resources: ContainerResources | None = None,
+    ) -> Bmi | None:
+        """Take an idle container from the pool.
+
+        Starts a replacement container in the background.
+        The work dir is replaced by a symlink to the work directory of the
+        container, see :py:class:`ContainerPool`.
+
+        Returns:
+            Bmi object which wraps the container or None when pooling is
+            disabled, the work dir is not inside the output directory or
+            no container is idle yet.
+        """
+        if CFG.container_pool_size < 1:
+            return None
+        work_path = Path(work_dir).absolute()
+        output_dir = CFG.output_dir.absolute()
+        if (
+            work_path == output_dir
+            or not work_path.is_relative_to(output_dir)
+            or work_path.is_symlink()
+        ):
+            return None
+        key = self._key(
+            image, input_dirs, image_port, protocol, shared_memory, resources
+        )
+        self.prune()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            container = idle.pop() if idle else None
+        self._refill(key, timeout, delay)
+        if container is None:
+            return None
+        _bind_work_dir(container.work_dir, work_path)
+        return container.bmi
+
+    def warm(
+        self,
+        image: ContainerImage,
+        input_dirs: Iterable[str] = (),
+        image_port: int = 55555,
+        timeout: int | None = None,
+        delay: int = 0,
+        protocol: Literal["grpc", "openapi"] = "grpc",
+        shared_memory: bool = False,
+        resources: ContainerResources | None = None,
+    ) -> None:
+        """Start containers until CFG.container_pool_size of them are idle.
+
+        Waits until the containers are started.
+
+        Args:
+            image: Image name for container.
+            input_dirs: Additional directories to mount inside container.
+            image_port: Docker port inside container where grpc4bmi server
+                is running.
+            timeout: Number of seconds to wait for grpc connection.
+            delay: Number of seconds to wait before connecting.
+            protocol: Which protocol to use, grpc or openapi.
+            shared_memory: Exchange values through a shared memory segment.
+            resources: CPUs, cores, memory and threads the containers may use.
+        """
+        key = self._key(
+            image, input_dirs, image_port, protocol, shared_memory, resources
+        )
+        wait(self._refill(key, timeout, delay))
+
+    def prune(self) -> int:
+        """Stop containers which have been idle for too long.
+
+        Returns:
+            Number of stopped containers.
+        """
+        oldest = time.monotonic() - CFG.container_pool_max_idle
+        stopped = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                stopped.extend(c for c in idle if c.since < oldest)
+                self._idle[key] = [c for c in idle if c.since >= oldest]
+        for container in stopped:
+            _stop_idle_container(container)
+        return len(stopped)
+
+    def clear(self) -> None:
+        """Stop all idle containers."""
+        with self._lock:
+            stopped = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for container in stopped:
+            _stop_idle_container(container)
+
+    def _key(
+        self,
+        image: ContainerImage,
+        input_dirs: Iterable[str],
+        image_port: int,
+        protocol: Literal["grpc", "openapi"],
+        shared_memory: bool,
+        resources: ContainerResources | None,
+    ) -> _PoolKey:
+        return _PoolKey(
+            engine=CFG.container_engine,
+            image=str(image),
+            work_dir=CFG.output_dir.absolute(),
+            input_dirs=tuple(sorted(str(d) for d in input_dirs)),
+            image_port=image_port,
+            protocol=protocol,
+            shared_memory=shared_memory,
+            resources=resources or CFG.container_resources,
+        )
+
+    def _refill(self, key: _PoolKey, timeout: int | None, delay: int) -> list[Future]:
+        with self._lock:
+            pending = [f for f in self._pending.get(key, []) if not f.done()]
+            missing = (
+                CFG.container_pool_size - len(self._idle.get(key, [])) - len(pending)
+            )
+            if missing > 0:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        thread_name_prefix="ewatercycle-container-pool"
+                    )
+                executor = self._executor
+                pending.extend(
+                    executor.submit(self._start, key, timeout, delay)
+                    for _ in range(missing)
+                )
+            self._pending[key] = pending
+        return pending
+
+    def _start(self, key: _PoolKey, timeout: int | None, delay: int) -> None:
+        pool_dir = key.work_dir / ".ewatercycle-pool"
+        pool_dir.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(prefix="container-", dir=pool_dir))
+        try:
+            bmi = _start_engine_container(
+                key.engine,
+                work_dir,
+                ContainerImage(key.image),
+                key.input_dirs,
+                key.image_port,
+                timeout,
+                delay,
+                key.protocol,
+                key.shared_memory,
+                key.resources,
+            )
+        except Exception:
+            logger.exception(f"Unable to start pooled container of {key.image}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append(
+                _IdleContainer(bmi, work_dir, time.monotonic())
+            )
+
+
+container_pool = ContainerPool()
+"""Pool of idle containers used by :py:func:`start_container`."""
+
+
+def _bind_work_dir(container_dir: Path, work_dir: Path) -> None:
+    """Make work_dir point to the work directory of a pooled container."""
+    work_dir.mkdir(parents=True, exist_ok=True)
+    for path in work_dir.iterdir():
+        shutil.move(path, container_dir / path.name)
+    work_dir.rmdir()
+    work_dir.symlink_to(container_dir, target_is_directory=True)
+
+
+def _stop_idle_container(container: _IdleContainer) -> None:
+    _stop_container(container.bmi)
+    shutil.rmtree(container.work_dir, ignore_errors=True)
+
+
+def _stop_container(bmi: Bmi) -> None:
+    """Stop the container of a BMI client instead of waiting for garbage collection."""
+    while hasattr(bmi, "origin"):
+        bmi = bmi.origin
+    if isinstance(bmi, _LocalServer):
+        bmi._stop_server()
+        return
+    container = getattr(bmi, "container", None)
+    if container is None:
+        return
+    if isinstance(container, subprocess.Popen):
+        container.terminate()
+        container.wait()
+    else:
+        container.stop()
+    # Keep the client from stopping it again when garbage collected
+    del bmi.container
 
 
 class BmiFromOrigin(Protocol):
@@ -491,3 +1824,821 @@ class BmiProxy(Bmi):
 
     def update_until(self, time: float) -> None:
         return self.origin.update_until(time)
+
+    def get_values(
+        self, names: Sequence[str], dests: Sequence[np.ndarray]
+    ) -> list[np.ndarray]:
+        """Get the values of several variables.
+
+        Not part of BMI, see :py:func:`batch_get_values`.
+        Calls `get_value` for each variable,
+        wrappers which can do better override it.
+        """
+        return [
+            self.get_value(name, dest) for name, dest in zip(names, dests, strict=True)
+        ]
+
+    def set_values(self, values: Mapping[str, np.ndarray]) -> None:
+        """Set the values of several variables.
+
+        Not part of BMI, see :py:func:`batch_set_values`.
+        Calls `set_value` for each variable,
+        wrappers which can do better override it.
+        """
+        for name, value in values.items():
+            self.set_value(name, value)
+
+
+def _get_values(
+    bmi: Bmi, names: Sequence[str], dests: Sequence[np.ndarray]
+) -> list[np.ndarray]:
+    if isinstance(bmi, BmiProxy):
+        return bmi.get_values(names, dests)
+    return [bmi.get_value(name, dest) for name, dest in zip(names, dests, strict=True)]
+
+
+def _set_values(bmi: Bmi, values: Mapping[str, np.ndarray]) -> None:
+    if isinstance(bmi, BmiProxy):
+        bmi.set_values(values)
+        return
+    for name, value in values.items():
+        bmi.set_value(name, value)
+
+
+# Log spaced latency bins from 1 microsecond to 1000 seconds, 10 per decade
+_LATENCY_BIN_EDGES = np.logspace(-6, 3, 91)
+_STAT_NAMES = ("count", "total", "mean", "p50", "p90", "p99", "max", "nbytes")
+
+
+class _CallStats:
+    """Statistics of the calls to a single BMI method."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.nbytes = 0
+        self.histogram = np.zeros(len(_LATENCY_BIN_EDGES) + 1, dtype=np.int64)
+
+    def add(self, duration: float, nbytes: int) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.nbytes += nbytes
+        self.histogram[np.searchsorted(_LATENCY_BIN_EDGES, duration)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the q-th percentile latency in seconds."""
+        cumulative = np.cumsum(self.histogram)
+        index = int(np.searchsorted(cumulative, q / 100 * self.count))
+        if index >= len(_LATENCY_BIN_EDGES):
+            return self.max
+        return min(float(_LATENCY_BIN_EDGES[index]), self.max)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "nbytes": self.nbytes,
+        }
+
+
+def _nbytes(result: Any, args: tuple) -> int:
+    """Number of bytes of array data returned by or passed to a BMI call."""
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    return sum(arg.nbytes for arg in args if isinstance(arg, np.ndarray))
+
+
+class ProfilingBmi(BmiProxy):
+    """BMI wrapper which records the latency of every BMI call.
+
+    For each BMI method the number of calls, the total, mean, maximum and
+    percentile latency in seconds and the number of bytes of array data
+    transferred are recorded. Percentiles are estimated from a histogram with
+    10 log spaced bins per decade, so memory use does not grow with the
+    number of calls.
+
+    When it is the most inner wrapper, the latency of a containerized model
+    includes the transfer of the data to and from the container.
+
+    Args:
+        origin: the BMI object to profile
+
+    Example:
+        To see which BMI calls of a containerized model take the most time::
+
+            from grpc4bmi.bmi_optionaldest import OptionalDestBmi
+            from ewatercycle.container import ProfilingBmi, start_container
+
+            bmi = start_container(
+                work_dir='.',
+                image="ewatercycle/marrmot-grpc4bmi",
+                wrappers=(ProfilingBmi, OptionalDestBmi),
+            )
+            ...
+            bmi.origin.stats()["update"]["p90"]
+    """
+
+    def __init__(self, origin: Bmi):
+        super().__init__(origin)
+        self._stats: dict[str, _CallStats] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, method: str, duration: float, nbytes: int) -> None:
+        with self._lock:
+            if method not in self._stats:
+                self._stats[method] = _CallStats()
+            self._stats[method].add(duration, nbytes)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Statistics of the called BMI methods.
+
+        Returns:
+            Dictionary with the statistics per called method. The statistics are
+            count, total, mean, p50, p90, p99 and max latency in seconds and
+            nbytes of array data transferred.
+        """
+        with self._lock:
+            return {
+                method: stats.as_dict() for method, stats in sorted(self._stats.items())
+            }
+
+    def to_csv(self, path: str | Path) -> None:
+        """Write the statistics to a CSV file with a row per called method.
+
+        Args:
+            path: Path of the CSV file to write.
+        """
+        stats = self.stats()
+        fieldnames = ["method", *_STAT_NAMES]
+        with Path(path).open("w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for method, row in stats.items():
+                writer.writerow({"method": method, **row})
+
+    def reset(self) -> None:
+        """Forget all recorded statistics."""
+        with self._lock:
+            self._stats.clear()
+
+    def get_values(
+        self, names: Sequence[str], dests: Sequence[np.ndarray]
+    ) -> list[np.ndarray]:
+        start = time.perf_counter()
+        try:
+            return _get_values(self.origin, names, dests)
+        finally:
+            nbytes = sum(dest.nbytes for dest in dests)
+            self._record("get_values", time.perf_counter() - start, nbytes)
+
+    def set_values(self, values: Mapping[str, np.ndarray]) -> None:
+        start = time.perf_counter()
+        try:
+            return _set_values(self.origin, values)
+        finally:
+            nbytes = sum(value.nbytes for value in values.values())
+            self._record("set_values", time.perf_counter() - start, nbytes)
+
+
+def _profiled(method: str):
+    def wrapper(self: ProfilingBmi, *args):
+        start = time.perf_counter()
+        nbytes = 0
+        try:
+            result = getattr(self.origin, method)(*args)
+            nbytes = _nbytes(result, args)
+            return result
+        finally:
+            self._record(method, time.perf_counter() - start, nbytes)
+
+    wrapper.__name__ = method
+    wrapper.__qualname__ = f"ProfilingBmi.{method}"
+    return wrapper
+
+
+for _method in Bmi.__abstractmethods__:
+    setattr(ProfilingBmi, _method, _profiled(_method))
+
+
+# BMI methods whose result does not change between initialize and finalize
+_STATIC_METHODS = (
+    "get_component_name",
+    "get_input_item_count",
+    "get_output_item_count",
+    "get_input_var_names",
+    "get_output_var_names",
+    "get_start_time",
+    "get_end_time",
+    "get_time_step",
+    "get_time_units",
+    "get_var_type",
+    "get_var_units",
+    "get_var_itemsize",
+    "get_var_nbytes",
+    "get_var_location",
+    "get_var_grid",
+    "get_grid_rank",
+    "get_grid_size",
+    "get_grid_type",
+    "get_grid_node_count",
+    "get_grid_edge_count",
+    "get_grid_face_count",
+)
+# Same, but with an array to fill as last argument
+_STATIC_ARRAY_METHODS = (
+    "get_grid_shape",
+    "get_grid_x",
+    "get_grid_y",
+    "get_grid_z",
+    "get_grid_spacing",
+    "get_grid_origin",
+    "get_grid_edge_nodes",
+    "get_grid_face_edges",
+    "get_grid_face_nodes",
+    "get_grid_nodes_per_face",
+)
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of a :py:class:`CachingBmi`."""
+
+    hits: int
+    misses: int
+    max_bytes: int
+    nbytes: int
+
+
+class _CacheEntry(NamedTuple):
+    value: Any
+    nbytes: int
+    state: bool
+
+
+class CachingBmi(BmiProxy):
+    """BMI wrapper which caches results within a byte budget.
+
+    Results of static calls, like the variable names, units and grids, are
+    cached until the model is initialized again. The current time is cached
+    until the next `update`, `update_until`, `set_value` or
+    `set_value_at_indices`.
+
+    With `cache_values` the values of variables which are read more than
+    once in a time step are cached as well, until the next update or set,
+    so they are only transferred once per time step. A variable read only
+    once per time step is never copied into the cache.
+    `get_value_at_indices` is answered from a cached `get_value` when
+    available.
+
+    When the cached results exceed `max_bytes`, the least recently used
+    results are evicted. Results larger than `max_bytes` are not cached.
+
+    Replaces :py:class:`grpc4bmi.bmi_memoized.MemoizedBmi`,
+    which caches static calls without a size limit.
+
+    Args:
+        origin: the BMI object to cache the results of
+        max_bytes: Maximum number of bytes of cached results. Defaults to
+            :py:attr:`CFG.bmi_cache_size
+            <ewatercycle.config.Configuration.bmi_cache_size>`.
+        cache_values: Whether to cache values read repeatedly in a time step.
+
+    Example:
+        To cache at most 1 GiB of results, including values, of a
+        containerized model::
+
+            from functools import partial
+            from grpc4bmi.bmi_optionaldest import OptionalDestBmi
+            from ewatercycle.container import CachingBmi, start_container
+
+            bmi = start_container(
+                work_dir='.',
+                image="ewatercycle/marrmot-grpc4bmi",
+                wrappers=(
+                    partial(CachingBmi, max_bytes=2**30, cache_values=True),
+                    OptionalDestBmi,
+                ),
+            )
+            ...
+            bmi.origin.cache_info()
+    """
+
+    def __init__(
+        self, origin: Bmi, max_bytes: int | None = None, cache_values: bool = False
+    ):
+        super().__init__(origin)
+        if max_bytes is None:
+            max_bytes = CFG.bmi_cache_size
+        self.max_bytes = int(max_bytes)
+        self.cache_values = cache_values
+        self._read_this_step: set[str] = set()
+        self._entries: OrderedDict[tuple, _CacheEntry] = OrderedDict()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: tuple) -> _CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def _store(self, key: tuple, value: Any, state: bool) -> None:
+        nbytes = _cache_nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._entries[key] = _CacheEntry(value, nbytes, state)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+    def invalidate_state(self) -> None:
+        """Forget the cached results of state calls.
+
+        Needed when the model state was changed without going through
+        this wrapper.
+        """
+        with self._lock:
+            self._read_this_step.clear()
+            for key, entry in list(self._entries.items()):
+                if entry.state:
+                    del self._entries[key]
+                    self._nbytes -= entry.nbytes
+
+    def cache_info(self) -> CacheInfo:
+        """Number of hits and misses, the byte budget and bytes in use."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.max_bytes, self._nbytes)
+
+    def cache_clear(self) -> None:
+        """Forget all cached results and statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._read_this_step.clear()
+            self._nbytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def initialize(self, config_file: str) -> None:
+        self.cache_clear()
+        return self.origin.initialize(config_file)
+
+    def finalize(self) -> None:
+        try:
+            return self.origin.finalize()
+        finally:
+            self.cache_clear()
+
+    def update(self) -> None:
+        try:
+            return self.origin.update()
+        finally:
+            self.invalidate_state()
+
+    def update_until(self, time: float) -> None:
+        try:
+            return self.origin.update_until(time)
+        finally:
+            self.invalidate_state()
+
+    def set_value(self, name: str, src: np.ndarray) -> None:
+        try:
+            return self.origin.set_value(name, src)
+        finally:
+            self.invalidate_state()
+
+    def set_value_at_indices(
+        self, name: str, inds: np.ndarray, src: np.ndarray
+    ) -> None:
+        try:
+            return self.origin.set_value_at_indices(name, inds, src)
+        finally:
+            self.invalidate_state()
+
+    def get_current_time(self) -> float:
+        key = ("get_current_time",)
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry.value
+        current_time = self.origin.get_current_time()
+        self._store(key, current_time, state=True)
+        return current_time
+
+    def get_value(self, name: str, dest: np.ndarray) -> np.ndarray:
+        if not self.cache_values:
+            return self.origin.get_value(name, dest)
+        key = ("get_value", name)
+        entry = self._lookup(key)
+        if entry is not None:
+            np.copyto(dest, entry.value)
+            return dest
+        result = self.origin.get_value(name, dest)
+        self._read(name, result)
+        return result
+
+    def _read(self, name: str, value: np.ndarray) -> None:
+        with self._lock:
+            repeated = name in self._read_this_step
+            self._read_this_step.add(name)
+        if repeated:
+            # Only variables read again in this step are worth a copy
+            self._store(("get_value", name), np.array(value, copy=True), state=True)
+
+    def get_values(
+        self, names: Sequence[str], dests: Sequence[np.ndarray]
+    ) -> list[np.ndarray]:
+        if not self.cache_values:
+            return _get_values(self.origin, names, dests)
+        results = list(dests)
+        missing = []
+        for index, name in enumerate(names):
+            entry = self._lookup(("get_value", name))
+            if entry is None:
+                missing.append(index)
+            else:
+                np.copyto(dests[index], entry.value)
+        fetched = _get_values(
+            self.origin, [names[i] for i in missing], [dests[i] for i in missing]
+        )
+        for index, result in zip(missing, fetched, strict=True):
+            self._read(names[index], result)
+            results[index] = result
+        return results
+
+    def set_values(self, values: Mapping[str, np.ndarray]) -> None:
+        try:
+            return _set_values(self.origin, values)
+        finally:
+            self.invalidate_state()
+
+    def get_value_at_indices(
+        self, name: str, dest: np.ndarray, inds: np.ndarray
+    ) -> np.ndarray:
+        with self._lock:
+            entry = self._entries.get(("get_value", name))
+        if entry is not None:
+            dest[:] = entry.value[inds]
+            return dest
+        return self.origin.get_value_at_indices(name, dest, inds)
+
+
+def _cache_nbytes(value: Any) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple | list):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _cached(method: str):
+    def wrapper(self: CachingBmi, *args):
+        key = (method, *args)
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry.value
+        result = getattr(self.origin, method)(*args)
+        self._store(key, result, state=False)
+        return result
+
+    wrapper.__name__ = method
+    wrapper.__qualname__ = f"CachingBmi.{method}"
+    return wrapper
+
+
+def _cached_array(method: str):
+    def wrapper(self: CachingBmi, grid: int, dest: np.ndarray) -> np.ndarray:
+        key = (method, grid)
+        entry = self._lookup(key)
+        if entry is not None:
+            dest[:] = entry.value
+            return dest
+        result = getattr(self.origin, method)(grid, dest)
+        self._store(key, np.array(result, copy=True), state=False)
+        return result
+
+    wrapper.__name__ = method
+    wrapper.__qualname__ = f"CachingBmi.{method}"
+    return wrapper
+
+
+for _method in _STATIC_METHODS:
+    setattr(CachingBmi, _method, _cached(_method))
+for _method in _STATIC_ARRAY_METHODS:
+    setattr(CachingBmi, _method, _cached_array(_method))
+
+
+SHARED_MEMORY_PREFIX = "ewatercycle-shm:"
+"""Prefix of the variable names used as control messages by shared memory BMIs."""
+SHARED_MEMORY_BATCH_PREFIX = "ewatercycle-shm-batch:"
+"""Prefix of the control messages for several variables at once."""
+
+
+class SharedMemorySegment:
+    """Directory of memory mapped arrays shared by two processes.
+
+    Each variable is a file in the directory which both processes map into
+    memory, so an array written by one process can be read by the other
+    without copying it through a socket.
+
+    Args:
+        directory: Directory of the segment. Created when missing.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._arrays: dict[str, np.memmap] = {}
+
+    def array(self, name: str, dtype: Any, size: int) -> np.memmap:
+        """Memory mapped array of a variable.
+
+        The file of the variable is grown when it is too small.
+        The mapping is reused as long as the dtype and size stay the same.
+
+        Args:
+            name: Name of the variable.
+            dtype: Data type of the array.
+            size: Number of items in the array.
+        """
+        dtype = np.dtype(dtype)
+        array = self._arrays.get(name)
+        if array is not None and array.dtype == dtype and array.size == size:
+            return array
+        path = self.directory / quote(name, safe="")
+        nbytes = dtype.itemsize * size
+        with path.open("ab") as f:
+            if f.tell() < nbytes:
+                f.truncate(nbytes)
+        array = np.memmap(path, dtype=dtype, mode="r+", shape=(size,))
+        self._arrays[name] = array
+        return array
+
+    def close(self) -> None:
+        """Unmap all arrays."""
+        self._arrays.clear()
+
+
+def _parse_control_name(name: str) -> tuple[str, str] | None:
+    """Split a control variable name into segment id and variable name."""
+    if not name.startswith(SHARED_MEMORY_PREFIX):
+        return None
+    segment_id, _, variable = name[len(SHARED_MEMORY_PREFIX) :].partition(":")
+    return segment_id, variable
+
+
+def _parse_batch_name(name: str) -> tuple[str, list[str]] | None:
+    """Split a batch control name into segment id and variable names."""
+    if not name.startswith(SHARED_MEMORY_BATCH_PREFIX):
+        return None
+    segment_id, _, variables = name[len(SHARED_MEMORY_BATCH_PREFIX) :].partition(":")
+    return segment_id, [unquote(variable) for variable in variables.split(",")]
+
+
+class SharedMemoryBmi(BmiProxy):
+    """BMI client wrapper which exchanges values through a shared memory segment.
+
+    Only a small control message goes through the BMI of `origin`, the values
+    themselves are read from or written to memory mapped files in the segment.
+    The BMI server must wrap its model in :py:class:`SharedMemoryServerBmi`,
+    which recognizes the control messages.
+
+    The values of several variables are exchanged with a single control
+    message by :py:func:`batch_get_values` and :py:func:`batch_set_values`,
+    so one round trip per batch instead of one per variable.
+
+    The segment has to be inside a directory which is mounted in the container
+    at the same path, like the work directory. When that directory is on a
+    tmpfs like /dev/shm the values never touch a disk.
+
+    Args:
+        origin: the BMI object talking to the server
+        directory: Directory of the segment, must be visible to the server
+            at the same path.
+
+    Example:
+        To exchange values with a model in a container through shared memory::
+
+            from ewatercycle.container import start_container
+
+            model = start_container(
+                work_dir='/dev/shm/mymodel',
+                image="ewatercycle/mymodel-grpc4bmi",
+                shared_memory=True,
+            )
+    """
+
+    def __init__(self, origin: Bmi, directory: str | Path):
+        super().__init__(origin)
+        self.segment = SharedMemorySegment(directory)
+        self._control = np.empty(1, dtype=np.int64)
+
+    @classmethod
+    def in_work_dir(cls, origin: Bmi, work_dir: str | Path) -> "SharedMemoryBmi":
+        """Wrap origin with a new segment inside the work directory."""
+        directory = tempfile.mkdtemp(prefix=".ewatercycle-shm-", dir=work_dir)
+        return cls(origin, directory)
+
+    def _control_name(self, name: str) -> str:
+        return f"{SHARED_MEMORY_PREFIX}{self.segment.directory.name}:{name}"
+
+    def _batch_control_name(self, names: Iterable[str]) -> str:
+        variables = ",".join(quote(name, safe="") for name in names)
+        return f"{SHARED_MEMORY_BATCH_PREFIX}{self.segment.directory.name}:{variables}"
+
+    def get_value(self, name: str, dest: np.ndarray) -> np.ndarray:
+        self.origin.get_value(self._control_name(name), self._control)
+        array = self.segment.array(name, dest.dtype, int(self._control[0]))
+        np.copyto(dest, array.reshape(dest.shape))
+        return dest
+
+    def set_value(self, name: str, src: np.ndarray) -> None:
+        array = self.segment.array(name, src.dtype, src.size)
+        array[:] = src.reshape(-1)
+        self._control[0] = src.size
+        return self.origin.set_value(self._control_name(name), self._control)
+
+    def get_values(
+        self, names: Sequence[str], dests: Sequence[np.ndarray]
+    ) -> list[np.ndarray]:
+        if not names:
+            return []
+        sizes = np.empty(len(names), dtype=np.int64)
+        self.origin.get_value(self._batch_control_name(names), sizes)
+        for name, dest, size in zip(names, dests, sizes, strict=True):
+            array = self.segment.array(name, dest.dtype, int(size))
+            np.copyto(dest, array.reshape(dest.shape))
+        return list(dests)
+
+    def set_values(self, values: Mapping[str, np.ndarray]) -> None:
+        if not values:
+            return
+        sizes = np.empty(len(values), dtype=np.int64)
+        for index, (name, src) in enumerate(values.items()):
+            array = self.segment.array(name, src.dtype, src.size)
+            array[:] = src.reshape(-1)
+            sizes[index] = src.size
+        self.origin.set_value(self._batch_control_name(values), sizes)
+
+    def close(self) -> None:
+        """Unmap the arrays and remove the segment directory.
+
+        The segment is kept when the model is finalized, so the model can be
+        initialized again.
+        """
+        self.segment.close()
+        shutil.rmtree(self.segment.directory, ignore_errors=True)
+
+    def __del__(self):  # noqa: D105
+        if hasattr(self, "segment"):
+            self.close()
+
+
+class SharedMemoryServerBmi(BmiProxy):
+    """BMI server wrapper which answers the control messages of shared memory BMIs.
+
+    Counterpart of :py:class:`SharedMemoryBmi`. Wrap the model with this class
+    in the BMI server of a container image to let clients exchange values
+    through shared memory. All other calls are forwarded to the model.
+
+    Args:
+        origin: the BMI model
+        root: Directory in which the client makes its segments.
+            Defaults to the current working directory, which is the work
+            directory of the container.
+
+    Example:
+        In the container image start the server with::
+
+            from grpc4bmi.run_server import BmiServer
+            from ewatercycle.container import SharedMemoryServerBmi
+
+            server = BmiServer(SharedMemoryServerBmi(MyModel()))
+    """
+
+    def __init__(self, origin: Bmi, root: str | Path = "."):
+        super().__init__(origin)
+        self.root = Path(root)
+        self._segments: dict[str, SharedMemorySegment] = {}
+
+    def _segment(self, segment_id: str) -> SharedMemorySegment:
+        if segment_id not in self._segments:
+            self._segments[segment_id] = SharedMemorySegment(self.root / segment_id)
+        return self._segments[segment_id]
+
+    def _variable_array(self, segment_id: str, name: str) -> np.memmap:
+        size = self.origin.get_var_nbytes(name) // self.origin.get_var_itemsize(name)
+        return self._segment(segment_id).array(
+            name, self.origin.get_var_type(name), size
+        )
+
+    def _parse(self, name: str) -> tuple[str, list[str]] | None:
+        """Segment id and variables of a control message, None for others."""
+        control = _parse_control_name(name)
+        if control is not None:
+            return control[0], [control[1]]
+        return _parse_batch_name(name)
+
+    def get_value(self, name: str, dest: np.ndarray) -> np.ndarray:
+        control = self._parse(name)
+        if control is None:
+            return self.origin.get_value(name, dest)
+        segment_id, variables = control
+        # One variable after another, as the model is not thread-safe
+        for index, variable in enumerate(variables):
+            array = self._variable_array(segment_id, variable)
+            self.origin.get_value(variable, array)
+            dest[index] = array.size
+        return dest
+
+    def set_value(self, name: str, src: np.ndarray) -> None:
+        control = self._parse(name)
+        if control is None:
+            return self.origin.set_value(name, src)
+        segment_id, variables = control
+        for variable, size in zip(variables, src, strict=True):
+            dtype = self.origin.get_var_type(variable)
+            array = self._segment(segment_id).array(variable, dtype, int(size))
+            self.origin.set_value(variable, np.asarray(array))
+        return None
+
+    def get_var_type(self, name: str) -> str:
+        if self._parse(name) is None:
+            return self.origin.get_var_type(name)
+        return "int64"
+
+    def get_var_itemsize(self, name: str) -> int:
+        if self._parse(name) is None:
+            return self.origin.get_var_itemsize(name)
+        return np.dtype(np.int64).itemsize
+
+    def get_var_nbytes(self, name: str) -> int:
+        control = self._parse(name)
+        if control is None:
+            return self.origin.get_var_nbytes(name)
+        return np.dtype(np.int64).itemsize * len(control[1])
+
+    def finalize(self) -> None:
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+        return self.origin.finalize()
+
+
+def batch_get_values(
+    bmi: OptionalDestBmi, names: Iterable[str]
+) -> dict[str, np.ndarray]:
+    """Get the values of several variables.
+
+    The request goes through the wrappers of `bmi`. When the values are
+    exchanged through shared memory (see :py:class:`SharedMemoryBmi`),
+    all values are transferred with a single round trip. Otherwise each value
+    is requested one after another. Either way the model is never asked for
+    two values at the same time, as BMI models are not thread-safe.
+    Values cached by a :py:class:`CachingBmi` wrapper with `cache_values`
+    are answered without a round trip.
+
+    Args:
+        bmi: BMI with optional dest arguments, as returned by
+            :py:func:`start_container`.
+        names: Names of the variables.
+
+    Returns:
+        Dictionary with a new array for each variable.
+    """
+    names = list(dict.fromkeys(names))
+    dests = [reserve_values(bmi, name) for name in names]
+    if isinstance(bmi, OptionalDestBmi):
+        # Only reserves missing dest arrays, which are given here
+        bmi = bmi.origin
+    return dict(zip(names, _get_values(bmi, names, dests), strict=True))
+
+
+def batch_set_values(bmi: Bmi, values: Mapping[str, np.ndarray]) -> None:
+    """Set the values of several variables.
+
+    Counterpart of :py:func:`batch_get_values`.
+    The values are set in the given order.
+
+    Args:
+        bmi: BMI as returned by :py:func:`start_container`.
+        values: New value for each variable.
+    """
+    if isinstance(bmi, OptionalDestBmi):
+        bmi = bmi.origin
+    _set_values(bmi, values)
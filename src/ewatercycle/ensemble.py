@@ -0,0 +1,210 @@
+"""Run an ensemble of model instances in parallel.
+
+Examples:
+    To run a model with 3 different values of a parameter and collect
+    the discharge of each member::
+
+        from ewatercycle.ensemble import EnsembleMember, run_ensemble
+        from ewatercycle.models import HBV
+
+        members = [
+            EnsembleMember(forcing=forcing, parameters={"parameters": p})
+            for p in parameter_sets
+        ]
+        ds, failed = run_ensemble(HBV, members, outputs=["Q"], max_workers=8)
+        ds["Q"].sel(member=0)
+
+    Each member is setup, run and finalized in its own worker.
+    A member which fails does not stop the others.
+    For containerized models every member runs in its own container,
+    so the default thread pool is enough to use all cores of a node.
+    For local models pass `processes=True` to run each member in a worker
+    process instead.
+"""
+
+import datetime as dt
+import logging
+from collections.abc import Iterable, Sequence
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from contextlib import suppress
+from datetime import timezone
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import xarray as xr
+from pydantic import BaseModel
+
+from ewatercycle.base.forcing import DefaultForcing, _use_config
+from ewatercycle.base.model import eWaterCycleModel
+from ewatercycle.base.parameter_set import ParameterSet
+from ewatercycle.config import CFG
+from ewatercycle.util import to_absolute_path
+
+logger = logging.getLogger(__name__)
+
+
+class EnsembleMember(BaseModel):
+    """Overrides for a single member of an ensemble.
+
+    Args:
+        forcing: Forcing to construct the member's model with.
+        parameter_set: Parameter set to construct the member's model with.
+        parameters: Keyword arguments passed to the member's model setup.
+    """
+
+    forcing: DefaultForcing | None = None
+    parameter_set: ParameterSet | None = None
+    parameters: dict[str, Any] = {}
+
+
+def run_ensemble(
+    model_class: type[eWaterCycleModel],
+    members: Sequence[EnsembleMember],
+    outputs: Iterable[str],
+    end_time: float | str | None = None,
+    every: int = 1,
+    cfg_dir: str | Path | None = None,
+    max_workers: int | None = None,
+    executor: Executor | None = None,
+    processes: bool = False,
+) -> tuple[xr.Dataset, dict[int, Exception]]:
+    """Run an ensemble of models in parallel and collect their output.
+
+    Args:
+        model_class: Model class to make an instance of for each member.
+        members: The overrides of each member.
+        outputs: Names of the variables to collect of each member.
+        end_time: Time to run the members until. Either in model time units or
+            as UTC ISO format string e.g. 'YYYY-MM-DDTHH:MM:SSZ'.
+            Defaults to the end time of each model.
+        every: Collect the outputs every `every` time steps.
+        cfg_dir: Directory in which each member gets its own config directory.
+            If not given then a time-stamped directory inside
+            ewatercycle.CFG['output_dir'] is used.
+        max_workers: Number of members to run at the same time.
+            Defaults to the number of members.
+            Ignored when executor is given.
+        executor: Executor to run the members in. By default a thread pool
+            with max_workers threads is used. The workers of a given process
+            pool do not get the configuration of this process,
+            use `processes` for that.
+        processes: Run the members in a process pool with max_workers
+            processes instead of a thread pool. The workers use the
+            configuration of this process. Ignored when executor is given.
+
+    Returns:
+        Dataset with the outputs of the members which succeeded along a
+        `member` dimension with the index of each member,
+        and the exception raised by each member which failed.
+    """
+    if not members:
+        msg = "An ensemble needs at least one member."
+        raise ValueError(msg)
+    outputs = tuple(outputs)
+    ensemble_dir = _make_ensemble_dir(model_class, cfg_dir)
+
+    own_executor = executor is None
+    if executor is None and processes:
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers or len(members),
+            # Workers started with spawn do not share the in-memory config
+            initializer=_use_config,
+            initargs=(CFG.model_copy(),),
+        )
+    elif executor is None:
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(members))
+    try:
+        futures = {
+            executor.submit(
+                _run_member,
+                model_class,
+                member,
+                outputs,
+                end_time,
+                every,
+                ensemble_dir / f"member_{index}",
+            ): index
+            for index, member in enumerate(members)
+        }
+        datasets: dict[int, xr.Dataset] = {}
+        failed: dict[int, Exception] = {}
+        for future in as_completed(futures):
+            index = futures[future]
+            exc = future.exception()
+            if exc is None:
+                datasets[index] = future.result()
+            elif isinstance(exc, Exception):
+                failed[index] = exc
+                logger.error(f"Ensemble member {index} failed: {exc}")
+            else:
+                raise exc
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+    if not datasets:
+        return xr.Dataset(), dict(sorted(failed.items()))
+    indices = sorted(datasets)
+    ds = xr.concat(
+        [datasets[index] for index in indices],
+        dim=pd.Index(indices, name="member"),
+    )
+    return ds, dict(sorted(failed.items()))
+
+
+def _make_ensemble_dir(
+    model_class: type[eWaterCycleModel], cfg_dir: str | Path | None
+) -> Path:
+    if cfg_dir is not None:
+        return to_absolute_path(cfg_dir)
+    timestamp = dt.datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    folder_prefix = model_class.__name__.lower()
+    return to_absolute_path(
+        f"{folder_prefix}_ensemble_{timestamp}", parent=CFG.output_dir
+    )
+
+
+def _run_member(
+    model_class: type[eWaterCycleModel],
+    member: EnsembleMember,
+    outputs: tuple[str, ...],
+    end_time: float | str | None,
+    every: int,
+    cfg_dir: Path,
+) -> xr.Dataset:
+    overrides: dict[str, Any] = {}
+    if member.forcing is not None:
+        overrides["forcing"] = member.forcing
+    if member.parameter_set is not None:
+        overrides["parameter_set"] = member.parameter_set
+    model = model_class(**overrides)
+    try:
+        cfg_file, _ = model.setup(cfg_dir=str(cfg_dir), **member.parameters)
+        model.initialize(cfg_file)
+        return model.run_until(end_time=end_time, outputs=outputs, every=every)
+    finally:
+        _finalize(model)
+
+
+def _finalize(model: eWaterCycleModel) -> None:
+    """Finalize the model, also when its initialize failed.
+
+    The BMI of the model is removed even when finalize fails,
+    which stops its container. Nothing is done when setup did not get as far
+    as starting the BMI.
+    """
+    if not hasattr(model, "_bmi"):
+        return
+    try:
+        model.finalize()
+    except Exception:
+        logger.warning(f"Unable to finalize {model}", exc_info=True)
+    finally:
+        with suppress(AttributeError):
+            del model._bmi
@@ -205,6 +205,7 @@ class DummyModelWith2DRectilinearGrid(
         # but without the self.time is not initialized
         WithMocksMixin.__init__(self)
         WithDailyMixin.__init__(self)
+        NotImplementedModel.__init__(self)
         self.dtype = np.dtype("float32")
         self.value = np.array(
             [
@@ -12,6 +12,7 @@ import numpy as np
 import pandas as pd
 import xarray as xr
 from dateutil.parser import parse
+from scipy.spatial import cKDTree
 from shapely import geometry
 
 
@@ -84,6 +85,84 @@ def geographical_distances(
     return radius * np.sqrt(dlat**2 + (np.cos(latm) * dlon) ** 2)
 
 
+def _to_unit_vectors(longitudes: np.ndarray, latitudes: np.ndarray) -> np.ndarray:
+    """Convert lon/lat in degrees to 3D cartesian vectors on the unit sphere."""
+    lon = np.radians(longitudes)
+    lat = np.radians(latitudes)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+class NearestGridPointIndex:
+    """Nearest neighbour lookup of points on a rectilinear lat/lon grid.
+
+    The grid cells are stored in a KD-tree of 3D unit vectors, so finding the
+    closest cell costs a tree query instead of a distance calculation against
+    every cell of the grid like :py:func:`find_closest_point` does.
+
+    Args:
+        grid_longitudes: 1d array of model grid longitudes in degrees
+        grid_latitudes: 1d array of model grid latitudes in degrees
+        radius: Radius of a sphere in km. Default is Earths approximate radius.
+
+    Example:
+        >>> index = NearestGridPointIndex([0.1, 0.2, 0.3], [1.1, 1.2])
+        >>> index.query([0.31], [1.19])
+        (array([2]), array([1]))
+    """
+
+    def __init__(  # noqa: D107
+        self,
+        grid_longitudes: Iterable[float],
+        grid_latitudes: Iterable[float],
+        radius=6373.0,
+    ):
+        self.longitudes = np.asarray(grid_longitudes, dtype=np.float64)
+        self.latitudes = np.asarray(grid_latitudes, dtype=np.float64)
+        self.radius = radius
+
+        # Create a grid from coordinates (shape will be (nlat, nlon))
+        lon_vectors, lat_vectors = np.meshgrid(self.longitudes, self.latitudes)
+        self._tree = cKDTree(_to_unit_vectors(lon_vectors.ravel(), lat_vectors.ravel()))
+
+        # Rough check to see if point is in or near the grid
+        dx = np.abs(np.diff(self.longitudes)).max() * 111  # (1 degree ~ 111km)
+        dy = np.abs(np.diff(self.latitudes)).max() * 111  # (1 degree ~ 111km)
+        self.max_distance = max(dx, dy) * 2
+
+    def query(
+        self, point_longitudes: Iterable[float], point_latitudes: Iterable[float]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the closest grid cells to points.
+
+        Args:
+            point_longitudes: longitudes in degrees of target coordinates
+            point_latitudes: latitudes in degrees of target coordinates
+
+        Raises:
+            ValueError: When a point is outside the grid.
+
+        Returns:
+            Tuple with first the indices of the closest grid points in the
+            longitude array and second the indices in the latitude array.
+        """
+        lons = np.asarray(point_longitudes, dtype=np.float64)
+        lats = np.asarray(point_latitudes, dtype=np.float64)
+        chords, flat_indices = self._tree.query(_to_unit_vectors(lons, lats))
+        distances = 2 * self.radius * np.arcsin(np.minimum(chords / 2, 1.0))
+
+        outside = distances > self.max_distance
+        if outside.any():
+            first = np.argmax(outside)
+            msg = f"Point {lons[first], lats[first]} outside model grid."
+            raise ValueError(msg)
+
+        idx_lat, idx_lon = np.unravel_index(
+            flat_indices, (self.latitudes.size, self.longitudes.size)
+        )
+        return idx_lon, idx_lat
+
+
 # TODO rename to to_utcdatetime
 def get_time(time_iso: str) -> datetime:
     """Return a datetime in UTC.
@@ -178,13 +257,10 @@ def _move_height_to_attrs(ds: xr.Dataset) -> xr.Dataset:
         )
         raise ValueError(msg)
 
-    ds[var].attrs.update(
-        {
-            "height": float(ds["height"]),
-            "height_units": ds["height"].attrs["units"],
-        }
+    height = ds[var].assign_attrs(
+        height=float(ds["height"]), height_units=ds["height"].attrs["units"]
     )
-    return ds.drop_vars(("height",))
+    return ds.assign({var: height}).drop_vars(("height",))
 
 
 def merge_esvmaltool_datasets(datasets: list[xr.Dataset]) -> xr.Dataset:
@@ -197,45 +273,45 @@ def merge_esvmaltool_datasets(datasets: list[xr.Dataset]) -> xr.Dataset:
     ('waldo-on-a-page' precision)[1], while solving the floating point inprecision
     issue.
 
+    The input datasets are not modified and their data is not copied, so lazy
+    datasets stay lazy.
+
     References:
         [1] Randall Monroe, 2019. xkcd: Coordinate Precision. https://xkcd.com/2170/
     """
-    datasets = [ds.copy(deep=True) for ds in datasets]
-
     _check_coordinates_line_up(datasets)
 
-    removed = {
-        "lat_bnds": False,
-        "lon_bnds": False,
-    }
-    for i in range(len(datasets)):
+    merged: list[xr.Dataset] = []
+    has_bounds = set()
+    for original in datasets:
+        ds = original
         # Bounds are not aligned, and can be missing in derived vars,
         #  so we remove all except the first lat/lon bounds we encounter.
         for coord in ["lat_bnds", "lon_bnds"]:
-            if coord in datasets[i]:
-                if removed[coord]:
-                    datasets[i] = datasets[i].drop_vars(coord)
-                removed[coord] = True
+            if coord in ds:
+                if coord in has_bounds:
+                    ds = ds.drop_vars(coord)
+                has_bounds.add(coord)
 
         # xr.align doesn't work for lumped forcing. this works for both lumped and dist:
-        for coord in ["lat", "lon"]:
-            datasets[i][coord] = datasets[0][coord]
+        if merged:
+            ds = ds.assign(lat=merged[0]["lat"], lon=merged[0]["lon"])
 
         # the time coordinates are messed up for some files, see:
         #   https://github.com/eWaterCycle/infra/issues/157
         #   the following is a workaround.
-        if "time_bnds" in datasets[i] and xr.infer_freq(datasets[i]["time"]) == "D":
-            datasets[i]["time"] = datasets[i]["time_bnds"].isel(bnds=0) + pd.Timedelta(
-                "12H"
-            )
-            datasets[i] = datasets[i].drop_vars("time_bnds")
+        if "time_bnds" in ds and xr.infer_freq(ds["time"]) == "D":
+            time = ds["time_bnds"].isel(bnds=0) + pd.Timedelta("12H")
+            ds = ds.assign(time=time).drop_vars("time_bnds")
 
         # A "height" coordinate can be present, which will result in conflicts.
         #   Instead, we move it to the variable's attributes.
-        if "height" in datasets[i].variables:
-            datasets[i] = _move_height_to_attrs(datasets[i])
+        if "height" in ds.variables:
+            ds = _move_height_to_attrs(ds)
+
+        merged.append(ds)
 
-    return xr.combine_by_coords(datasets, combine_attrs="drop_conflicts")  # type: ignore[return-value]
+    return xr.combine_by_coords(merged, combine_attrs="drop_conflicts")  # type: ignore[return-value]
 
 
 def to_absolute_path(
@@ -1,8 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from shutil import copytree
+from shutil import copyfile, copytree
 from unittest import mock
 
 import cartopy.crs as ccrs
+import numpy as np
 import pytest
 import xarray as xr
 from cartopy.io import shapereader
@@ -22,7 +24,11 @@ from ewatercycle.base.forcing import (
     DistributedUserForcing,
     GenericDistributedForcing,
     LumpedUserForcing,
+    _forcing_cache_entry,
 )
+from ewatercycle.config import CFG
+from ewatercycle.esmvaltool.schema import Documentation, Recipe
+from ewatercycle.util import merge_esvmaltool_datasets
 
 # Use GenericDistributedForcing to test abstract DefaultForcing class
 
@@ -225,6 +231,125 @@ tasmax: OBS6_ERA5_reanaly_*_day_tasmax_2000-2001.nc
         )
         assert forcing == expected
 
+    def test_to_xarray_is_cached(self, tmp_path: Path):
+        write_forcing_files(tmp_path, ("pr", "tas", "rsds"))
+        forcing = GenericDistributedForcing(
+            directory=tmp_path,
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-01-02T00:00:00Z",
+            filenames={"pr": "pr.nc", "tas": "tas.nc"},
+        )
+
+        with mock.patch(
+            "ewatercycle.base.forcing.merge_esvmaltool_datasets",
+            wraps=merge_esvmaltool_datasets,
+        ) as merge:
+            first = forcing.to_xarray()
+            first["extra"] = first["pr"] + 1
+            second = forcing.to_xarray()
+            forcing.filenames["rsds"] = "rsds.nc"
+            third = forcing.to_xarray()
+
+        assert merge.call_count == 2
+        assert list(second.data_vars) == ["pr", "tas"]
+        assert list(third.data_vars) == ["pr", "tas", "rsds"]
+
+    def test_to_xarray_keeps_forcing_equal_to_copy(self, tmp_path: Path):
+        write_forcing_files(tmp_path, ("pr",))
+        forcing = GenericDistributedForcing(
+            directory=tmp_path,
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-01-02T00:00:00Z",
+            filenames={"pr": "pr.nc"},
+        )
+        copy = forcing.model_copy()
+
+        forcing.to_xarray()
+
+        assert forcing == copy
+
+    def test_close_opens_files_again(self, tmp_path: Path):
+        write_forcing_files(tmp_path, ("pr",))
+        forcing = GenericDistributedForcing(
+            directory=tmp_path,
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-01-02T00:00:00Z",
+            filenames={"pr": "pr.nc"},
+        )
+        forcing.to_xarray()
+
+        forcing.close()
+        with mock.patch(
+            "ewatercycle.base.forcing.merge_esvmaltool_datasets",
+            wraps=merge_esvmaltool_datasets,
+        ) as merge:
+            ds = forcing.to_xarray()
+
+        merge.assert_called_once()
+        assert list(ds.data_vars) == ["pr"]
+
+    def test_to_zarr(self, tmp_path: Path):
+        pytest.importorskip("zarr")
+        write_forcing_files(tmp_path, ("pr", "tas"))
+        forcing = GenericDistributedForcing(
+            directory=tmp_path,
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-01-02T00:00:00Z",
+            filenames={"pr": "pr.nc", "tas": "tas.nc"},
+        )
+
+        zarr_forcing = forcing.to_zarr(chunks={"lat": 1})
+        zarr_forcing.save()
+
+        assert zarr_forcing.filenames == {"pr": "forcing.zarr", "tas": "forcing.zarr"}
+        loaded = GenericDistributedForcing.load(tmp_path)
+        ds = loaded.to_xarray()
+        xr.testing.assert_equal(ds, forcing.to_xarray())
+        assert ds["pr"].chunks == ((2,), (1,), (1,))
+
+    def test_to_zarr_without_zarr_extension(self, tmp_path: Path):
+        forcing = GenericDistributedForcing(
+            directory=tmp_path,
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-01-02T00:00:00Z",
+            filenames={"pr": "pr.nc"},
+        )
+
+        with pytest.raises(ValueError, match=r"must have \.zarr extension"):
+            forcing.to_zarr("forcing.nc")
+
+    def test_to_zarr_onto_own_store(self, tmp_path: Path):
+        forcing = GenericDistributedForcing(
+            directory=tmp_path,
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-01-02T00:00:00Z",
+            filenames={"pr": "forcing.zarr", "tas": "forcing.zarr"},
+        )
+
+        with pytest.raises(ValueError, match="is read by this forcing"):
+            forcing.to_zarr()
+
+
+def write_forcing_files(
+    directory: Path,
+    variables: tuple[str, ...],
+    start: str = "2000-01-01",
+    filename: str = "{var}.nc",
+) -> dict[str, str]:
+    filenames = {}
+    for var in variables:
+        ds = xr.Dataset(
+            {var: (("time", "lat", "lon"), [[[1.0]], [[2.0]]])},
+            coords={
+                "time": xr.date_range(start, periods=2),
+                "lat": [52.0],
+                "lon": [4.0],
+            },
+        )
+        filenames[var] = filename.format(var=var)
+        ds.to_netcdf(directory / filenames[var])
+    return filenames
+
 
 class TestMakkinkUserForcing:
     @pytest.mark.parametrize(
@@ -318,6 +443,253 @@ def test_integration_makkink_forcing(sample_shape, recipe_output):
         )
 
 
+def test_generate_uses_forcing_cache(
+    sample_shape, recipe_output, tmp_path: Path, monkeypatch
+):
+    (tmp_path / "cache").mkdir()
+    monkeypatch.setattr(CFG, "forcing_cache_dir", tmp_path / "cache")
+    monkeypatch.setattr(CFG, "output_dir", tmp_path / "output")
+    run_recipe = mock.Mock(side_effect=lambda *args, **kwargs: dict(recipe_output))
+
+    def generate(directory=None, end_time="2000-12-31T00:00:00Z"):
+        return DistributedUserForcing.generate(
+            dataset="ERA5",
+            start_time="2000-01-01T00:00:00Z",
+            end_time=end_time,
+            shape=sample_shape,
+            directory=directory,
+            variables=("pr", "tas"),
+        )
+
+    with mock.patch.object(DistributedUserForcing, "_run_recipe", new=run_recipe):
+        first = generate()
+        second = generate(directory=str(tmp_path / "second"))
+        third = generate()
+        generate(end_time="2000-12-30T00:00:00Z")
+
+    assert run_recipe.call_count == 2
+    assert second.directory == tmp_path / "second"
+    assert second.filenames == first.filenames
+    assert (second.directory / first.filenames["pr"]).samefile(
+        first.directory / first.filenames["pr"]
+    )
+    assert second.shape == second.directory / "Rhine.shp"
+    assert third.directory.parent == CFG.output_dir
+    assert (third.directory / first.filenames["pr"]).samefile(
+        first.directory / first.filenames["pr"]
+    )
+    third.save()
+    assert len(list(CFG.forcing_cache_dir.iterdir())) == 2
+
+
+def _keep(variables):
+    return tuple(variables)
+
+
+def _reverse(variables):
+    return tuple(reversed(variables))
+
+
+def test_forcing_cache_entry_depends_on_postprocessor_source(
+    sample_shape, tmp_path: Path, monkeypatch
+):
+    monkeypatch.setattr(CFG, "forcing_cache_dir", tmp_path)
+    recipe = Recipe(
+        documentation=Documentation(title="Test", description="", authors=[])
+    )
+    offset = 1
+
+    def with_closure(variables):
+        return (variables, offset)
+
+    def entry(postprocessor):
+        return _forcing_cache_entry(
+            DistributedUserForcing,
+            recipe,
+            Path(sample_shape),
+            postprocessor,
+            dataset="ERA5",
+        )
+
+    assert entry(_keep) == entry(_keep)
+    assert entry(_keep) != entry(_reverse)
+    assert entry(with_closure) is None
+
+
+def test_save_in_forcing_cache(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(CFG, "forcing_cache_dir", tmp_path)
+    forcing = GenericDistributedForcing(
+        directory=tmp_path / "abc",
+        start_time="2000-01-01T00:00:00Z",
+        end_time="2000-01-02T00:00:00Z",
+        filenames={"pr": "pr.nc"},
+    )
+
+    with pytest.raises(ValueError, match="forcing cache"):
+        forcing.save()
+
+
+def test_generate_many(sample_shape, recipe_output, tmp_path: Path):
+    missing_shape = tmp_path / "Missing.shp"
+    for path in Path(sample_shape).parent.glob("Rhine.*"):
+        copyfile(path, missing_shape.with_suffix(path.suffix))
+
+    def run_recipe(recipe, directory=None):
+        if "Missing" in recipe.to_yaml():
+            msg = "No data found"
+            raise ValueError(msg)
+        return dict(recipe_output)
+
+    with (
+        mock.patch.object(DistributedUserForcing, "_run_recipe", new=run_recipe),
+        ThreadPoolExecutor(max_workers=2) as executor,
+    ):
+        forcings = DistributedUserForcing.generate_many(
+            dataset="ERA5",
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-12-31T00:00:00Z",
+            shapes=[sample_shape, missing_shape],
+            executor=executor,
+            variables=("pr", "tas"),
+        )
+
+    assert list(forcings) == [sample_shape, missing_shape]
+    forcing = forcings[sample_shape]
+    assert isinstance(forcing, DistributedUserForcing)
+    assert forcing.directory == recipe_output["directory"]
+    assert isinstance(forcings[missing_shape], ValueError)
+
+
+def test_generate_many_with_duplicate_shape_names(tmp_path: Path):
+    with pytest.raises(ValueError, match="must be unique"):
+        DistributedUserForcing.generate_many(
+            dataset="ERA5",
+            start_time="2000-01-01T00:00:00Z",
+            end_time="2000-12-31T00:00:00Z",
+            shapes=["a/Rhine.shp", "b/Rhine.shp"],
+            directory=tmp_path,
+        )
+
+
+def test_extend(sample_shape, tmp_path: Path):
+    filename = "{var}_2000-2000.nc"
+    forcing = GenericDistributedForcing(
+        directory=tmp_path,
+        start_time="2000-01-01T00:00:00Z",
+        end_time="2000-01-02T00:00:00Z",
+        shape=sample_shape,
+        filenames=write_forcing_files(tmp_path, ("pr", "tas"), filename=filename),
+    )
+    new_dir = tmp_path / "new"
+    new_dir.mkdir()
+    new_filenames = write_forcing_files(
+        new_dir, ("pr", "tas"), start="2001-01-01", filename="{var}_2001-2001.nc"
+    )
+    run_recipe = mock.Mock(return_value={"directory": str(new_dir), **new_filenames})
+
+    with mock.patch.object(GenericDistributedForcing, "_run_recipe", new=run_recipe):
+        forcing.extend("2001-01-02T00:00:00Z", dataset="ERA5")
+
+    recipe = run_recipe.call_args.args[0]
+    assert "start_year: 2001" in recipe.to_yaml()
+    assert forcing.end_time == "2001-01-02T00:00:00Z"
+    assert forcing.filenames == {"pr": "pr_2000-2001.nc", "tas": "tas_2000-2001.nc"}
+    assert not (tmp_path / "pr_2000-2000.nc").exists()
+    loaded = GenericDistributedForcing.load(tmp_path)
+    assert loaded.end_time == forcing.end_time
+    assert loaded.filenames == forcing.filenames
+    ds = xr.open_dataset(tmp_path / "pr_2000-2001.nc")
+    assert len(ds.time) == 4
+    assert ds.time[-1].values == np.datetime64("2001-01-02")
+
+
+def test_extend_file_with_several_variables(sample_shape, tmp_path: Path):
+    write_forcing_files(tmp_path, ("pr",), filename="pr.nc")
+    write_forcing_files(tmp_path, ("tas",), filename="tas.nc")
+    with (
+        xr.open_dataset(tmp_path / "pr.nc") as pr,
+        xr.open_dataset(tmp_path / "tas.nc") as tas,
+    ):
+        xr.merge([pr, tas]).to_netcdf(tmp_path / "all_2000.nc")
+    forcing = GenericDistributedForcing(
+        directory=tmp_path,
+        start_time="2000-01-01T00:00:00Z",
+        end_time="2000-01-02T00:00:00Z",
+        shape=sample_shape,
+        filenames={"pr": "all_2000.nc", "tas": "all_2000.nc"},
+    )
+    new_dir = tmp_path / "new"
+    new_dir.mkdir()
+    new_filenames = write_forcing_files(new_dir, ("pr", "tas"), start="2001-01-01")
+    run_recipe = mock.Mock(return_value={"directory": str(new_dir), **new_filenames})
+
+    with mock.patch.object(GenericDistributedForcing, "_run_recipe", new=run_recipe):
+        forcing.extend("2001-01-02T00:00:00Z", dataset="ERA5")
+
+    assert forcing.filenames == {"pr": "all_2001.nc", "tas": "all_2001.nc"}
+    assert not (tmp_path / "all_2000.nc").exists()
+    ds = forcing.to_xarray()
+    assert len(ds.time) == 4
+    assert ds["tas"].isel(time=-1).item() == 2.0
+
+
+def test_extend_cached_forcing(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(CFG, "forcing_cache_dir", tmp_path)
+    forcing = GenericDistributedForcing(
+        directory=tmp_path / "abc",
+        start_time="2000-01-01T00:00:00Z",
+        end_time="2000-01-02T00:00:00Z",
+        filenames={"pr": "pr.nc"},
+    )
+
+    with pytest.raises(ValueError, match="forcing cache"):
+        forcing.extend("2001-01-02T00:00:00Z", dataset="ERA5")
+
+
+def test_save_does_not_write_through_hard_link(tmp_path: Path):
+    forcing = GenericDistributedForcing(
+        directory=tmp_path,
+        start_time="2000-01-01T00:00:00Z",
+        end_time="2000-01-02T00:00:00Z",
+        filenames={"pr": "pr.nc"},
+    )
+    original = forcing.save()
+    linked = tmp_path / "linked.yaml"
+    linked.hardlink_to(original)
+
+    forcing.end_time = "2000-12-31T00:00:00Z"
+    forcing.save()
+
+    assert "2000-01-02" in linked.read_text()
+
+
+def test_extend_within_end_year(tmp_path: Path):
+    forcing = GenericDistributedForcing(
+        directory=tmp_path,
+        start_time="2000-01-01T00:00:00Z",
+        end_time="2000-01-02T00:00:00Z",
+        filenames={"pr": "pr.nc"},
+    )
+
+    with mock.patch.object(GenericDistributedForcing, "_run_recipe") as run_recipe:
+        forcing.extend("2000-12-31T00:00:00Z", dataset="ERA5")
+
+    run_recipe.assert_not_called()
+    assert GenericDistributedForcing.load(tmp_path).end_time == "2000-12-31T00:00:00Z"
+
+
+def test_extend_to_earlier_end_time(tmp_path: Path):
+    forcing = GenericDistributedForcing(
+        directory=tmp_path,
+        start_time="2000-01-01T00:00:00Z",
+        end_time="2000-01-02T00:00:00Z",
+        filenames={"pr": "pr.nc"},
+    )
+
+    with pytest.raises(ValueError, match="is not after end time"):
+        forcing.extend("2000-01-01T00:00:00Z", dataset="ERA5")
+
+
 @pytest.fixture()
 def mock_retrieve():
     with mock.patch(
@@ -1,4 +1,7 @@
+import asyncio
+import threading
 from collections.abc import ItemsView
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Any
@@ -9,14 +12,22 @@ import pytest
 import xarray as xr
 from bmipy import Bmi
 from grpc4bmi.bmi_optionaldest import OptionalDestBmi
-from numpy.testing import assert_almost_equal
+from numpy.testing import assert_almost_equal, assert_array_equal
 from pydantic import ConfigDict
 from pytest import fixture
 from xarray.testing import assert_allclose
 
 from ewatercycle.base.forcing import DefaultForcing
-from ewatercycle.base.model import ContainerizedModel, LocalModel, eWaterCycleModel
+from ewatercycle.base.model import (
+    AsyncModel,
+    ContainerizedModel,
+    LocalModel,
+    eWaterCycleModel,
+    setup_many,
+)
 from ewatercycle.base.parameter_set import ParameterSet
+from ewatercycle.config import ContainerResources
+from ewatercycle.container import ProfilingBmi
 from ewatercycle.testing.fake_models import DummyModelWith2DRectilinearGrid
 
 
@@ -83,6 +94,66 @@ class TestWithSetup:
             mocked_model.bmi  # noqa: B018
         mocked_bmi.mock.finalize.assert_called_once_with()
 
+    def test_reset(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+        setup_on_mocked_model,
+        tmp_path: Path,
+    ):
+        mocked_model.initialize(setup_on_mocked_model[0])
+
+        config_file = mocked_model.reset(alpha=2)
+
+        assert config_file == str(tmp_path / "config.yaml")
+        assert (tmp_path / "config.yaml").read_text().strip() == "alpha: 2"
+        mocked_bmi.mock.finalize.assert_called_once_with()
+        assert mocked_bmi.mock.initialize.call_count == 2
+        mocked_bmi.mock.initialize.assert_called_with(config_file)
+        assert mocked_model.bmi.origin is mocked_bmi
+
+    def test_reset_before_initialize(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+        tmp_path: Path,
+    ):
+        config_file = str(tmp_path / "other.yaml")
+
+        assert mocked_model.reset(config_file) == config_file
+
+        mocked_bmi.mock.finalize.assert_not_called()
+        mocked_bmi.mock.initialize.assert_called_once_with(config_file)
+
+    def test_reset_with_config_file_and_arguments(self, mocked_model: eWaterCycleModel):
+        with pytest.raises(ValueError, match="not both"):
+            mocked_model.reset("config.yaml", alpha=2)
+
+    def test_reset_merges_setup_arguments(
+        self, mocked_model: eWaterCycleModel, tmp_path: Path
+    ):
+        config_file, _ = mocked_model.setup(cfg_dir=str(tmp_path), alpha=1, beta=1)
+        mocked_model.initialize(config_file)
+
+        mocked_model.reset(alpha=2)
+
+        content = (tmp_path / "config.yaml").read_text().strip()
+        assert content == "alpha: 2\nbeta: 1"
+
+    def test_reset_without_arguments_keeps_config_file(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+        tmp_path: Path,
+    ):
+        config_file, _ = mocked_model.setup(cfg_dir=str(tmp_path), alpha=1)
+        mocked_model.initialize(config_file)
+
+        assert mocked_model.reset() == config_file
+
+        assert (tmp_path / "config.yaml").read_text().strip() == "alpha: 1"
+        mocked_bmi.mock.initialize.assert_called_with(config_file)
+
     def test_update(self, mocked_model: eWaterCycleModel):
         mocked_model.update()
         mocked_model.update()
@@ -137,6 +208,38 @@ class TestWithSetup:
         # 100th day of 1970
         assert result == datetime(1970, 4, 11)
 
+    def test_time_axis(self, mocked_model: eWaterCycleModel):
+        result = mocked_model.time_axis
+
+        assert result is mocked_model.time_axis
+        assert result.epoch == np.datetime64("1970-01-01")
+        assert result.step == pytest.approx(1.0)
+        assert len(result.index) == 101
+        assert result.index[-1] == np.datetime64("1970-04-11")
+        assert_array_equal(
+            result.to_datetime64([0.5, 2.0]),
+            np.array(["1970-01-01T12:00", "1970-01-03"], dtype="datetime64[us]"),
+        )
+
+    def test_time_as_datetime_without_time_step(self, mocked_model: eWaterCycleModel):
+        with patch.object(
+            DummyModelWith2DRectilinearGrid,
+            "get_time_step",
+            side_effect=NotImplementedError,
+        ):
+            result = mocked_model.time_as_datetime
+
+        assert result == datetime(1970, 1, 1)
+
+    def test_time_axis_unsupported_units(self, mocked_model: eWaterCycleModel):
+        with (
+            patch.object(
+                DummyModelWith2DRectilinearGrid, "get_time_units", return_value="d"
+            ),
+            pytest.raises(ValueError, match="Time units 'd' are not supported"),
+        ):
+            mocked_model.time_axis  # noqa: B018
+
     def test_time_as_isostr(self, mocked_model: eWaterCycleModel):
         result = mocked_model.time_as_isostr
 
@@ -179,6 +282,44 @@ class TestWithSetup:
         )
         assert_almost_equal(result, expected)
 
+    def test_get_value_with_out(self, mocked_model: eWaterCycleModel):
+        out = np.zeros((3, 4), dtype=np.float32)
+
+        result = mocked_model.get_value("plate_surface__temperature", out=out)
+
+        assert result is out
+        assert out[1, 2] == pytest.approx(7.7)
+
+    def test_get_value_with_non_contiguous_out(self, mocked_model: eWaterCycleModel):
+        out = np.zeros((4, 3), dtype=np.float32).T
+
+        with pytest.raises(ValueError, match="must be C-contiguous"):
+            mocked_model.get_value("plate_surface__temperature", out=out)
+
+    def test_get_value_reuses_buffers(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+    ):
+        mocked_model.reuse_value_buffers()
+
+        first = mocked_model.get_value("plate_surface__temperature")
+        mocked_bmi.value[0] = 42.0
+        second = mocked_model.get_value("plate_surface__temperature")
+
+        assert first is second
+        assert second[0] == pytest.approx(42.0)
+        assert second.dtype == np.float32
+
+    def test_get_value_without_reusing_buffers(self, mocked_model: eWaterCycleModel):
+        mocked_model.reuse_value_buffers()
+        mocked_model.reuse_value_buffers(False)
+
+        first = mocked_model.get_value("plate_surface__temperature")
+        second = mocked_model.get_value("plate_surface__temperature")
+
+        assert first is not second
+
     def test_get_value_at_coords(self, mocked_model: eWaterCycleModel):
         result = mocked_model.get_value_at_coords(
             "plate_surface__temperature",
@@ -198,6 +339,47 @@ class TestWithSetup:
         )
         assert_almost_equal(result, expected)
 
+    def test_get_value_at_coords_memoizes_indices(self, mocked_model: eWaterCycleModel):
+        name = "plate_surface__temperature"
+        mocked_model.get_value_at_coords(name, lat=[1.2], lon=[0.3])
+
+        with patch.object(MockModel, "get_latlon_grid") as mocked_grid:
+            result = mocked_model.get_value_at_coords(name, lat=[1.2], lon=[0.3])
+
+        mocked_grid.assert_not_called()
+        assert_almost_equal(result, np.array([7.7], dtype=np.float32))
+
+    def test_get_value_at_coords_ignores_extra_coordinates(
+        self, mocked_model: eWaterCycleModel
+    ):
+        result = mocked_model.get_value_at_coords(
+            "plate_surface__temperature", lat=[1.2, 1.3], lon=[0.3]
+        )
+
+        assert_almost_equal(result, np.array([7.7], dtype=np.float32))
+
+    def test_coords_to_indices_is_bounded_and_read_only(
+        self, mocked_model: eWaterCycleModel
+    ):
+        name = "plate_surface__temperature"
+        with patch("ewatercycle.base.model._INDICES_CACHE_SIZE", 1):
+            indices = mocked_model._coords_to_indices(name, lat=[1.2], lon=[0.3])
+            mocked_model._coords_to_indices(name, lat=[1.2], lon=[0.2])
+
+            with patch.object(
+                MockModel, "get_latlon_grid", wraps=mocked_model.get_latlon_grid
+            ) as mocked_grid:
+                mocked_model._coords_to_indices(name, lat=[1.2], lon=[0.3])
+
+        mocked_grid.assert_called_once()
+        assert not indices.flags.writeable
+
+    def test_get_value_at_coords_outside_grid(self, mocked_model: eWaterCycleModel):
+        with pytest.raises(ValueError, match="outside model grid"):
+            mocked_model.get_value_at_coords(
+                "plate_surface__temperature", lat=[10.0], lon=[0.3]
+            )
+
     def test_set_value(
         self,
         mocked_model: eWaterCycleModel,
@@ -209,6 +391,73 @@ class TestWithSetup:
 
         assert_almost_equal(mocked_bmi.value, new_values)
 
+    def test_bmi_stats(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+        tmp_path: Path,
+    ):
+        mocked_model.profile_bmi()
+        mocked_model.profile_bmi()
+        mocked_model.update()
+        mocked_model.get_value("plate_surface__temperature")
+        csv_file = tmp_path / "stats.csv"
+
+        stats = mocked_model.bmi_stats(csv_file)
+
+        assert isinstance(mocked_model.bmi.origin, ProfilingBmi)
+        assert mocked_model.bmi.origin.origin is mocked_bmi
+        assert stats["update"]["count"] == 1
+        assert stats["get_value"]["nbytes"] == 48
+        assert csv_file.read_text().startswith("method,count,")
+
+    def test_bmi_stats_without_profiling(self, mocked_model: eWaterCycleModel):
+        with pytest.raises(ValueError, match="not profiled"):
+            mocked_model.bmi_stats()
+
+    def test_get_values(self, mocked_model: eWaterCycleModel):
+        result = mocked_model.get_values(["plate_surface__temperature"])
+
+        assert list(result) == ["plate_surface__temperature"]
+        assert_almost_equal(
+            result["plate_surface__temperature"],
+            mocked_model.get_value("plate_surface__temperature"),
+        )
+
+    def test_set_values(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+    ):
+        new_values = np.full((12,), 4.2, dtype=np.float32)
+
+        mocked_model.set_values({"plate_surface__temperature": new_values})
+
+        assert_almost_equal(mocked_bmi.value, new_values)
+
+    def test_save_and_load_state(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+        tmp_path: Path,
+    ):
+        expected = mocked_bmi.value.copy()
+        state_file = tmp_path / "state.nc"
+
+        result = mocked_model.save_state(state_file)
+        mocked_bmi.value[:] = 0
+        mocked_model.load_state(state_file)
+
+        assert result == state_file
+        assert_almost_equal(mocked_bmi.value, expected)
+        assert mocked_bmi.value.dtype == expected.dtype
+
+    def test_load_state_missing_file(
+        self, mocked_model: eWaterCycleModel, tmp_path: Path
+    ):
+        with pytest.raises(FileNotFoundError):
+            mocked_model.load_state(tmp_path / "missing.nc")
+
     def test_set_value_at_coords(
         self,
         mocked_model: eWaterCycleModel,
@@ -271,6 +520,179 @@ class TestWithSetup:
             longitude=0.2, latitude=1.2, time=datetime(1970, 1, 1)
         ).to_numpy().tolist() == pytest.approx(6.6)
 
+    def test_get_latlon_grid(self, mocked_model: eWaterCycleModel):
+        lat, lon, shape = mocked_model.get_latlon_grid("plate_surface__temperature")
+
+        assert_almost_equal(lat, [1.1, 1.2, 1.3])
+        assert_almost_equal(lon, [0.1, 0.2, 0.3, 0.4])
+        assert list(shape) == [3, 4]
+
+    def test_get_latlon_grid_without_grid_type_and_size(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+    ):
+        with (
+            patch.object(mocked_bmi, "get_grid_type", side_effect=NotImplementedError),
+            patch.object(mocked_bmi, "get_grid_size", side_effect=NotImplementedError),
+        ):
+            lat, _, _ = mocked_model.get_latlon_grid("plate_surface__temperature")
+
+        assert_almost_equal(lat, [1.1, 1.2, 1.3])
+
+    def test_get_latlon_grid_is_cached(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+    ):
+        name = "plate_surface__temperature"
+        mocked_model.get_latlon_grid(name)
+
+        with patch.object(mocked_bmi, "get_grid_x") as mocked_grid_x:
+            _lat, lon, _shape = mocked_model.get_latlon_grid(name)
+
+        mocked_grid_x.assert_not_called()
+        assert_almost_equal(lon, [0.1, 0.2, 0.3, 0.4])
+        assert not lon.flags.writeable
+
+    def test_get_latlon_grid_cache_cleared_on_initialize(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+        setup_on_mocked_model,
+    ):
+        name = "plate_surface__temperature"
+        mocked_model.get_latlon_grid(name)
+
+        mocked_model.initialize(setup_on_mocked_model[0])
+        with patch.object(
+            mocked_bmi, "get_grid_x", wraps=mocked_bmi.get_grid_x
+        ) as mocked_grid_x:
+            mocked_model.get_latlon_grid(name)
+
+        mocked_grid_x.assert_called_once()
+
+    def test_run_until(self, mocked_model: eWaterCycleModel):
+        result = mocked_model.run_until(
+            end_time=3.0, outputs=["plate_surface__temperature"]
+        )
+
+        assert mocked_model.time == pytest.approx(3.0)
+        da = result["plate_surface__temperature"]
+        assert da.dims == ("time", "latitude", "longitude")
+        assert da.attrs == {"units": "K"}
+        assert list(da.time.values) == [
+            np.datetime64("1970-01-02"),
+            np.datetime64("1970-01-03"),
+            np.datetime64("1970-01-04"),
+        ]
+        assert da.sel(
+            longitude=0.2, latitude=1.2, time=datetime(1970, 1, 3)
+        ).to_numpy().tolist() == pytest.approx(6.6)
+
+    def test_run_until_every(self, mocked_model: eWaterCycleModel):
+        result = mocked_model.run_until(
+            end_time="1970-01-08T00:00:00Z",
+            outputs=["plate_surface__temperature"],
+            every=3,
+        )
+
+        assert mocked_model.time == pytest.approx(7.0)
+        assert list(result.time.values) == [
+            np.datetime64("1970-01-04"),
+            np.datetime64("1970-01-07"),
+        ]
+
+    def test_run_until_without_outputs(self, mocked_model: eWaterCycleModel):
+        result = mocked_model.run_until(end_time=2.0)
+
+        assert mocked_model.time == pytest.approx(2.0)
+        assert len(result.data_vars) == 0
+
+    def test_run_until_when_client_does_not_support_update_until(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+    ):
+        # Like the error a grpc4bmi client raises for a not implemented method
+        error = RuntimeError("Exception calling application: NotImplementedError")
+        with patch.object(
+            mocked_bmi, "update_until", side_effect=error
+        ) as mocked_update_until:
+            result = mocked_model.run_until(
+                end_time=7.0, outputs=["plate_surface__temperature"], every=3
+            )
+
+        assert mocked_model.time == pytest.approx(7.0)
+        assert len(result.time) == 2
+        mocked_update_until.assert_called_once()
+
+    def test_run_until_raises_error_of_update_until_after_advancing(
+        self,
+        mocked_model: eWaterCycleModel,
+        mocked_bmi: DummyModelWith2DRectilinearGrid,
+    ):
+        def fail_halfway(time: float) -> None:
+            mocked_bmi.update()
+            msg = "Model crashed"
+            raise RuntimeError(msg)
+
+        with (
+            patch.object(mocked_bmi, "update_until", side_effect=fail_halfway),
+            pytest.raises(RuntimeError, match="Model crashed"),
+        ):
+            mocked_model.run_until(end_time=7.0, every=3)
+
+    def test_run_until_invalid_every(self, mocked_model: eWaterCycleModel):
+        with pytest.raises(ValueError, match="every must be a positive integer"):
+            mocked_model.run_until(outputs=["plate_surface__temperature"], every=0)
+
+
+class TestAsyncModel:
+    def test_step(self, mocked_model: eWaterCycleModel, tmp_path: Path):
+        cfg_file, _ = mocked_model.setup(cfg_dir=str(tmp_path))
+        amodel = AsyncModel(mocked_model)
+
+        async def run():
+            await amodel.initialize(cfg_file)
+            await amodel.update()
+            await amodel.set_value(
+                "plate_surface__temperature", np.full((12,), 4.2, dtype=np.float32)
+            )
+            value = await amodel.get_value("plate_surface__temperature")
+            await amodel.finalize()
+            return value
+
+        value = asyncio.run(run())
+
+        assert_almost_equal(value, np.full((12,), 4.2, dtype=np.float32))
+        assert not hasattr(mocked_model, "_bmi")
+
+    def test_updates_run_concurrently(self, mocked_config, tmp_path: Path):
+        nr_models = 4
+        # Each update waits until all models are updating at the same time
+        barrier = threading.Barrier(nr_models, timeout=5)
+
+        class WaitingBmi(DummyModelWith2DRectilinearGrid):
+            def update(self):
+                barrier.wait()
+                super().update()
+
+        models = []
+        for i in range(nr_models):
+            model = MockModel(mybmi=WaitingBmi())
+            model.setup(cfg_dir=str(tmp_path / str(i)))
+            models.append(model)
+
+        async def run():
+            with ThreadPoolExecutor(max_workers=nr_models) as executor:
+                amodels = [AsyncModel(model, executor) for model in models]
+                await asyncio.gather(*[amodel.update() for amodel in amodels])
+
+        asyncio.run(run())
+
+        assert [model.time for model in models] == [1.0] * nr_models
+
 
 class DummyLocalModel(LocalModel):
     bmi_class: type[Bmi] = DummyModelWith2DRectilinearGrid
@@ -281,6 +703,35 @@ class DummyLocalModel(LocalModel):
 __version__ = "1.2.3"
 
 
+class BrokenLocalModel(DummyLocalModel):
+    def _make_bmi_instance(self):
+        msg = "Unable to start model"
+        raise RuntimeError(msg)
+
+
+def test_setup_many(mocked_config, tmp_path: Path):
+    models = [DummyLocalModel(), BrokenLocalModel(), DummyLocalModel()]
+
+    results = setup_many(models, cfg_dir=tmp_path, max_workers=2)
+
+    assert results[0] == (
+        str(tmp_path / "model_0" / "config.yaml"),
+        str(tmp_path / "model_0"),
+    )
+    assert isinstance(results[1], RuntimeError)
+    assert results[2][1] == str(tmp_path / "model_2")
+    assert isinstance(models[2].bmi.origin, DummyModelWith2DRectilinearGrid)
+
+
+def test_setup_many_in_output_dir(mocked_config, tmp_path: Path):
+    results = setup_many([DummyLocalModel(), DummyLocalModel()])
+
+    cfg_dirs = [Path(cfg_dir) for _, cfg_dir in results]
+    assert [cfg_dir.name for cfg_dir in cfg_dirs] == ["model_0", "model_1"]
+    assert cfg_dirs[0].parent.name.startswith("dummylocalmodel_many_")
+    assert cfg_dirs[0].parent.parent == tmp_path
+
+
 class TestLocalModel:
     @fixture()
     def model(self):
@@ -315,9 +766,21 @@ class TestContainerizedModel:
             protocol="grpc",
             work_dir=tmp_path,
             input_dirs=[],
-            timeout=300,
+            resources=None,
+        )
+
+    @patch("ewatercycle.base.model.start_container")
+    def test_setup_with_resources(self, mocked_start_container, tmp_path: Path):
+        model = ContainerizedModel(
+            bmi_image="ewatercycle/ewatercycle_dummy:latest",
+            resources={"cpuset": "auto", "memory": "1GB"},
         )
 
+        model.setup(cfg_dir=str(tmp_path))
+
+        resources = mocked_start_container.call_args.kwargs["resources"]
+        assert resources == ContainerResources(cpuset="auto", memory=10**9)
+
     @patch("ewatercycle.base.model.start_container")
     def test_remotebmi_setup(self, mocked_start_container, tmp_path: Path):
         model = ContainerizedModel(
@@ -332,7 +795,7 @@ class TestContainerizedModel:
             protocol="openapi",
             work_dir=tmp_path,
             input_dirs=[],
-            timeout=300,
+            resources=None,
         )
 
     @patch("ewatercycle.base.model.start_container")
@@ -369,7 +832,7 @@ class TestContainerizedModel:
                 str(parameter_set_dir),
                 str(forcing_dir),
             ],
-            timeout=300,
+            resources=None,
         )
 
 
@@ -0,0 +1,100 @@
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+from numpy.testing import assert_almost_equal
+
+from ewatercycle.base.model import LocalModel
+from ewatercycle.base.recorder import OutputRecorder
+from ewatercycle.testing.fake_models import DummyModelWith2DRectilinearGrid
+
+NAME = "plate_surface__temperature"
+
+
+class DummyLocalModel(LocalModel):
+    bmi_class: type = DummyModelWith2DRectilinearGrid
+
+
+@pytest.fixture()
+def model(tmp_path: Path):
+    model = DummyLocalModel()
+    cfg_file, _ = model.setup(cfg_dir=str(tmp_path))
+    model.initialize(cfg_file)
+    return model
+
+
+@pytest.mark.parametrize("store_name", ["output.nc", "output.zarr"])
+def test_record(model: DummyLocalModel, tmp_path: Path, store_name: str):
+    if store_name.endswith(".zarr"):
+        pytest.importorskip("zarr")
+    store = tmp_path / store_name
+    model.record([NAME], store, chunks=2)
+
+    for _ in range(5):
+        model.update()
+    model.finalize()
+
+    engine = "zarr" if store_name.endswith(".zarr") else None
+    ds = xr.open_dataset(store, engine=engine)
+    da = ds[NAME]
+    assert da.dims == ("time", "latitude", "longitude")
+    assert da.attrs["units"] == "K"
+    assert len(da.time) == 5
+    assert da.time[0].values == np.datetime64(datetime(1970, 1, 2))
+    assert da.time[-1].values == np.datetime64(datetime(1970, 1, 6))
+    assert_almost_equal(da.latitude, [1.1, 1.2, 1.3])
+    assert_almost_equal(da.longitude, [0.1, 0.2, 0.3, 0.4])
+    assert da.sel(longitude=0.2, latitude=1.2).to_numpy() == pytest.approx([6.6] * 5)
+
+
+def test_record_masks_missing_value(model: DummyLocalModel, tmp_path: Path):
+    store = tmp_path / "output.nc"
+    model.bmi.origin.value[0] = -999
+    model.record([NAME], store)
+
+    model.update()
+    model.stop_recording()
+
+    ds = xr.open_dataset(store)
+    assert np.isnan(ds[NAME].isel(time=0, latitude=0, longitude=0))
+
+
+def test_stop_recording(model: DummyLocalModel, tmp_path: Path):
+    store = tmp_path / "output.nc"
+    recorder = model.record([NAME], store)
+    model.update()
+
+    model.stop_recording()
+    model.update()
+
+    assert recorder.closed
+    ds = xr.open_dataset(store)
+    assert len(ds.time) == 1
+
+
+def test_record_reuses_two_buffers(model: DummyLocalModel, tmp_path: Path):
+    recorder = model.record([NAME], tmp_path / "output.nc", chunks=1)
+    buffers = set()
+
+    for _ in range(6):
+        buffers.add(id(recorder._buffers[NAME]))
+        model.update()
+    model.stop_recording()
+
+    assert len(buffers) == 2
+    assert len(xr.open_dataset(tmp_path / "output.nc").time) == 6
+
+
+def test_append_after_close(model: DummyLocalModel, tmp_path: Path):
+    recorder = OutputRecorder(model, [NAME], tmp_path / "output.nc")
+    recorder.close()
+
+    with pytest.raises(ValueError, match="is closed"):
+        recorder.append()
+
+
+def test_without_variables(model: DummyLocalModel, tmp_path: Path):
+    with pytest.raises(ValueError, match="No variables given"):
+        OutputRecorder(model, [], tmp_path / "output.nc")
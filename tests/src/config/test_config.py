@@ -116,8 +116,13 @@ def test_save_to_file_given_path(tmp_path: Path):
     expected = dedent(
         """\
         apptainer_dir: .
+        bmi_cache_size: 268435456
         container_engine: docker
+        container_pool_max_idle: 600.0
+        container_pool_size: 0
+        container_resources: {}
         grdc_location: .
+        local_models: {}
         output_dir: .
         parameter_sets: {}
         parameterset_dir: .
@@ -133,8 +138,13 @@ def test_dump_to_yaml():
     expected = dedent(
         """\
         apptainer_dir: .
+        bmi_cache_size: 268435456
         container_engine: docker
+        container_pool_max_idle: 600.0
+        container_pool_size: 0
+        container_resources: {}
         grdc_location: .
+        local_models: {}
         output_dir: .
         parameter_sets: {}
         parameterset_dir: .
@@ -1,18 +1,44 @@
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from unittest import mock
 
+import grpc
 import numpy as np
 import pytest
-from grpc4bmi.bmi_memoized import MemoizedBmi
+from grpc4bmi.bmi_grpc_client import BmiClient
+from grpc4bmi.bmi_grpc_server import BmiServer
 from grpc4bmi.bmi_optionaldest import OptionalDestBmi
+from grpc4bmi.bmi_pb2_grpc import add_BmiServiceServicer_to_server
 from numpy.testing import assert_array_almost_equal
+from pydantic import ByteSize
 
-from ewatercycle.config import CFG
+from ewatercycle.config import CFG, ContainerResources
 from ewatercycle.container import (
+    ApptainerImageCache,
+    BmiClientLocal,
     BmiProxy,
+    CachingBmi,
     ContainerImage,
+    ContainerSpec,
+    ProfilingBmi,
+    SharedMemoryBmi,
+    SharedMemoryServerBmi,
+    _apptainer_command,
     _parse_docker_url,
+    batch_get_values,
+    batch_set_values,
+    container_pool,
+    expected_startup_time,
+    start_apptainer_container,
     start_container,
+    start_containers,
+    start_docker_container,
+    start_local_container,
+    startup_timings,
 )
 from ewatercycle.testing.fake_models import DummyModelWith2DRectilinearGrid
 
@@ -162,6 +188,52 @@ def test_bmi_proxy(orig_model, method_name, method_args, assert_func):
     assert_func(result)
 
 
+def test_profiling_bmi():
+    model = ProfilingBmi(DummyModelWith2DRectilinearGrid())
+
+    model.update()
+    model.update()
+    result = model.get_value("plate_surface__temperature", np.empty((12,)))
+    model.set_value("plate_surface__temperature", result)
+
+    stats = model.stats()
+    assert list(stats) == ["get_value", "set_value", "update"]
+    assert stats["update"]["count"] == 2
+    assert stats["get_value"]["nbytes"] == 96
+    assert stats["set_value"]["nbytes"] == 96
+    assert 0 <= stats["update"]["p50"] <= stats["update"]["max"]
+
+
+def test_profiling_bmi_records_failed_calls():
+    model = ProfilingBmi(DummyModelWith2DRectilinearGrid())
+
+    with pytest.raises(NotImplementedError):
+        model.get_value_ptr("plate_surface__temperature")
+
+    assert model.stats()["get_value_ptr"]["count"] == 1
+
+
+def test_profiling_bmi_to_csv(tmp_path: Path):
+    model = ProfilingBmi(DummyModelWith2DRectilinearGrid())
+    model.update()
+    csv_file = tmp_path / "stats.csv"
+
+    model.to_csv(csv_file)
+
+    lines = csv_file.read_text().splitlines()
+    assert lines[0] == "method,count,total,mean,p50,p90,p99,max,nbytes"
+    assert lines[1].startswith("update,1,")
+
+
+def test_profiling_bmi_reset():
+    model = ProfilingBmi(DummyModelWith2DRectilinearGrid())
+    model.update()
+
+    model.reset()
+
+    assert model.stats() == {}
+
+
 @pytest.fixture()
 def force_apptainer(tmp_path: Path):
     old_engine = CFG.container_engine
@@ -187,12 +259,12 @@ def test_start_container(
     container = start_container(work_dir=tmp_path, image=force_apptainer)
 
     assert isinstance(container, OptionalDestBmi)
-    assert isinstance(container.origin, MemoizedBmi)
+    assert isinstance(container.origin, CachingBmi)
     assert isinstance(container.origin.origin, DummyModelWith2DRectilinearGrid)
     mock_bmi_client_apptainer.assert_called_once_with(
         image=force_apptainer.apptainer_filename,
         work_dir=str(tmp_path),
-        timeout=None,
+        timeout=300,
         delay=0,
         input_dirs=[],
     )
@@ -217,3 +289,820 @@ def test_start_container_with_own_wrapper(
 
     assert isinstance(container, MyWrapper)
     assert isinstance(container.origin, DummyModelWith2DRectilinearGrid)
+
+
+@pytest.fixture()
+def pooled(tmp_path: Path, force_apptainer, mock_bmi_client_apptainer):
+    old_size = CFG.container_pool_size
+    old_output_dir = CFG.output_dir
+    CFG.container_pool_size = 1
+    CFG.output_dir = tmp_path
+    mock_bmi_client_apptainer.side_effect = lambda **kwargs: (
+        DummyModelWith2DRectilinearGrid()
+    )
+    yield force_apptainer
+    container_pool.clear()
+    CFG.container_pool_size = old_size
+    CFG.output_dir = old_output_dir
+
+
+def test_container_pool_warm(
+    tmp_path: Path, pooled: ContainerImage, mock_bmi_client_apptainer: mock.MagicMock
+):
+    container_pool.warm(pooled)
+    container_pool.warm(pooled)
+
+    assert len(container_pool) == 1
+    mock_bmi_client_apptainer.assert_called_once()
+    work_dir = Path(mock_bmi_client_apptainer.call_args.kwargs["work_dir"])
+    assert work_dir.parent == tmp_path / ".ewatercycle-pool"
+
+
+def test_start_container_from_pool(
+    tmp_path: Path, pooled: ContainerImage, mock_bmi_client_apptainer: mock.MagicMock
+):
+    container_pool.warm(pooled)
+    container_dir = Path(mock_bmi_client_apptainer.call_args.kwargs["work_dir"])
+    work_dir = tmp_path / "model"
+    work_dir.mkdir()
+    (work_dir / "config.yaml").write_text("a: 1")
+
+    container = start_container(work_dir=work_dir, image=pooled, wrappers=[])
+    container_pool.warm(pooled)
+
+    assert isinstance(container, DummyModelWith2DRectilinearGrid)
+    assert work_dir.resolve() == container_dir
+    assert (container_dir / "config.yaml").read_text() == "a: 1"
+    # Replacement is started in the background
+    assert mock_bmi_client_apptainer.call_count == 2
+    assert len(container_pool) == 1
+
+
+def test_start_container_outside_output_dir_skips_pool(
+    tmp_path_factory: pytest.TempPathFactory,
+    pooled: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+):
+    work_dir = tmp_path_factory.mktemp("elsewhere")
+
+    start_container(work_dir=work_dir, image=pooled, wrappers=[])
+
+    mock_bmi_client_apptainer.assert_called_once()
+    assert len(container_pool) == 0
+
+
+def test_container_pool_prune(pooled: ContainerImage):
+    container_pool.warm(pooled)
+    CFG.container_pool_max_idle = 0
+
+    try:
+        stopped = container_pool.prune()
+    finally:
+        CFG.container_pool_max_idle = 600
+
+    assert stopped == 1
+    assert len(container_pool) == 0
+
+
+def test_container_pool_clear_stops_containers(
+    pooled: ContainerImage, mock_bmi_client_apptainer: mock.MagicMock
+):
+    client = mock.Mock(spec=["container"])
+    mock_bmi_client_apptainer.side_effect = None
+    mock_bmi_client_apptainer.return_value = client
+    container_pool.warm(pooled)
+    container = client.container
+    work_dir = Path(mock_bmi_client_apptainer.call_args.kwargs["work_dir"])
+
+    container_pool.clear()
+
+    container.stop.assert_called_once_with()
+    assert not hasattr(client, "container")
+    assert not work_dir.exists()
+
+
+@pytest.fixture()
+def mock_apptainer_build():
+    def build(args, **kwargs):
+        Path(args[3]).write_bytes(b"image")
+        return subprocess.CompletedProcess(args, 0)
+
+    with mock.patch(
+        "ewatercycle.container.subprocess.run", side_effect=build
+    ) as mock_run:
+        yield mock_run
+
+
+def test_apptainer_image_cache_builds_missing_image(
+    tmp_path: Path, mock_apptainer_build: mock.MagicMock
+):
+    cache = ApptainerImageCache(tmp_path)
+    image = ContainerImage("ewatercycle/dummy:1.0")
+
+    path = cache.get(image)
+    cache.get(image)
+
+    assert path == tmp_path / "ewatercycle-dummy_1.0.sif"
+    assert path.read_bytes() == b"image"
+    mock_apptainer_build.assert_called_once()
+    assert (
+        mock_apptainer_build.call_args.args[0][-1] == "docker://ewatercycle/dummy:1.0"
+    )
+    entry = cache.images()[path.name]
+    assert entry.size == 5
+    assert entry.digest is not None
+    assert entry.built
+
+
+def test_apptainer_image_cache_indexes_existing_images(tmp_path: Path):
+    (tmp_path / "existing.sif").write_bytes(b"12345")
+    cache = ApptainerImageCache(tmp_path)
+
+    images = cache.images()
+
+    assert list(images) == ["existing.sif"]
+    assert images["existing.sif"].size == 5
+    assert images["existing.sif"].digest is None
+    assert not images["existing.sif"].built
+    assert (tmp_path / ApptainerImageCache.index_filename).exists()
+
+
+def test_apptainer_image_cache_evicts_least_recently_used(
+    tmp_path: Path, mock_apptainer_build: mock.MagicMock
+):
+    cache = ApptainerImageCache(tmp_path, max_size=10)
+    for name in ("a", "b", "c"):
+        cache.get(ContainerImage(f"ewatercycle/{name}:1.0"))
+
+    assert sorted(cache.images()) == ["ewatercycle-b_1.0.sif", "ewatercycle-c_1.0.sif"]
+    assert not (tmp_path / "ewatercycle-a_1.0.sif").exists()
+
+
+def test_apptainer_image_cache_keeps_images_placed_by_hand(
+    tmp_path: Path, mock_apptainer_build: mock.MagicMock
+):
+    (tmp_path / "by-hand.sif").write_bytes(b"1234567890")
+    cache = ApptainerImageCache(tmp_path, max_size=5)
+    cache.get(ContainerImage("by-hand.sif"))
+
+    cache.get(ContainerImage("ewatercycle/a:1.0"))
+    cache.get(ContainerImage("ewatercycle/b:1.0"))
+
+    assert sorted(cache.images()) == ["by-hand.sif", "ewatercycle-b_1.0.sif"]
+
+
+def test_apptainer_image_cache_build_failure(tmp_path: Path):
+    error = subprocess.CalledProcessError(1, "apptainer", stderr="no such image")
+    with (
+        mock.patch("ewatercycle.container.subprocess.run", side_effect=error),
+        pytest.raises(RuntimeError, match="no such image"),
+    ):
+        ApptainerImageCache(tmp_path).get(ContainerImage("ewatercycle/dummy:1.0"))
+
+    assert list(tmp_path.glob("*.sif")) == []
+
+
+def test_start_container_builds_apptainer_image(
+    tmp_path: Path,
+    force_apptainer: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+    mock_apptainer_build: mock.MagicMock,
+):
+    CFG.apptainer_cache_size = ByteSize(2**30)
+    try:
+        start_container(work_dir=tmp_path, image=force_apptainer)
+    finally:
+        CFG.apptainer_cache_size = None
+
+    expected = str(CFG.apptainer_dir / force_apptainer.apptainer_filename)
+    assert mock_bmi_client_apptainer.call_args.kwargs["image"] == expected
+    mock_apptainer_build.assert_called_once()
+
+
+def test_start_container_does_not_build_apptainer_image_by_default(
+    tmp_path: Path,
+    force_apptainer: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+    mock_apptainer_build: mock.MagicMock,
+):
+    start_container(work_dir=tmp_path, image=force_apptainer)
+
+    mock_apptainer_build.assert_not_called()
+    assert (
+        mock_bmi_client_apptainer.call_args.kwargs["image"]
+        == force_apptainer.apptainer_filename
+    )
+
+
+def test_start_container_timeout_excludes_image_build(
+    tmp_path: Path,
+    force_apptainer: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+):
+    def slow_build(image):
+        time.sleep(0.2)
+        return image.apptainer_filename
+
+    with mock.patch(
+        "ewatercycle.container._resolve_apptainer_image", side_effect=slow_build
+    ) as mock_resolve:
+        start_container(work_dir=tmp_path, image=force_apptainer, timeout=0.1)
+
+    mock_resolve.assert_called_once()
+
+
+class SlowStartingModel(BmiProxy):
+    def __init__(self, nr_unreachable: int):
+        super().__init__(DummyModelWith2DRectilinearGrid())
+        self.nr_probes = 0
+        self.nr_unreachable = nr_unreachable
+
+    def get_component_name(self) -> str:
+        self.nr_probes += 1
+        if self.nr_probes <= self.nr_unreachable:
+            raise ConnectionRefusedError
+        return "slow"
+
+
+@pytest.fixture()
+def clean_startup_history():
+    with mock.patch.dict("ewatercycle.container._startup_history", clear=True):
+        yield
+
+
+def test_start_container_records_startup_timings(
+    tmp_path: Path,
+    force_apptainer: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+    clean_startup_history,
+):
+    assert expected_startup_time(force_apptainer) is None
+
+    start_container(work_dir=tmp_path, image=force_apptainer)
+
+    timings = startup_timings(force_apptainer)
+    assert len(timings) == 1
+    assert timings[0].image == force_apptainer
+    assert timings[0].total == pytest.approx(
+        timings[0].resolve + timings[0].start + timings[0].ready
+    )
+    assert expected_startup_time(force_apptainer) == pytest.approx(
+        timings[0].start + timings[0].ready
+    )
+    assert startup_timings() == timings
+
+
+def test_start_container_probes_until_model_answers(
+    tmp_path: Path,
+    force_apptainer: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+    clean_startup_history,
+):
+    model = SlowStartingModel(nr_unreachable=2)
+    mock_bmi_client_apptainer.return_value = model
+
+    start_container(work_dir=tmp_path, image=force_apptainer, wrappers=[])
+
+    assert model.nr_probes == 3
+    assert startup_timings(force_apptainer)[0].ready > 0
+
+
+def test_start_container_model_never_answers(
+    tmp_path: Path,
+    force_apptainer: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+    clean_startup_history,
+):
+    mock_bmi_client_apptainer.return_value = SlowStartingModel(nr_unreachable=1000)
+
+    with pytest.raises(TimeoutError, match="did not answer"):
+        start_container(work_dir=tmp_path, image=force_apptainer, timeout=0.2)
+
+    assert startup_timings(force_apptainer) == []
+
+
+def serve_grpc(model) -> tuple[grpc.Server, BmiClient]:
+    """Stand-in for a model container with a grpc4bmi server."""
+    server = grpc.server(ThreadPoolExecutor(max_workers=1))
+    add_BmiServiceServicer_to_server(BmiServer(model), server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    client = BmiClient(grpc.insecure_channel(f"localhost:{port}"), timeout=10)
+    return server, client
+
+
+@pytest.fixture()
+def shared_memory_server(tmp_path: Path):
+    model = DummyModelWith2DRectilinearGrid()
+    server, client = serve_grpc(SharedMemoryServerBmi(model, root=tmp_path))
+    yield model, client
+    server.stop(None)
+
+
+def test_shared_memory_get_value(tmp_path: Path, shared_memory_server):
+    model, client = shared_memory_server
+    bmi = SharedMemoryBmi.in_work_dir(client, tmp_path)
+
+    result = bmi.get_value("plate_surface__temperature", np.empty(12, np.float32))
+
+    assert_array_almost_equal(result, model.value)
+    segment_file = bmi.segment.directory / "plate_surface__temperature"
+    assert segment_file.stat().st_size == model.value.nbytes
+
+
+def test_shared_memory_set_value(tmp_path: Path, shared_memory_server):
+    model, client = shared_memory_server
+    bmi = SharedMemoryBmi.in_work_dir(client, tmp_path)
+    new_value = np.arange(12, dtype=np.float32)
+
+    bmi.set_value("plate_surface__temperature", new_value)
+
+    assert_array_almost_equal(model.value, new_value)
+
+
+def test_shared_memory_other_calls_pass_through(tmp_path: Path, shared_memory_server):
+    _, client = shared_memory_server
+    bmi = SharedMemoryBmi.in_work_dir(client, tmp_path)
+
+    assert bmi.get_var_type("plate_surface__temperature") == "float32"
+    assert bmi.get_var_nbytes("plate_surface__temperature") == 48
+
+
+def test_shared_memory_finalize_keeps_segment(tmp_path: Path, shared_memory_server):
+    model, client = shared_memory_server
+    bmi = SharedMemoryBmi.in_work_dir(client, tmp_path)
+    bmi.get_value("plate_surface__temperature", np.empty(12, np.float32))
+    new_value = np.arange(12, dtype=np.float32)
+
+    bmi.finalize()
+    bmi.initialize("")
+    bmi.set_value("plate_surface__temperature", new_value)
+
+    assert_array_almost_equal(model.value, new_value)
+
+
+def test_shared_memory_close_removes_segment(tmp_path: Path, shared_memory_server):
+    _, client = shared_memory_server
+    bmi = SharedMemoryBmi.in_work_dir(client, tmp_path)
+    bmi.get_value("plate_surface__temperature", np.empty(12, np.float32))
+
+    bmi.close()
+
+    assert not bmi.segment.directory.exists()
+
+
+def test_start_container_with_shared_memory(
+    tmp_path: Path,
+    force_apptainer: ContainerImage,
+    mock_bmi_client_apptainer: mock.MagicMock,
+):
+    container = start_container(
+        work_dir=tmp_path, image=force_apptainer, wrappers=[], shared_memory=True
+    )
+
+    assert isinstance(container, SharedMemoryBmi)
+    assert container.segment.directory.parent == tmp_path
+
+
+def test_batch_get_values():
+    model = DummyModelWith2DRectilinearGrid()
+    bmi = OptionalDestBmi(model)
+
+    result = batch_get_values(bmi, ["plate_surface__temperature"])
+
+    assert list(result) == ["plate_surface__temperature"]
+    assert_array_almost_equal(result["plate_surface__temperature"], model.value)
+    assert result["plate_surface__temperature"].dtype == np.float32
+
+
+def test_batch_get_values_goes_through_cache():
+    model = mock.Mock(wraps=DummyModelWith2DRectilinearGrid())
+    bmi = OptionalDestBmi(CachingBmi(model, max_bytes=1024, cache_values=True))
+    bmi.get_value("plate_surface__temperature")
+    bmi.get_value("plate_surface__temperature")
+
+    batch_get_values(bmi, ["plate_surface__temperature"])
+
+    assert model.get_value.call_count == 2
+
+
+def test_batch_set_values():
+    model = DummyModelWith2DRectilinearGrid()
+    bmi = OptionalDestBmi(CachingBmi(model, max_bytes=1024, cache_values=True))
+    bmi.get_value("plate_surface__temperature")
+    bmi.get_value("plate_surface__temperature")
+    new_value = np.arange(12, dtype=np.float32)
+
+    batch_set_values(bmi, {"plate_surface__temperature": new_value})
+
+    assert_array_almost_equal(model.value, new_value)
+    assert_array_almost_equal(bmi.get_value("plate_surface__temperature"), new_value)
+
+
+def test_batch_get_values_through_shared_memory_in_one_call(
+    tmp_path: Path, shared_memory_server
+):
+    model, client = shared_memory_server
+    counted_client = mock.Mock(wraps=client)
+    bmi = OptionalDestBmi(
+        CachingBmi(SharedMemoryBmi.in_work_dir(counted_client, tmp_path))
+    )
+
+    result = batch_get_values(bmi, ["a", "b", "c"])
+
+    assert counted_client.get_value.call_count == 1
+    assert list(result) == ["a", "b", "c"]
+    for value in result.values():
+        assert_array_almost_equal(value, model.value)
+
+
+def test_batch_get_values_through_shared_memory_skips_cached(
+    tmp_path: Path, shared_memory_server
+):
+    _, client = shared_memory_server
+    counted_client = mock.Mock(wraps=client)
+    bmi = OptionalDestBmi(
+        CachingBmi(
+            SharedMemoryBmi.in_work_dir(counted_client, tmp_path), cache_values=True
+        )
+    )
+    bmi.get_value("a")
+    bmi.get_value("a")
+
+    batch_get_values(bmi, ["a", "b"])
+
+    assert counted_client.get_value.call_count == 3
+    control_name = counted_client.get_value.call_args.args[0]
+    assert control_name.endswith(":b")
+
+
+def test_batch_set_values_through_shared_memory_in_one_call(
+    tmp_path: Path, shared_memory_server
+):
+    model, client = shared_memory_server
+    counted_client = mock.Mock(wraps=client)
+    bmi = OptionalDestBmi(
+        CachingBmi(SharedMemoryBmi.in_work_dir(counted_client, tmp_path))
+    )
+    new_value = np.arange(12, dtype=np.float32)
+
+    batch_set_values(bmi, {"a": new_value, "b": new_value})
+
+    assert counted_client.set_value.call_count == 1
+    assert_array_almost_equal(model.value, new_value)
+
+
+NAME = "plate_surface__temperature"
+
+
+@pytest.fixture()
+def wrapped_model():
+    return mock.Mock(wraps=DummyModelWith2DRectilinearGrid())
+
+
+def test_caching_bmi_does_not_cache_values_by_default(wrapped_model: mock.Mock):
+    bmi = CachingBmi(wrapped_model, max_bytes=1024)
+    dest = np.empty(12, dtype=np.float32)
+
+    first = bmi.get_value(NAME, dest)
+    second = bmi.get_value(NAME, dest)
+
+    assert first is dest
+    assert second is dest
+    assert wrapped_model.get_value.call_count == 2
+    assert bmi.cache_info().nbytes == 0
+
+
+def test_caching_bmi_caches_repeated_value_until_update(wrapped_model: mock.Mock):
+    bmi = CachingBmi(wrapped_model, max_bytes=1024, cache_values=True)
+
+    first = bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    third = bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.update()
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+
+    assert_array_almost_equal(third, first)
+    assert wrapped_model.get_value.call_count == 3
+    assert bmi.cache_info().hits == 1
+
+
+def test_caching_bmi_does_not_copy_value_read_once(wrapped_model: mock.Mock):
+    bmi = CachingBmi(wrapped_model, max_bytes=1024, cache_values=True)
+
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.update()
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+
+    assert bmi.cache_info().nbytes == 0
+
+
+def test_caching_bmi_set_value_invalidates(wrapped_model: mock.Mock):
+    bmi = CachingBmi(wrapped_model, max_bytes=1024, cache_values=True)
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    new_value = np.arange(12, dtype=np.float32)
+
+    bmi.set_value(NAME, new_value)
+    result = bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+
+    assert_array_almost_equal(result, new_value)
+
+
+def test_caching_bmi_get_value_at_indices_from_cache(wrapped_model: mock.Mock):
+    bmi = CachingBmi(wrapped_model, max_bytes=1024, cache_values=True)
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    value = bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+
+    result = bmi.get_value_at_indices(
+        NAME, np.empty(2, dtype=np.float32), np.array([1, 5])
+    )
+
+    assert_array_almost_equal(result, value[[1, 5]])
+    wrapped_model.get_value_at_indices.assert_not_called()
+
+
+def test_caching_bmi_keeps_static_results_after_update(wrapped_model: mock.Mock):
+    bmi = CachingBmi(wrapped_model, max_bytes=1024)
+
+    bmi.get_var_units(NAME)
+    bmi.get_grid_x(0, np.empty(4))
+    bmi.update()
+    bmi.get_var_units(NAME)
+    x = bmi.get_grid_x(0, np.empty(4))
+
+    wrapped_model.get_var_units.assert_called_once_with(NAME)
+    wrapped_model.get_grid_x.assert_called_once()
+    assert_array_almost_equal(x, [0.1, 0.2, 0.3, 0.4])
+
+
+def test_caching_bmi_evicts_least_recently_used(wrapped_model: mock.Mock):
+    # Room for the 48 byte value or the 32 byte grid, not both
+    bmi = CachingBmi(wrapped_model, max_bytes=64, cache_values=True)
+
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.get_grid_x(0, np.empty(4))
+    bmi.get_grid_x(0, np.empty(4))
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+
+    assert wrapped_model.get_value.call_count == 3
+    wrapped_model.get_grid_x.assert_called_once()
+    assert bmi.cache_info().nbytes <= 64
+
+
+def test_caching_bmi_without_budget(wrapped_model: mock.Mock):
+    bmi = CachingBmi(wrapped_model, max_bytes=0, cache_values=True)
+
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+    bmi.get_value(NAME, np.empty(12, dtype=np.float32))
+
+    assert wrapped_model.get_value.call_count == 3
+    assert bmi.cache_info().nbytes == 0
+
+
+DUMMY_CLASS = "ewatercycle.testing.fake_models.DummyModelWith2DRectilinearGrid"
+
+
+@pytest.fixture()
+def force_local():
+    old_engine = CFG.container_engine
+    old_models = CFG.local_models
+    CFG.container_engine = "local"
+    CFG.local_models = {"ewatercycle/dummy:1.0": DUMMY_CLASS}
+    yield ContainerImage("ewatercycle/dummy:1.0")
+    CFG.container_engine = old_engine
+    CFG.local_models = old_models
+
+
+@pytest.mark.parametrize("protocol", ["grpc", "openapi"])
+def test_start_container_local(
+    tmp_path: Path, force_local: ContainerImage, protocol: str
+):
+    container = start_container(
+        work_dir=tmp_path, image=force_local, protocol=protocol, timeout=60
+    )
+
+    assert container.get_var_units(NAME) == "K"
+    assert list(container.get_output_var_names()) == [NAME]
+
+
+def test_start_local_container_with_class_name(tmp_path: Path):
+    bmi = start_local_container(
+        work_dir=tmp_path, image=ContainerImage(DUMMY_CLASS), timeout=60
+    )
+
+    assert isinstance(bmi, BmiClientLocal)
+    assert_array_almost_equal(
+        bmi.get_value(NAME, np.empty(12, dtype=np.float32)),
+        DummyModelWith2DRectilinearGrid().value,
+    )
+    process = bmi.process
+    del bmi
+    assert process.poll() is not None
+
+
+def test_start_local_container_unknown_class(tmp_path: Path):
+    with pytest.raises(ChildProcessError, match="exited with code"):
+        start_local_container(
+            work_dir=tmp_path, image=ContainerImage("nonexisting.Bmi"), timeout=60
+        )
+
+
+def test_start_docker_container_with_resources(tmp_path: Path):
+    resources = ContainerResources(cpus=1.5, cpuset="2-3", memory="1GB", threads=2)
+    with mock.patch("ewatercycle.container.BmiClientDocker") as mock_class:
+        start_docker_container(
+            work_dir=tmp_path,
+            image=ContainerImage("ewatercycle/dummy:1.0"),
+            resources=resources,
+        )
+
+    mock_class.return_value.container.update.assert_called_once_with(
+        cpu_period=100_000,
+        cpu_quota=150_000,
+        cpuset_cpus="2-3",
+        mem_limit=10**9,
+        memswap_limit=10**9,
+    )
+
+
+def test_start_docker_container_openapi_with_resources(tmp_path: Path):
+    resources = ContainerResources(cpus=1.5)
+    with (
+        mock.patch("ewatercycle.container.remotebmi.BmiClientDocker") as mock_class,
+        pytest.raises(ValueError, match="only be limited with the grpc protocol"),
+    ):
+        start_docker_container(
+            work_dir=tmp_path,
+            image=ContainerImage("ewatercycle/dummy:1.0"),
+            protocol="openapi",
+            resources=resources,
+        )
+
+    mock_class.assert_not_called()
+
+
+def test_start_docker_container_openapi_without_resources(tmp_path: Path):
+    with mock.patch("ewatercycle.container.remotebmi.BmiClientDocker") as mock_class:
+        # Has no container attribute
+        mock_class.return_value = DummyModelWith2DRectilinearGrid()
+        bmi = start_docker_container(
+            work_dir=tmp_path,
+            image=ContainerImage("ewatercycle/dummy:1.0"),
+            protocol="openapi",
+            resources=ContainerResources(threads=2),
+        )
+
+    assert bmi is mock_class.return_value
+
+
+def test_start_apptainer_container_with_resources(
+    tmp_path: Path, force_apptainer: ContainerImage
+):
+    resources = ContainerResources(cpus=1, cpuset="0", memory="1GB", threads=2)
+    old_environment = dict(os.environ)
+    with mock.patch("ewatercycle.container.BmiClientApptainerLimited") as mock_class:
+        start_apptainer_container(
+            work_dir=tmp_path, image=force_apptainer, resources=resources
+        )
+
+    mock_class.assert_called_once_with(
+        force_apptainer.apptainer_filename, tmp_path, (), None, 0, resources
+    )
+    assert dict(os.environ) == old_environment
+
+
+def test_apptainer_command_with_resources(tmp_path: Path):
+    resources = ContainerResources(cpus=1.5, memory="1GB", threads=2)
+
+    command = _apptainer_command(
+        "dummy.sif", tmp_path, [str(tmp_path / "input")], 1234, resources
+    )
+
+    assert command == [
+        "apptainer",
+        "run",
+        "--contain",
+        "--env",
+        "BMI_PORT=1234",
+        "--env",
+        "OMP_NUM_THREADS=2",
+        "--env",
+        "OPENBLAS_NUM_THREADS=2",
+        "--env",
+        "MKL_NUM_THREADS=2",
+        "--env",
+        "NUMEXPR_NUM_THREADS=2",
+        "--cpus",
+        "1.5",
+        "--memory",
+        str(10**9),
+        "--bind",
+        f"{tmp_path / 'input'}:{tmp_path / 'input'}:ro",
+        "--bind",
+        f"{tmp_path}:{tmp_path}",
+        "--pwd",
+        str(tmp_path),
+        "dummy.sif",
+    ]
+
+
+def test_start_local_container_with_resources(tmp_path: Path):
+    resources = ContainerResources(cpuset="0", threads=3)
+
+    bmi = start_local_container(
+        work_dir=tmp_path,
+        image=ContainerImage(DUMMY_CLASS),
+        timeout=60,
+        resources=resources,
+    )
+
+    assert os.sched_getaffinity(bmi.process.pid) == {0}
+    environ = Path(f"/proc/{bmi.process.pid}/environ").read_bytes().split(b"\0")
+    assert b"OMP_NUM_THREADS=3" in environ
+
+
+def test_start_local_container_cpuset_unsupported_platform(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.delattr(os, "sched_setaffinity", raising=False)
+
+    with (
+        mock.patch("ewatercycle.container.subprocess.Popen") as mock_popen,
+        pytest.raises(ValueError, match="not supported"),
+    ):
+        start_local_container(
+            work_dir=tmp_path,
+            image=ContainerImage(DUMMY_CLASS),
+            resources=ContainerResources(cpuset="0"),
+        )
+
+    mock_popen.assert_not_called()
+
+
+def test_start_local_container_memory_unsupported_platform(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.delattr("ewatercycle.container.resource.prlimit", raising=False)
+
+    with (
+        mock.patch("ewatercycle.container.subprocess.Popen") as mock_popen,
+        pytest.raises(ValueError, match="not supported"),
+    ):
+        start_local_container(
+            work_dir=tmp_path,
+            image=ContainerImage(DUMMY_CLASS),
+            resources=ContainerResources(memory="1GB"),
+        )
+
+    mock_popen.assert_not_called()
+
+
+def test_auto_cpuset_pins_containers_to_own_cores(tmp_path: Path):
+    if len(os.sched_getaffinity(0)) < 2:
+        pytest.skip("Needs at least 2 cores")
+    resources = ContainerResources(cpuset="auto")
+
+    bmis = [
+        start_local_container(
+            work_dir=tmp_path,
+            image=ContainerImage(DUMMY_CLASS),
+            timeout=60,
+            resources=resources,
+        )
+        for _ in range(2)
+    ]
+
+    first, second = (os.sched_getaffinity(bmi.process.pid) for bmi in bmis)
+    assert len(first) == len(second) == 1
+    assert first != second
+
+
+def test_start_containers(tmp_path: Path, force_apptainer: ContainerImage):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_client(work_dir, **kwargs):
+        # All containers are started at the same time
+        barrier.wait()
+        if work_dir.endswith("broken"):
+            msg = "Container exited"
+            raise ChildProcessError(msg)
+        return DummyModelWith2DRectilinearGrid()
+
+    specs = [
+        ContainerSpec(work_dir=str(tmp_path / name), image=force_apptainer)
+        for name in ("first", "broken", "last")
+    ]
+    with mock.patch("ewatercycle.container.BmiClientApptainer", fake_client):
+        results = start_containers(specs)
+
+    first, broken, last = results
+    assert isinstance(first, OptionalDestBmi)
+    assert isinstance(broken, ChildProcessError)
+    assert isinstance(last, OptionalDestBmi)
+
+
+def test_start_containers_without_specs():
+    assert start_containers([]) == []
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import ClassVar
+
+import numpy as np
+import pytest
+from bmipy import Bmi
+from numpy.testing import assert_allclose
+
+from ewatercycle.base.model import LocalModel
+from ewatercycle.ensemble import EnsembleMember, run_ensemble
+from ewatercycle.testing.fake_models import DummyModelWith2DRectilinearGrid
+
+NAME = "plate_surface__temperature"
+
+
+class DummyLocalModel(LocalModel):
+    bmi_class: type[Bmi] = DummyModelWith2DRectilinearGrid
+
+
+class FailingBmi(DummyModelWith2DRectilinearGrid):
+    finalized: ClassVar[int] = 0
+
+    def initialize(self, config_file: str) -> None:
+        if "fail" in Path(config_file).read_text():
+            msg = "Invalid config"
+            raise ValueError(msg)
+        super().initialize(config_file)
+
+    def finalize(self):
+        FailingBmi.finalized += 1
+        super().finalize()
+
+
+class FailingLocalModel(LocalModel):
+    bmi_class: type[Bmi] = FailingBmi
+
+
+class BrokenBmi(DummyModelWith2DRectilinearGrid):
+    def __init__(self):
+        msg = "Unable to start model"
+        raise RuntimeError(msg)
+
+
+class BrokenLocalModel(LocalModel):
+    bmi_class: type[Bmi] = BrokenBmi
+
+
+def test_run_ensemble(mocked_config, tmp_path: Path):
+    members = [EnsembleMember(parameters={"alpha": alpha}) for alpha in (1, 2, 3)]
+
+    ds, failed = run_ensemble(
+        DummyLocalModel, members, outputs=[NAME], end_time=4.0, cfg_dir=tmp_path
+    )
+
+    assert failed == {}
+
+    assert ds[NAME].dims == ("member", "time", "latitude", "longitude")
+    assert list(ds.member.values) == [0, 1, 2]
+    assert len(ds.time) == 4
+    assert_allclose(ds[NAME].sel(longitude=0.2, latitude=1.2), np.full((3, 4), 6.6))
+    for index, alpha in enumerate((1, 2, 3)):
+        config = tmp_path / f"member_{index}" / "config.yaml"
+        assert config.read_text().strip() == f"alpha: {alpha}"
+
+
+def test_run_ensemble_with_executor(mocked_config, tmp_path: Path):
+    members = [EnsembleMember(), EnsembleMember()]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        ds, _ = run_ensemble(
+            DummyLocalModel,
+            members,
+            outputs=[NAME],
+            end_time=2.0,
+            executor=executor,
+        )
+
+    assert ds[NAME].shape == (2, 2, 3, 4)
+    ensemble_dirs = list(tmp_path.glob("dummylocalmodel_ensemble_*"))
+    assert len(ensemble_dirs) == 1
+    assert sorted(p.name for p in ensemble_dirs[0].iterdir()) == [
+        "member_0",
+        "member_1",
+    ]
+
+
+def test_run_ensemble_without_members(mocked_config):
+    with pytest.raises(ValueError, match="at least one member"):
+        run_ensemble(DummyLocalModel, [], outputs=[NAME])
+
+
+def test_run_ensemble_with_failing_member(mocked_config, tmp_path: Path):
+    FailingBmi.finalized = 0
+    members = [
+        EnsembleMember(),
+        EnsembleMember(parameters={"fail": True}),
+        EnsembleMember(),
+    ]
+
+    ds, failed = run_ensemble(
+        FailingLocalModel, members, outputs=[NAME], end_time=2.0, cfg_dir=tmp_path
+    )
+
+    assert list(ds.member.values) == [0, 2]
+    assert list(failed) == [1]
+    assert isinstance(failed[1], ValueError)
+    assert FailingBmi.finalized == 3
+
+
+def test_run_ensemble_with_failing_setup(
+    mocked_config, tmp_path: Path, caplog: pytest.LogCaptureFixture
+):
+    _, failed = run_ensemble(
+        BrokenLocalModel, [EnsembleMember()], outputs=[NAME], cfg_dir=tmp_path
+    )
+
+    assert isinstance(failed[0], RuntimeError)
+    assert "Unable to finalize" not in caplog.text
+
+
+def test_run_ensemble_in_processes(mocked_config, tmp_path: Path):
+    members = [EnsembleMember(), EnsembleMember()]
+
+    ds, failed = run_ensemble(
+        DummyLocalModel,
+        members,
+        outputs=[NAME],
+        end_time=2.0,
+        max_workers=2,
+        processes=True,
+    )
+
+    assert failed == {}
+    assert ds[NAME].shape == (2, 2, 3, 4)
+    assert len(list(tmp_path.glob("dummylocalmodel_ensemble_*"))) == 1
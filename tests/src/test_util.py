@@ -1,12 +1,14 @@
 from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
 import pytest
 import xarray as xr
 from numpy.testing import assert_array_equal
 
 import ewatercycle
 from ewatercycle.util import (
+    NearestGridPointIndex,
     find_closest_point,
     fit_extents_to_grid,
     get_package_versions,
@@ -47,6 +49,42 @@ def test_find_closest_point():
     assert idx_lat == 0
 
 
+def test_nearest_grid_point_index():
+    index = NearestGridPointIndex(
+        grid_longitudes=[-99.83, -99.32],
+        grid_latitudes=[42.25, 42.21],
+    )
+
+    idx_lon, idx_lat = index.query([-99.32, -99.80], [43.25, 42.22])
+
+    assert_array_equal(idx_lon, [1, 0])
+    assert_array_equal(idx_lat, [0, 1])
+
+
+def test_nearest_grid_point_index_matches_find_closest_point():
+    lons = np.arange(0.025, 5, 0.05)
+    lats = np.arange(50.025, 53, 0.05)
+    index = NearestGridPointIndex(lons, lats)
+    rng = np.random.default_rng(42)
+    points_lon = rng.uniform(0.1, 4.9, 20)
+    points_lat = rng.uniform(50.1, 52.9, 20)
+
+    idx_lon, idx_lat = index.query(points_lon, points_lat)
+
+    expected = [
+        find_closest_point(lons, lats, plon, plat)
+        for plon, plat in zip(points_lon, points_lat, strict=True)
+    ]
+    assert list(zip(idx_lon, idx_lat, strict=True)) == expected
+
+
+def test_nearest_grid_point_index_outside_grid():
+    index = NearestGridPointIndex([0.1, 0.2, 0.3], [1.1, 1.2])
+
+    with pytest.raises(ValueError, match="outside model grid"):
+        index.query([0.2, 10.0], [1.1, 1.1])
+
+
 def test_to_absolute_path():
     input_path = "~/nonexistent_file.txt"
     parsed = to_absolute_path(input_path)
@@ -246,6 +284,15 @@ def test_merge_esmvaltool_datasets(esmvaltool_output):
     assert ds["tas"].chunks is not None  # ensure that it's a dask array
 
 
+def test_merge_esmvaltool_datasets_leaves_input_untouched(esmvaltool_output):
+    merge_esvmaltool_datasets(esmvaltool_output)
+
+    tas = next(ds for ds in esmvaltool_output if "tas" in ds)
+    assert "height" in tas.variables
+    assert "height" not in tas["tas"].attrs
+    assert all("time_bnds" in ds for ds in esmvaltool_output)
+
+
 def test_merge_datasets_multivar(esmvaltool_output):
     for i in range(len(esmvaltool_output)):
         if "tas" in esmvaltool_output[i]:  # tas has height attribute